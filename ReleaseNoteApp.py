@@ -2,41 +2,940 @@
 
 import sys
 import os
+import threading
+import time
+import bisect
+import json
+import argparse
+from collections import OrderedDict
+
+# 程式開始跑的時間 (啟動時間從這裡算，PySide6 的 import 也算在內)
+STARTED = time.perf_counter()
+STARTED_WALL = time.time()
+
 from PySide6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
                                QFormLayout, QLabel, QLineEdit, QTextEdit, 
-                               QPushButton, QTableWidget, QTableWidgetItem, 
+                               QPushButton, QTableView, 
                                QMessageBox, QTabWidget, QFileDialog, QComboBox, QHeaderView,
-                               QSplitter)
-from PySide6.QtCore import Qt, QSettings
+                               QSplitter, QProgressBar, QProgressDialog, QCheckBox,
+                               QTableWidget, QTableWidgetItem, QDialog, QListWidget, QSpinBox)
+from PySide6.QtGui import QShortcut, QKeySequence, QFontDatabase
+from PySide6.QtCore import (Qt, QSettings, QObject, QRunnable, QThreadPool, Signal,
+                            QAbstractTableModel, QModelIndex, QFileSystemWatcher, QTimer)
+
+from note_core import (FolderIndex, ScanSpec, NoteEntry, iter_scan, scan_tree, stat_entry, split_list, diff_entries,
+                       iter_notes, read_note, READ_FAILED, LIST_SEPARATOR,
+                       PagedTextReader,
+                       update_note, run_batch_update, plan_notes, app_dir, format_version,
+                       VERSION_STAGES, VERSION_ENVS)
+from note_journal import run_safe_batch_update, recover_journals
+from note_cache import open_cache
+from note_search import ContentIndex
+from note_versions import VersionRegistry
+from note_trace import tracer, PROFILE_ENV
+from note_report import export_report_file, format_from_path, ExportCancelled
+from note_git import GitRepo, GitError, default_commit_message
+from note_snapshots import SnapshotStore, SNAPSHOT_DIR
+from note_preview import PreviewLoader, batch_summary
+
+
+def unpack_seconds():
+    """
+    --onefile 包的 exe 每次開都要先解壓到暫存資料夾 (sys._MEIPASS = ..._MEIxxxxx)，估一下花了多久
+    (資料夾建立時間 -> Python 開始跑)；不是 onefile 打包版就回傳 None
+    """
+    meipass = getattr(sys, "_MEIPASS", "")
+    if not getattr(sys, "frozen", False) or not os.path.basename(meipass).startswith("_MEI"):
+        return None
+    try:
+        return max(0.0, STARTED_WALL - os.path.getctime(meipass))
+    except OSError:
+        return None
+
+class LoaderSignals(QObject):
+    """ 背景載入用的訊號 (第一個參數都是 generation，切換資料夾後舊的就直接丟掉) """
+    entries_found = Signal(int, list) # 掃到一批檔名 (一個子資料夾掃完就丟) -> [NoteEntry, ...]
+    scanned = Signal(int, object)     # 整棵樹掃完 -> {資料夾: mtime_ns}
+    batch_ready = Signal(int, list)   # 讀完一批 -> [(檔名, 內文), ...]
+    finished = Signal(int)
+    failed = Signal(int, str)
+    changes_ready = Signal(int, object) # 增量變動 -> FolderChanges
+
+class BodyFetchSignals(QObject):
+    fetched = Signal(int, list) # (epoch, [(檔名, 內文), ...])
+
+class BodyFetchWorker(QRunnable):
+    """ 表格捲到的列內文已經不在記憶體裡了: 背景重讀 (快取 / 檔案) """
+    def __init__(self, epoch, job):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.epoch = epoch
+        self.job = job # 在背景跑的函式，回傳 [(檔名, 內文), ...] (見 FepReleaseManager.table_body_job)
+        self.signals = BodyFetchSignals()
+
+    def run(self):
+        with tracer.profile_thread():
+            with tracer.span("table_fetch") as extra:
+                bodies = self.job()
+                extra["files"] = len(bodies)
+            self.signals.fetched.emit(self.epoch, bodies)
+
+class ContentIndexSignals(QObject):
+    finished = Signal(int) # generation
+
+class ContentIndexWorker(QRunnable):
+    """
+    第一次用內容搜尋才在背景建全文索引 (快取命中的直接拿，其他的重讀檔案)
+    載入時不再順便建，熱啟動只要 stat + 讀快取
+    """
+    def __init__(self, generation, content_index, jobs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.content_index = content_index
+        self.jobs = jobs # 一批一個，回傳 [(檔名, 內文), ...] (見 FepReleaseManager.table_body_job)
+        self.cancel_event = threading.Event()
+        self.signals = ContentIndexSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        with tracer.profile_thread():
+            with tracer.span("index_content") as extra:
+                files = 0
+                for job in self.jobs:
+                    if self.cancel_event.is_set(): return
+                    bodies = job()
+                    # 建的期間增量掃描先放進來的比較新，不要拿快取裡舊的蓋掉
+                    self.content_index.add_many([(n, b) for n, b in bodies if b != READ_FAILED],
+                                                replace=False)
+                    files += len(bodies)
+                extra["files"] = files
+            self.signals.finished.emit(self.generation)
+
+class NoteTableModel(QAbstractTableModel):
+    """
+    第一頁表格的 Model。
+    只存檔名跟每列的行數；內文只留最近畫過的 BODY_CACHE 列 (而且只留格子裡看得到的前 DISPLAY_CHARS 個字)，
+    捲到不在記憶體裡的列才在背景重讀 (見 body_job)，檔案再多記憶體也不會跟著內文總量一直長。
+    顯示文字 / Tooltip 都是 View 要畫那一列時才現算，一萬個檔案也不會生出兩萬個 QTableWidgetItem。
+    """
+    HEADERS = ["檔案名稱", "完整內容"]
+    LOADING_TEXT = "(讀取中...)"
+    MAX_LINES = 6 # 一列最多顯示幾行，超過的看 Tooltip 或去第二頁預覽
+    DISPLAY_CHARS = 2000 # 格子裡反正只看得到前幾行，大檔案不用整串丟給 View 排版
+    BODY_CACHE = 1024    # 記憶體裡最多留幾列的內文 (畫面上的 + 最近捲過的)
+    FETCH_BATCH = 256    # 一次背景重讀幾個檔案
+
+    def __init__(self, parent=None, body_job=None):
+        super().__init__(parent)
+        self.body_job = body_job # body_job(檔名 list) -> 在背景跑、回傳 [(檔名, 內文), ...] 的函式
+        self._names = []       # 檔名 (含 .txt)，順序就是 row
+        self._row_of = {}      # 檔名 -> row
+        self._bodies = OrderedDict() # 檔名 -> 內文前 DISPLAY_CHARS 個字 (LRU，最近畫過的在後面)
+        self._loaded = set()   # 讀過內文的檔名 (不在 _bodies 裡的要重讀；沒讀過的等背景載入送過來)
+        self._line_counts = [] # 每列要幾行高 (快取，不用每次量字)
+        self._epoch = 0        # set_names 一次 +1，換資料夾前排的重讀結果就丟掉
+        self._wanted = set()   # 等著要重讀的檔名
+        self._inflight = set() # 正在重讀的 (讀的時候 set_bodies 又送新的來，就不要拿舊的蓋掉)
+        self._fetch = None
+        self._fetch_timer = QTimer(self) # 一次 paint 裡要的列集中起來一起讀
+        self._fetch_timer.setSingleShot(True)
+        self._fetch_timer.setInterval(0)
+        self._fetch_timer.timeout.connect(self.start_fetch)
+
+    def _rebuild_rows(self):
+        self._row_of = {name: row for row, name in enumerate(self._names)}
+
+    def set_names(self, names):
+        """ 換一批檔名 (內容之後再用 set_bodies 補) """
+        self.beginResetModel()
+        self._names = list(names)
+        self._rebuild_rows()
+        self._bodies.clear()
+        self._loaded = set()
+        self._wanted.clear()
+        self._inflight.clear()
+        self._epoch += 1
+        self._line_counts = [1] * len(self._names)
+        self.endResetModel()
+
+    def _keep_body(self, name, body):
+        self._bodies[name] = body[:self.DISPLAY_CHARS]
+        self._bodies.move_to_end(name)
+        while len(self._bodies) > self.BODY_CACHE:
+            self._bodies.popitem(last=False)
+
+    def set_bodies(self, batch):
+        """
+        填入一批 [(檔名, 內文), ...] (行數記下來，內文只留 LRU 那些)
+        回傳: 有更新到的 row (給 View 調整列高用)
+        """
+        rows = []
+        for name, body in batch:
+            row = self._row_of.get(name)
+            if row is None: continue
+            self._keep_body(name, body)
+            self._loaded.add(name)
+            self._inflight.discard(name)
+            self._line_counts[row] = max(1, min(body.count("\n") + 1, self.MAX_LINES))
+            rows.append(row)
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 1), self.index(max(rows), 1),
+                                  [Qt.DisplayRole, Qt.ToolTipRole])
+        return rows
+
+    # ==========================
+    # 捲到不在記憶體裡的列: 背景重讀
+    # ==========================
+    def _body(self, name):
+        body = self._bodies.get(name)
+        if body is not None:
+            self._bodies.move_to_end(name)
+        elif name in self._loaded and name not in self._inflight and self.body_job is not None:
+            self._wanted.add(name)
+            self._fetch_timer.start()
+        return body
+
+    def start_fetch(self):
+        if self._fetch is not None or not self._wanted:
+            return
+        names = [name for name in self._wanted if name in self._row_of][:self.FETCH_BATCH]
+        self._wanted.difference_update(names)
+        if not names:
+            self._wanted.clear()
+            return
+        self._inflight.update(names)
+        self._fetch = BodyFetchWorker(self._epoch, self.body_job(names))
+        self._fetch.signals.fetched.connect(self.on_fetched)
+        QThreadPool.globalInstance().start(self._fetch)
+
+    def on_fetched(self, epoch, batch):
+        self._fetch = None
+        if epoch == self._epoch:
+            rows = []
+            for name, body in batch:
+                if name not in self._inflight: continue # 讀的時候 set_bodies 已經送了新的
+                self._inflight.discard(name)
+                self._keep_body(name, body)
+                rows.append(self._row_of[name])
+            if rows:
+                self.dataChanged.emit(self.index(min(rows), 1), self.index(max(rows), 1),
+                                      [Qt.DisplayRole, Qt.ToolTipRole])
+        self.start_fetch() # 讀的時候又捲到別的地方了
+
+    def add_names(self, names):
+        """
+        一次加一大批檔名 (掃描中一個子資料夾一個子資料夾串流進來的)
+        一筆一筆 insert 每次都要重建 row 對照表，量大時用 reset 重排比較快
+        回傳: 行數不是 1 的 row (reset 之後列高要重設)
+        """
+        new = [name for name in names if name not in self._row_of]
+        if not new: return []
+        lines = dict(zip(self._names, self._line_counts))
+        self.beginResetModel()
+        self._names = sorted(self._names + new)
+        self._rebuild_rows()
+        self._line_counts = [lines.get(name, 1) for name in self._names]
+        self.endResetModel()
+        return [row for row, lines in enumerate(self._line_counts) if lines != 1]
+
+    def remove_names(self, names):
+        """ 刪掉幾列 (檔案被刪了)；從後面刪回來，row 對照表最後重建一次就好 """
+        rows = sorted({self._row_of[name] for name in names if name in self._row_of}, reverse=True)
+        if not rows: return
+        i = 0
+        while i < len(rows):
+            # 連續的幾列一起刪 (rows 是由大到小)
+            last = first = rows[i]
+            while i + 1 < len(rows) and rows[i + 1] == first - 1:
+                i += 1
+                first = rows[i]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for name in self._names[first:last + 1]:
+                self._bodies.pop(name, None)
+                self._loaded.discard(name)
+                self._wanted.discard(name)
+                self._inflight.discard(name)
+            del self._names[first:last + 1]
+            del self._line_counts[first:last + 1]
+            self.endRemoveRows()
+            i += 1
+        self._rebuild_rows()
+
+    def insert_names(self, names):
+        """ 插入新檔名 (照排序插到對的位置)；row 對照表最後重建一次就好 """
+        new = sorted({name for name in names if name not in self._row_of})
+        for name in new:
+            row = bisect.bisect_left(self._names, name)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._names.insert(row, name)
+            self._line_counts.insert(row, 1)
+            self.endInsertRows()
+        if new:
+            self._rebuild_rows()
+
+    def line_count(self, row):
+        return self._line_counts[row]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._names)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid(): return None
+        name = self._names[index.row()]
+        
+        if role == Qt.DisplayRole:
+            if index.column() == 0:
+                # [修改點] 這裡！切掉副檔名再顯示
+                # name 是 "abc.txt"，顯示 "abc"
+                return os.path.splitext(name)[0]
+            body = self._body(name)
+            return self.LOADING_TEXT if body is None else body
+        
+        if role == Qt.ToolTipRole and index.column() == 1:
+            body = self._body(name)
+            if body is not None:
+                return body[:200] + "..."
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+class FolderLoadWorker(QRunnable):
+    """
+    在背景掃資料夾 + 平行讀檔，不再卡住畫面
+    掃描是平行 os.scandir (多個根資料夾 / 子資料夾一起掃)，掃完一個子資料夾就先把檔名丟回 GUI；
+    整棵樹掃完再讀內容，讀完一批丟一批
+    """
+    CACHED_BATCH = 1024  # 快取命中的一次丟多一點，反正不用等 I/O
+    FOUND_BATCH = 512    # 掃到的檔名累積這麼多 ...
+    FOUND_INTERVAL = 0.1 # ... 或是過了這麼久 (秒) 就先丟給 GUI
+
+    def __init__(self, generation, spec, cache=None, versions=None, use_git=False):
+        super().__init__()
+        self.setAutoDelete(False) # 生命週期由 FepReleaseManager 自己管
+        self.generation = generation
+        self.spec = spec
+        self.folder = spec.base # 檔名都是相對這裡 (快取也用它當 key)
+        self.cache = cache # NoteCache，沒有就每個檔案都重讀
+        self.versions = versions # 順便整理每個檔案目前的版號 (VersionRegistry)
+        self.use_git = use_git
+        self.git_repo = None  # 資料夾在 git repo 裡的話，載入完 GUI 會來拿這兩個
+        self.git_state = None # 掃描「之前」的 git 快照，之後的增量掃描只看從這之後變的檔案
+        self.cancel_event = threading.Event()
+        self.signals = LoaderSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        with tracer.profile_thread():
+            self._run()
+
+    def _run(self):
+        gen = self.generation
+        try:
+            if self.use_git:
+                self._snapshot_git()
+            entries, dir_mtimes, found = {}, {}, []
+            last_emit = 0.0 # 第一個資料夾掃完馬上丟，畫面早點有東西
+            scan_started = time.perf_counter()
+            for path, dir_mtime_ns, dir_entries in iter_scan(self.spec, cancel=self.cancel_event):
+                dir_mtimes[path] = dir_mtime_ns
+                for entry in dir_entries:
+                    if entry.name not in entries:
+                        entries[entry.name] = entry
+                        found.append(entry)
+                now = time.perf_counter()
+                if found and (len(found) >= self.FOUND_BATCH or now - last_emit >= self.FOUND_INTERVAL):
+                    self.signals.entries_found.emit(gen, found)
+                    found, last_emit = [], now
+            if self.cancel_event.is_set(): return
+            if found:
+                self.signals.entries_found.emit(gen, found)
+            self.signals.scanned.emit(gen, dir_mtimes)
+            tracer.record("scan", time.perf_counter() - scan_started,
+                          files=len(entries), dirs=len(dir_mtimes))
+            
+            ordered = [entries[name] for name in sorted(entries)]
+            if self.cache is not None:
+                # size/mtime 沒變的直接用上次的結果，只重讀有變的
+                with tracer.span("cache_lookup") as extra:
+                    hits, ordered = self.cache.lookup(self.folder, ordered)
+                    extra.update(hits=len(hits), misses=len(ordered))
+                for i in range(0, len(hits), self.CACHED_BATCH):
+                    chunk = [(name, body) for name, _, body in hits[i:i + self.CACHED_BATCH]]
+                    self.signals.batch_ready.emit(gen, chunk)
+                    self._track_versions(chunk, entries)
+            
+            read_started = time.perf_counter()
+            for batch in iter_notes(ordered, cancel=self.cancel_event):
+                bodies = [(name, body) for name, _, body in batch]
+                self.signals.batch_ready.emit(gen, bodies)
+                self._track_versions(bodies, entries)
+                if self.cache is not None:
+                    self.cache.store(self.folder, entries, batch)
+            if self.cancel_event.is_set(): return
+            if ordered:
+                # 讀檔 + 解析 Header (含整理版號、寫快取的時間)
+                tracer.record("read", time.perf_counter() - read_started, files=len(ordered))
+            
+            if self.cache is not None:
+                self.cache.sync_folder(self.folder, entries)
+        except Exception as e:
+            self.signals.failed.emit(gen, str(e))
+            return
+        self.signals.finished.emit(gen)
+
+    def _snapshot_git(self):
+        """ 先記下 git 狀態再開始掃，掃描期間被改的檔案下次一定會出現在 status 裡 """
+        repo = GitRepo.find(self.folder)
+        if repo is None:
+            return
+        try:
+            pathspecs = repo.pathspecs_for(self.spec)
+            if any(p != "." and repo.is_ignored(p) for p in pathspecs):
+                return # note 資料夾被 .gitignore 掉了，git 看不到它的變動
+            self.git_state = repo.snapshot(pathspecs)
+            self.git_repo = repo
+        except GitError as e:
+            print(f"警告: git 狀態讀取失敗，改用一般掃描 -> {e}")
+
+    def _track_versions(self, bodies, entries):
+        if self.versions is not None:
+            self.versions.update_many([(n, entries[n].tokens, b) for n, b in bodies])
+
+class FolderChanges:
+    """ 一次增量掃描的結果 (背景算好丟回 GUI 套用) """
+    def __init__(self, dir_mtimes, upserts, added, modified, removed, bodies, git_state=None):
+        self.dir_mtimes = dir_mtimes # 這次掃到的 {資料夾: mtime_ns}
+        self.upserts = upserts   # 新增/修改的 NoteEntry
+        self.added = added       # 新增的檔名
+        self.modified = modified # 內容有變的檔名
+        self.removed = removed   # 被刪掉的檔名
+        self.bodies = bodies     # 重讀的內文 [(檔名, 內文), ...]
+        self.git_state = git_state # 這次的 git 快照 (下次從這裡開始比)
+
+    def is_empty(self):
+        return not (self.added or self.modified or self.removed)
+
+class ChangeScanWorker(QRunnable):
+    """ 重掃一次 stat，跟目前的索引比對，只重讀有變的檔案 """
+    def __init__(self, generation, spec, known, touched=(), cache=None, content_index=None,
+                 versions=None, git_repo=None, git_state=None, dir_mtimes=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.spec = spec
+        self.folder = spec.base
+        self.cache = cache
+        self.content_index = content_index
+        self.versions = versions
+        self.git_repo = git_repo     # 有的話先問 git 哪些檔案可能變了，不用整個資料夾 stat 一遍
+        self.git_state = git_state   # 上次的 git 快照
+        self.dir_mtimes = dir_mtimes # 目前索引裡的 {資料夾: mtime_ns} (git 模式只更新有動到的)
+        self.known = known            # index.stat_snapshot()
+        self.touched = set(touched)   # 明確知道被改過的檔案 (例如剛剛自己寫的)
+        self.signals = LoaderSignals()
+
+    def run(self):
+        with tracer.profile_thread():
+            self._run()
+
+    def _run(self):
+        gen = self.generation
+        started = time.perf_counter()
+        try:
+            mode = "git"
+            try:
+                dir_mtimes, entries, known, git_state = self._git_candidates()
+            except GitError as e:
+                if self.git_repo is not None:
+                    print(f"警告: git 狀態讀取失敗，改用一般掃描 -> {e}")
+                mode, git_state, known = "scan", None, self.known
+                dir_mtimes, entries = scan_tree(self.spec)
+                if self.git_repo is not None:
+                    try: # 下一次就能再走 git
+                        git_state = self.git_repo.snapshot(self.git_repo.pathspecs_for(self.spec))
+                    except GitError:
+                        pass
+            added, modified, removed = diff_entries(known, entries)
+            # 自己剛寫完的檔案，就算 mtime 精度不夠看不出來也要重讀
+            extra = sorted(n for n in self.touched
+                           if n in entries and n not in added and n not in modified)
+            modified = modified + extra
+            
+            changed = added + modified
+            bodies = []
+            for batch in iter_notes([entries[n] for n in changed]):
+                bodies.extend((name, body) for name, _, body in batch)
+                if self.cache is not None:
+                    self.cache.store(self.folder, entries, batch)
+            if self.cache is not None:
+                self.cache.forget(self.folder, removed)
+            if self.content_index is not None:
+                for name in removed:
+                    self.content_index.remove(name)
+                self.content_index.add_many([(n, b) for n, b in bodies if b != READ_FAILED])
+            if self.versions is not None:
+                self.versions.remove(removed)
+                self.versions.update_many([(n, entries[n].tokens, b) for n, b in bodies])
+            changes = FolderChanges(dir_mtimes, [entries[n] for n in changed],
+                                    added, modified, removed, bodies, git_state)
+            tracer.record("scan_changes", time.perf_counter() - started, files=len(entries),
+                          added=len(added), modified=len(modified), removed=len(removed), mode=mode)
+        except Exception as e:
+            self.signals.failed.emit(gen, str(e))
+            return
+        self.signals.changes_ready.emit(gen, changes)
+
+    def _git_candidates(self):
+        """
+        git 模式: 只 stat 可能有變的檔案 (git status 不乾淨的 + 上次不乾淨的 + HEAD 之間有動的 + touched)
+        回傳: (資料夾 mtime, 候選檔案的 {檔名: NoteEntry}, 候選檔案的舊 stat, 新的 git 快照)
+        """
+        if self.git_repo is None or self.git_state is None or self.dir_mtimes is None:
+            raise GitError("沒有 git 快照")
+        repo = self.git_repo
+        repo_paths, git_state = repo.changes_since(self.git_state, repo.pathspecs_for(self.spec))
+        names = {repo.from_repo_path(self.folder, p) for p in repo_paths} | self.touched
+        names.discard(None)
+        entries = {}
+        for name in names:
+            entry = stat_entry(self.spec, name)
+            if entry is not None:
+                entries[name] = entry
+        known = {n: self.known[n] for n in names if n in self.known}
+        # 有動到的資料夾更新 mtime (新的子資料夾也要開始監看)
+        dir_mtimes = dict(self.dir_mtimes)
+        for entry in entries.values():
+            parent = os.path.dirname(entry.path)
+            try:
+                dir_mtimes[parent] = os.stat(parent).st_mtime_ns
+            except OSError:
+                pass
+        return dir_mtimes, entries, known, git_state
+
+class BatchSignals(QObject):
+    progress = Signal(int, int, str) # 完成數, 總數, 剛做完的檔名
+    finished = Signal(object)        # BatchReport
+
+class BatchUpdateWorker(QRunnable):
+    """ 在背景平行跑批次更新，GUI 只負責顯示進度 """
+    def __init__(self, folder, names, version_str, new_content, max_workers, journal_dir=None,
+                 plans=None, snapshots=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.folder = folder
+        self.names = names
+        self.version_str = version_str
+        self.new_content = new_content
+        self.max_workers = max_workers
+        self.journal_dir = journal_dir # 有給就用交易式寫入 (note_journal)
+        self.plans = plans # 乾跑預覽過的 {檔名: NotePlan}，沒被改過的檔案直接寫預覽的內容
+        self.snapshots = snapshots # SnapshotStore: 覆寫前先備份 (之後可以復原)，None = 不備份
+        self.cancel_event = threading.Event()
+        self.signals = BatchSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        with tracer.profile_thread():
+            self._run()
+
+    def _run(self):
+        def on_progress(done, total, result):
+            tracer.record("update_file", result.elapsed, file=result.name, ok=result.ok,
+                          bytes_written=result.bytes_written)
+            self.signals.progress.emit(done, total, result.name)
+        recorder = self.snapshots.begin(self.folder, self.version_str) if self.snapshots else None
+        if self.journal_dir:
+            report = run_safe_batch_update(self.folder, self.names, self.version_str,
+                                           self.new_content, self.journal_dir,
+                                           max_workers=self.max_workers, cancel=self.cancel_event,
+                                           progress=on_progress, plans=self.plans, snapshot=recorder)
+        else:
+            report = run_batch_update(self.folder, self.names, self.version_str, self.new_content,
+                                      max_workers=self.max_workers, cancel=self.cancel_event,
+                                      progress=on_progress, plans=self.plans, snapshot=recorder)
+        tracer.record("batch_update", report.elapsed, files=report.total,
+                      ok=len(report.succeeded), failed=len(report.failed),
+                      cancelled=report.cancelled, safe=bool(self.journal_dir))
+        if recorder is not None:
+            try:
+                with tracer.span("snapshot_commit", files=len(report.succeeded)):
+                    recorder.commit([r.name for r in report.succeeded])
+            except Exception as e:
+                print(f"警告: 備份紀錄寫入失敗，這一批沒辦法復原 -> {e}")
+        self.signals.finished.emit(report)
+
+class UndoWorker(QRunnable):
+    """ 在背景把最近 N 批寫回更新前的內容 (訊號跟批次更新共用) """
+    def __init__(self, snapshots, count, max_workers):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.snapshots = snapshots
+        self.count = count
+        self.max_workers = max_workers
+        self.batches = [] # 跑完之後: 復原到的 BatchSnapshot (新到舊)
+        self.cancel_event = threading.Event()
+        self.signals = BatchSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        with tracer.profile_thread():
+            self._run()
+
+    def _run(self):
+        def on_progress(done, total, result):
+            self.signals.progress.emit(done, total, result.name)
+        report, self.batches = self.snapshots.undo(self.count, self.max_workers,
+                                                   cancel=self.cancel_event, progress=on_progress)
+        tracer.record("undo", report.elapsed, batches=len(self.batches), files=report.total,
+                      ok=len(report.succeeded), failed=len(report.failed))
+        self.signals.finished.emit(report)
+
+class ExportSignals(QObject):
+    progress = Signal(int, int)     # 完成數, 總數
+    finished = Signal(int, str)     # 匯出幾筆, 輸出檔
+    failed = Signal(str)
+    cancelled = Signal()            # 取消了 (寫一半的暫存檔已經刪掉)
+
+class ExportWorker(QRunnable):
+    """ 背景把目前的篩選結果串流寫成報表 (note_report)，不會卡住畫面 """
+    def __init__(self, folder, names, path, group_by, versions=None):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.folder = folder
+        self.names = names
+        self.path = path
+        self.group_by = group_by
+        self.versions = versions # VersionRegistry.version_of (載入完才給，不然自己掃版號)
+        self.cancel_event = threading.Event()
+        self.signals = ExportSignals()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        with tracer.profile_thread():
+            self._run()
+
+    def _run(self):
+        fmt = format_from_path(self.path)
+        try:
+            with tracer.span("export", files=len(self.names), format=fmt):
+                count = export_report_file(self.path, self.folder, self.names, fmt, group_by=self.group_by,
+                                           versions=self.versions, cancel=self.cancel_event,
+                                           progress=self.on_progress)
+        except ExportCancelled:
+            self.signals.cancelled.emit()
+            return
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(count, self.path)
+
+    def on_progress(self, done, total):
+        if done % 64 == 0 or done == total: # 每筆都丟訊號的話 GUI 會被灌爆
+            self.signals.progress.emit(done, total)
+
+class GitCommitSignals(QObject):
+    finished = Signal(str) # 新的 commit hash (沒東西可以 commit 就是空字串)
+    failed = Signal(str)
+
+class GitCommitWorker(QRunnable):
+    """ 批次更新完，整批 git add + commit (各只叫一次 git) """
+    def __init__(self, repo, folder, names, message):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.repo = repo
+        self.folder = folder
+        self.names = names
+        self.message = message
+        self.signals = GitCommitSignals()
+
+    def run(self):
+        with tracer.profile_thread():
+            try:
+                with tracer.span("git_commit", files=len(self.names)):
+                    paths = [self.repo.to_repo_path(self.folder, n) for n in self.names]
+                    commit_hash = self.repo.commit(paths, self.message)
+            except GitError as e:
+                self.signals.failed.emit(str(e))
+                return
+            self.signals.finished.emit(commit_hash)
+
+class PreviewSignals(QObject):
+    """ PreviewLoader 在背景 thread 讀完會呼叫 on_ready，轉成訊號回主執行緒 """
+    ready = Signal(int, object) # (generation, PreviewPage)
+
+class DryRunSignals(QObject):
+    planned = Signal(int, int, list) # (generation, 第幾頁, [NotePlan, ...])
+
+class DryRunWorker(QRunnable):
+    """ 背景算一頁的 diff (乾跑不寫檔) """
+    def __init__(self, generation, page, folder, names, version_str, new_content):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.page = page
+        self.folder = folder
+        self.names = names
+        self.version_str = version_str
+        self.new_content = new_content
+        self.signals = DryRunSignals()
+
+    def run(self):
+        with tracer.profile_thread():
+            with tracer.span("dry_run_page", files=len(self.names)):
+                plans = plan_notes(self.folder, self.names, self.version_str, self.new_content)
+            self.signals.planned.emit(self.generation, self.page, plans)
+
+class DryRunDialog(QDialog):
+    """
+    批次更新前的乾跑預覽: 每個檔案改完會長怎樣 (unified diff)
+    幾百個檔案不會一次全算，捲到底才在背景算下一頁；左邊點檔名就從那一頁開始看
+    按「套用」的話，預覽過而且之後沒被改過的檔案會直接寫預覽的內容 (不再讀一次)
+    """
+    PAGE_SIZE = 20
+
+    def __init__(self, folder, names, version_str, new_content, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("乾跑預覽 (Dry Run)")
+        self.resize(1000, 650)
+        self.folder = folder
+        self.names = list(names)
+        self.version_str = version_str
+        self.new_content = new_content
+        self.plans = {}           # 檔名 -> NotePlan (算過的都留著，套用時用)
+        self._generation = 0      # 點左邊跳頁時 +1，舊的那一頁算完就丟掉
+        self._next_page = 0       # 右邊接下來要接哪一頁
+        self._pending = None      # 正在背景算的 worker
+        self._workers = []
+        self.page_count = (len(self.names) + self.PAGE_SIZE - 1) // self.PAGE_SIZE
+
+        layout = QVBoxLayout()
+        layout.addWidget(QLabel(f"版號: {version_str}，共 {len(self.names)} 個檔案。\n"
+                                "每個檔案的舊內容 (除了 # 開頭) 會被換掉，下面是改完的差異。"))
+        splitter = QSplitter(Qt.Horizontal)
+        self.file_list = QListWidget()
+        self.file_list.addItems(self.names)
+        self.file_list.itemClicked.connect(self.jump_to_item)
+        self.diff_area = QTextEdit()
+        self.diff_area.setReadOnly(True)
+        self.diff_area.setLineWrapMode(QTextEdit.NoWrap)
+        self.diff_area.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.diff_area.verticalScrollBar().valueChanged.connect(self.on_diff_scrolled)
+        splitter.addWidget(self.file_list)
+        splitter.addWidget(self.diff_area)
+        splitter.setSizes([250, 750])
+        layout.addWidget(splitter)
+
+        self.status = QLabel("")
+        layout.addWidget(self.status)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        self.apply_btn = QPushButton("套用 (Apply)")
+        self.apply_btn.setStyleSheet("background-color: #0078d7; color: white; font-weight: bold; padding: 6px 16px;")
+        self.apply_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(self.apply_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addLayout(buttons)
+        self.setLayout(layout)
+
+        self.update_status()
+        self.request_page(0)
+
+    def request_page(self, page):
+        """ 背景算第 page 頁 (已經在算了就不重複丟) """
+        if page >= self.page_count or self._pending is not None:
+            return
+        names = self.names[page * self.PAGE_SIZE:(page + 1) * self.PAGE_SIZE]
+        cached = [self.plans[n] for n in names if n in self.plans]
+        if len(cached) == len(names):
+            self.on_page_planned(self._generation, page, cached) # 之前看過的頁，不用再算
+            return
+        self._pending = DryRunWorker(self._generation, page, self.folder, names,
+                                     self.version_str, self.new_content)
+        self._pending.signals.planned.connect(self.on_page_planned)
+        self._workers.append(self._pending) # 跳頁時丟掉的 worker 也要留著，等它跑完
+        QThreadPool.globalInstance().start(self._pending)
+        self.update_status()
+
+    def on_page_planned(self, generation, page, plans):
+        if self._pending is not None and self._pending.generation == generation \
+                and self._pending.page == page:
+            self._pending = None
+        # 跳頁前就在算的那一頁也收下來 (之後捲到 / 套用時不用再算)，只是不顯示
+        for plan in plans:
+            self.plans[plan.name] = plan
+            item = self.file_list.item(self.names.index(plan.name, page * self.PAGE_SIZE))
+            mark = "⚠ " if plan.error else ("= " if not plan.diff else "✓ ")
+            item.setText(mark + plan.name)
+        if generation != self._generation or page != self._next_page:
+            self.update_status()
+            return
+
+        cursor = self.diff_area.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText("".join(self.render_plan(plan) for plan in plans))
+        self._next_page = page + 1
+        self.update_status()
+        # 內容還不夠長、捲不動的話就直接接下一頁
+        if self.diff_area.verticalScrollBar().maximum() == 0:
+            self.request_page(self._next_page)
+
+    def render_plan(self, plan):
+        text = f"===== {plan.name} =====\n"
+        if plan.error:
+            return text + f"(無法讀取: {plan.error})\n\n"
+        return text + (plan.diff or "(內容不會有任何變化)\n") + "\n"
+
+    def on_diff_scrolled(self, value):
+        """ 捲到底了: 接著算下一頁 """
+        if value >= self.diff_area.verticalScrollBar().maximum():
+            self.request_page(self._next_page)
+
+    def jump_to_item(self, item):
+        """ 點左邊的檔名: 右邊改從那個檔案所在的頁開始顯示 """
+        page = self.file_list.row(item) // self.PAGE_SIZE
+        self._next_page = page
+        self.diff_area.clear()
+        if self._pending is not None and self._pending.page == page:
+            return # 正在算的就是這一頁: 算完直接顯示
+        self._generation += 1
+        self._pending = None # 舊的那一頁算完只收進 plans，不會顯示
+        self.request_page(page)
+
+    def update_status(self):
+        text = f"已預覽 {len(self.plans)} / {len(self.names)} 個檔案"
+        if self._pending is not None:
+            text += " (計算中...)"
+        if len(self.plans) < len(self.names):
+            text += "；沒預覽到的檔案套用時照常處理"
+        failed = sum(1 for p in self.plans.values() if p.error)
+        if failed:
+            text += f"；⚠ {failed} 個讀不到"
+        self.status.setText(text)
+
+    def reject(self):
+        self._generation += 1 # 還在算的那頁結果就不要了
+        super().reject()
 
 class FepReleaseManager(QWidget):
+    MIN_FILTER_LEVELS = 2 # 關鍵字 A、B 永遠顯示
+    MAX_WATCHED_DIRS = 256 # 子資料夾太多就只監看前面這些，其他的靠定時輪詢
+    BULK_INSERT_ROWS = 64  # 一次新增超過這麼多檔案就整批重排表格
+    STARTUP_FALLBACK_MS = 1000 # 視窗一直沒畫 (一開就縮小之類的) 也要開始載入
+
+    interactive = Signal() # 開程式後第一次可以拿真的資料操作 (--startup-report 用)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("FEP Release Manager v5.3 (Portable)")
         self.resize(1000, 750)
         
-        # --- [修正] 決定正確的根目錄 ---
-        if getattr(sys, 'frozen', False):
-            # 情況 A: 如果是被打包成的 EXE
-            # sys.executable 會給出 EXE 檔案的完整路徑
-            # 我們取它的 dirname，就是 EXE 旁邊的資料夾
-            application_path = os.path.dirname(sys.executable)
-        else:
-            # 情況 B: 如果是普通的 Python 腳本
-            # 就用原本的 __file__ 邏輯
-            application_path = os.path.dirname(os.path.abspath(__file__))
+        # --- [修正] 決定正確的根目錄 (EXE 旁邊 / 原始碼旁邊，見 note_core.app_dir) ---
+        application_path = app_dir()
             
         # 組合出 config.ini 的路徑 (放在 EXE 旁邊)
         ini_path = os.path.join(application_path, "config.ini")
+        # 批次更新的 journal 也放 EXE 旁邊 (不要弄髒 release note 資料夾)
+        self.journal_dir = os.path.join(application_path, "journal")
+        self.cache_path = os.path.join(application_path, "note_cache.sqlite3")
+        self.snapshot_dir = os.path.join(application_path, SNAPSHOT_DIR)
         
         # 設定 QSettings 使用這個 .ini 檔
         self.settings = QSettings(ini_path, QSettings.Format.IniFormat)
         
         # 測試一下 (開發時可以在終端機看到路徑對不對)
         print(f"提示: 設定檔將存放在 -> {ini_path}")
+        
+        # 內容快取 (下次開同一個資料夾只重讀有變的檔案)，開不起來就算了
+        cache_mb = int(self.settings.value("cache_max_mb", 64))
+        self.cache = open_cache(self.cache_path, cache_mb * 1024 * 1024)
+        
+        # 批次更新前的備份 (可以復原最近幾批)，config.ini 的 snapshot_max_mb=0 可以關掉
+        snapshot_mb = int(self.settings.value("snapshot_max_mb", 256))
+        self.snapshots = SnapshotStore(self.snapshot_dir, snapshot_mb * 1024 * 1024) if snapshot_mb > 0 else None
+        
+        # 效能紀錄: 每個階段花多久寫到 logs/fep-trace.log (config.ini 的 trace_log=false 可以關掉)
+        if str(self.settings.value("trace_log", "true")).lower() != "false":
+            tracer.configure_log(os.path.join(application_path, "logs"),
+                                 int(self.settings.value("trace_log_kb", 1024)) * 1024)
 
-        self.current_folder = ""
+        self.scan_spec = ScanSpec.parse("") # 要掃哪些資料夾 (可以多個 + 子資料夾 + glob)
+        self.current_folder = ""   # 檔名的基準路徑 (scan_spec.base)，join 檔名就是完整路徑
+        self.index = FolderIndex() # 檔名索引快取，整個資料夾只掃一次
+        self._loader = None        # 目前在跑的背景載入
+        self._load_generation = 0  # 每次重新載入 +1，用來丟掉舊資料夾的結果
+        self._load_started = 0.0   # 這次載入開始的時間 (效能紀錄用)
+        self._change_scan = None   # 目前在跑的增量掃描
+        self._pending_touched = None # 增量掃描跑的時候又有新變動 -> 跑完再掃一次
+        
+        # --- 監看資料夾變動 (別人改檔、build script 寫檔都會自動反映) ---
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_change_scan)
+        # 通知常常一次來一大串，等 300ms 安靜了再掃
+        self._change_debounce = QTimer(self)
+        self._change_debounce.setSingleShot(True)
+        self._change_debounce.setInterval(300)
+        self._change_debounce.timeout.connect(self.refresh_changes)
+        # 網路磁碟不一定會發通知，再加一個定時輪詢當保險 (config.ini 的 poll_seconds，0 = 關掉)
+        self._poll_timer = QTimer(self)
+        self._poll_timer.timeout.connect(self.refresh_changes)
+        # 掃描中檔名一批批進來時，搜尋條件的選項最多 100ms 重建一次
+        self._scan_filter_timer = QTimer(self)
+        self._scan_filter_timer.setSingleShot(True)
+        self._scan_filter_timer.setInterval(100)
+        self._scan_filter_timer.timeout.connect(self.refresh_filter_options)
+        
+        self.content_index = None           # 內文的全文搜尋索引 (第一次內容搜尋才建，見 ensure_content_index)
+        self._content_indexer = None
+        self.versions = VersionRegistry()   # 每個檔案 / token 群組目前的版號 (也是背景載入時順便建)
+        self._filtered_files = []           # 目標清單目前篩出來的檔案 (批次選項用)
+        self._auto_seq = ""                 # 流水號欄位是自動帶入的值 (使用者自己改過就不蓋掉)
+        self._batch = None          # 目前在跑的批次更新
+        self._dry_run = None        # 最近一次的乾跑預覽視窗
+        self._export = None         # 目前在跑的報表匯出
+        self._git_repo = None       # 資料夾在 git repo 裡的話 (載入時偵測)
+        self._git_state = None      # 上次掃描時的 git 快照
+        self._git_commit = None     # 目前在跑的 git commit
+        self._batch_progress = None # 批次更新 / 復原的進度視窗
+        self._undo = None           # 目前在跑的復原
+        # --- 預覽: 背景讀 + 預先讀前後幾個 (網路磁碟一格一格往下看才不會每格都卡) ---
+        self.previews = None        # 目前資料夾的 PreviewLoader (載入時換新的)
+        self.preview_opener = open  # 開檔用的函式 (bench_notes.py 會換成故意變慢的)
+        self._preview_signals = PreviewSignals()
+        self._preview_signals.ready.connect(self.on_preview_ready)
+        self._preview_name = None       # 預覽區目前顯示的檔名
+        self._preview_index = -1        # 上次預先讀取時選到第幾個 (判斷往上還是往下)
+        self._preview_selected_at = 0.0 # 換選擇的時間 (紀錄選到顯示花多久)
+        
+        # --- 啟動: 先把上次的樣子畫出來，第二頁跟真的載入都等第一次畫完再做 ---
+        self._update_tab_ready = False # 第二頁 (搜尋與更新) 用到才建，見 ensure_update_tab
+        self._snapshot_names = None    # 畫了上次快照的話: 還沒被這次掃描確認過的檔名
+        self._saved_filters = None     # 上次關程式時的搜尋條件 (快照模式才還原)
+        self._startup_load = None      # 第一次畫完要怎麼載入: "snapshot" / "full" / None (沒資料夾)
+        self._startup_done = False
+        self._snapshot_rows = 0
+        self._first_paint_at = None
+        self._interactive_at = None
         self.setup_ui()
+        self.recover_unfinished_batches()
         self.load_settings()
 
     def setup_ui(self):
@@ -45,11 +944,15 @@ class FepReleaseManager(QWidget):
         self.tab_read = QWidget()
         self.tab_update = QWidget()
         
+        self.tab_diag = QWidget()
+        
         self.tabs.addTab(self.tab_read, "📂 讀取與設定")
         self.tabs.addTab(self.tab_update, "📝 搜尋與更新")
+        self.tabs.addTab(self.tab_diag, "🩺 診斷")
         
         self.setup_read_tab()   #建立讀取設定分頁功能
-        self.setup_update_tab() #建立更新分頁功能
+        # 更新分頁元件很多，開程式時先放空的，第一次畫完 (或切過去) 才建，見 ensure_update_tab
+        self.setup_diagnostics_tab() #效能診斷 (平常藏起來，Ctrl+Shift+D 打開)
         
         main_layout.addWidget(self.tabs)
         self.setLayout(main_layout)
@@ -62,7 +965,7 @@ class FepReleaseManager(QWidget):
         
         path_layout = QHBoxLayout()
         self.path_input = QLineEdit()
-        self.path_input.setPlaceholderText("可直接貼上路徑並按 Enter，或點擊右側按鈕...路徑會自動記憶，不用每次都選...")
+        self.path_input.setPlaceholderText("可直接貼上路徑並按 Enter，或點擊右側按鈕...多個資料夾用 ; 隔開，路徑會自動記憶")
         self.path_input.setReadOnly(False)
         
         # 當你在框框裡按 Enter，就會呼叫 on_path_entered
@@ -70,22 +973,52 @@ class FepReleaseManager(QWidget):
         
         self.browse_btn = QPushButton("選擇路徑")
         self.browse_btn.clicked.connect(self.select_folder)
+        self.add_root_btn = QPushButton("加入路徑")
+        self.add_root_btn.clicked.connect(self.add_folder)
         
         path_layout.addWidget(self.path_input)
         path_layout.addWidget(self.browse_btn)
+        path_layout.addWidget(self.add_root_btn)
+        
+        # 掃描範圍: 要收哪些檔、排除哪些 (glob，用 ; 隔開)、要不要往子資料夾掃
+        scan_layout = QHBoxLayout()
+        self.include_input = QLineEdit()
+        self.include_input.setPlaceholderText("*.txt")
+        self.include_input.returnPressed.connect(self.on_path_entered)
+        self.exclude_input = QLineEdit()
+        self.exclude_input.setPlaceholderText("例如 archive; old/*; *.bak.txt")
+        self.exclude_input.returnPressed.connect(self.on_path_entered)
+        self.recursive_check = QCheckBox("包含子資料夾")
+        self.recursive_check.toggled.connect(self.on_path_entered)
+        scan_layout.addWidget(QLabel("包含:"))
+        scan_layout.addWidget(self.include_input)
+        scan_layout.addWidget(QLabel("排除:"))
+        scan_layout.addWidget(self.exclude_input)
+        scan_layout.addWidget(self.recursive_check)
         
-        self.file_table = QTableWidget()
-        self.file_table.setColumnCount(2)
-        self.file_table.setHorizontalHeaderLabels(["檔案名稱", "完整內容"])
+        self.table_model = NoteTableModel(self, body_job=self.table_body_job)
+        self.file_table = QTableView()
+        self.file_table.setModel(self.table_model)
         header = self.file_table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Interactive)
         header.setSectionResizeMode(1, QHeaderView.Stretch)
         self.file_table.setColumnWidth(0, 250)
         self.file_table.setWordWrap(True)
-        self.file_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        # 不用 ResizeToContents (每次都要重量每一列，檔案一多就卡死)
+        # 列高改成照內文行數算好存起來，見 apply_row_heights
+        v_header = self.file_table.verticalHeader()
+        v_header.setSectionResizeMode(QHeaderView.Fixed)
+        v_header.setDefaultSectionSize(self._row_height(1))
+        
+        # 背景載入進度 (沒在載入就藏起來)
+        self.load_progress = QProgressBar()
+        self.load_progress.setFormat("讀取中... %v / %m")
+        self.load_progress.hide()
 
         layout.addLayout(path_layout)
+        layout.addLayout(scan_layout)
         layout.addWidget(self.file_table)
+        layout.addWidget(self.load_progress)
         self.tab_read.setLayout(layout)
 
     # ==========================
@@ -99,27 +1032,54 @@ class FepReleaseManager(QWidget):
         # --- 1. 搜尋與選檔區 ---
         filter_group = QFormLayout()
         
-        filter_hbox = QHBoxLayout()
-        self.filter_combo_1 = QComboBox()
-        self.filter_combo_1.setPlaceholderText("關鍵字 A")
-        self.filter_combo_1.setEditable(True)
-        self.filter_combo_1.currentTextChanged.connect(self.on_filter_1_changed)
-
-        self.filter_combo_2 = QComboBox()
-        self.filter_combo_2.setPlaceholderText("關鍵字 B")
-        self.filter_combo_2.setEditable(True)
-        self.filter_combo_2.currentTextChanged.connect(self.apply_final_filter)
-        
-        filter_hbox.addWidget(QLabel("搜尋條件(可不選):"))
-        filter_hbox.addWidget(self.filter_combo_1)
-        filter_hbox.addWidget(self.filter_combo_2)
+        # 檔名切幾段就有幾層條件: A、B 固定顯示，更深的 (C、D...) 有資料才長出來
+        self.filter_hbox = QHBoxLayout()
+        self.filter_hbox.addWidget(QLabel("搜尋條件(可不選):"))
+        self.filter_combos = []
+        for _ in range(self.MIN_FILTER_LEVELS):
+            self._add_filter_combo()
+        filter_hbox = self.filter_hbox
         
         self.target_file_combo = QComboBox()
         self.target_file_combo.setPlaceholderText("請選擇目標檔案...")
-        self.target_file_combo.currentIndexChanged.connect(self.preview_target_file)
+        # 用方向鍵一路往下按時，停下來才讀預覽
+        self.target_file_combo.currentIndexChanged.connect(self.schedule_preview)
+        # 目前版號不用讀檔 (VersionRegistry 已經有了)，換選擇馬上更新
+        self.target_file_combo.currentIndexChanged.connect(self.update_version_hint)
+        
+        # 每打一個字都會觸發，先等 150ms 沒再打字才真的篩 (記住最上面是哪一層被改)
+        self._dirty_filter_level = None
+        self._filter_debounce = self._make_debounce(150, self.on_filter_debounced)
+        self._preview_debounce = self._make_debounce(150, self.on_preview_debounced)
+
+        # 內容搜尋: 找哪些 note 有提到某個單號 / 模組 / 舊版號 (中文也可以)
+        search_hbox = QHBoxLayout()
+        self.content_search = QLineEdit()
+        self.content_search.setPlaceholderText("內容搜尋 (可不填): 單號、模組、版號、中文關鍵字...")
+        self.content_search.setClearButtonEnabled(True)
+        self.content_search.textChanged.connect(self.schedule_content_search)
+        self.search_status = QLabel("")
+        search_hbox.addWidget(self.content_search)
+        search_hbox.addWidget(self.search_status)
+        # 打字時不要每個字都搜，停 250ms 再搜
+        self._search_debounce = self._make_debounce(250, self.apply_final_filter)
+
+        # 匯出報表: 目前篩出來的檔案 (沒篩就是整個資料夾) 彙整成一份 Markdown / JSON / CSV
+        export_hbox = QHBoxLayout()
+        self.export_group = QComboBox()
+        for label, group_by in [("依檔名 token 分組", ("token",)), ("依版號分組", ("version",)),
+                                ("token → 版號", ("token", "version")), ("不分組", ())]:
+            self.export_group.addItem(label, group_by)
+        self.export_btn = QPushButton("📄 匯出報表...")
+        self.export_btn.clicked.connect(self.export_report_logic)
+        export_hbox.addWidget(self.export_group)
+        export_hbox.addWidget(self.export_btn)
+        export_hbox.addStretch()
 
         filter_group.addRow(filter_hbox)
+        filter_group.addRow("🔍 內容搜尋:", search_hbox)
         filter_group.addRow("👉 目標檔案:", self.target_file_combo)
+        filter_group.addRow("📦 匯出:", export_hbox)
         
         layout.addLayout(filter_group)
         
@@ -130,6 +1090,9 @@ class FepReleaseManager(QWidget):
         self.preview_area.setReadOnly(True)
         self.preview_area.setStyleSheet("background-color: #f0f0f0; color: #333;")
         self.preview_area.setMaximumHeight(150) # 限制高度，不要佔滿整個畫面
+        # 大檔案只先讀第一頁，捲到底再讀下一頁
+        self._preview_reader = None
+        self.preview_area.verticalScrollBar().valueChanged.connect(self.on_preview_scrolled)
         layout.addWidget(self.preview_area)
         
         # --- 3. [修改點] 版號輸入區 (依照你的嚴格要求) ---
@@ -137,7 +1100,7 @@ class FepReleaseManager(QWidget):
         ver_group = QHBoxLayout()
         
         self.ver_stage = QComboBox()
-        self.ver_stage.addItems(["1", "2"]) # 階段別
+        self.ver_stage.addItems(VERSION_STAGES) # 階段別
         self.ver_stage.setFixedWidth(50)
         
         self.ver_seq = QLineEdit()
@@ -145,9 +1108,15 @@ class FepReleaseManager(QWidget):
         self.ver_seq.setFixedWidth(80)
         
         self.ver_env = QComboBox()
-        self.ver_env.addItems(["D", "T", "P"]) # 環境別
+        self.ver_env.addItems(VERSION_ENVS) # 環境別
         self.ver_env.setFixedWidth(50)
         
+        # 換階段 / 環境時，建議的下一號也跟著變
+        self.ver_stage.currentTextChanged.connect(self.update_version_hint)
+        self.ver_env.currentTextChanged.connect(self.update_version_hint)
+        self.version_info = QLabel("") # 選中的檔案 / 整批目前是什麼版號
+        self.version_info.setStyleSheet("color: #555;")
+        
         ver_group.addWidget(QLabel("新版號設定:"))
         ver_group.addWidget(QLabel("    [階段別]"))
         ver_group.addWidget(self.ver_stage)
@@ -156,6 +1125,7 @@ class FepReleaseManager(QWidget):
         ver_group.addWidget(QLabel("    [環境別]"))
         ver_group.addWidget(self.ver_env)
         ver_group.addWidget(QLabel(""))
+        ver_group.addWidget(self.version_info)
         ver_group.addStretch() # 把東西推到左邊
         
         layout.addLayout(ver_group)
@@ -167,46 +1137,164 @@ class FepReleaseManager(QWidget):
         layout.addWidget(self.content_input)
         
         # --- 5. 按鈕 ---
+        btn_hbox = QHBoxLayout()
+        self.dry_run_btn = QPushButton("預覽差異 (Dry Run)")
+        self.dry_run_btn.setStyleSheet("padding: 10px;")
+        self.dry_run_btn.clicked.connect(self.dry_run_logic)
         self.update_btn = QPushButton("執行更新 (Update)")
         self.update_btn.setStyleSheet("background-color: #0078d7; color: white; font-weight: bold; padding: 10px;")
         self.update_btn.clicked.connect(self.update_file_logic)
-        layout.addWidget(self.update_btn)
+        # 資料夾在 git repo 裡才會出現: 更新完整批 add + commit (一個 commit)
+        self.git_commit_check = QCheckBox("完成後 git commit")
+        self.git_commit_check.setChecked(str(self.settings.value("git_auto_commit", "false")).lower() == "true")
+        self.git_commit_check.setVisible(False)
+        # 復原最近 N 批 (寫回更新前的內容)，沒有備份可以復原時不能按
+        self.undo_count = QSpinBox()
+        self.undo_count.setRange(1, 1)
+        self.undo_count.setPrefix("最近 ")
+        self.undo_count.setSuffix(" 批")
+        self.undo_btn = QPushButton("↩ 復原")
+        self.undo_btn.setStyleSheet("padding: 10px;")
+        self.undo_btn.clicked.connect(self.undo_logic)
+        btn_hbox.addWidget(self.dry_run_btn)
+        btn_hbox.addWidget(self.update_btn, 1)
+        btn_hbox.addWidget(self.git_commit_check)
+        btn_hbox.addWidget(self.undo_count)
+        btn_hbox.addWidget(self.undo_btn)
+        layout.addLayout(btn_hbox)
         
         self.tab_update.setLayout(layout)
+        self.refresh_undo_state()
+
+    # ==========================
+    # 分頁 3: 診斷 (每個階段花多久)
+    # ==========================
+    def setup_diagnostics_tab(self):
+        layout = QVBoxLayout()
+        
+        self.diag_table = QTableWidget(0, 6)
+        self.diag_table.setHorizontalHeaderLabels(
+            ["階段", "次數", "最近 (ms)", "平均 (ms)", "p95 (ms)", "最大 (ms)"])
+        self.diag_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.diag_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.diag_table.verticalHeader().hide()
+        
+        self.diag_info = QLabel("")
+        self.diag_info.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        
+        btn_layout = QHBoxLayout()
+        refresh_btn = QPushButton("重新整理")
+        refresh_btn.clicked.connect(self.refresh_diagnostics)
+        reset_btn = QPushButton("清除統計")
+        reset_btn.clicked.connect(lambda: (tracer.reset(), self.refresh_diagnostics()))
+        btn_layout.addWidget(refresh_btn)
+        btn_layout.addWidget(reset_btn)
+        btn_layout.addStretch()
+        
+        layout.addWidget(self.diag_table)
+        layout.addWidget(self.diag_info)
+        layout.addLayout(btn_layout)
+        self.tab_diag.setLayout(layout)
+        
+        # 開著這一頁的時候每秒更新一次
+        self._diag_timer = QTimer(self)
+        self._diag_timer.setInterval(1000)
+        self._diag_timer.timeout.connect(self.refresh_diagnostics)
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        
+        QShortcut(QKeySequence("Ctrl+Shift+D"), self, activated=self.toggle_diagnostics)
+        show = str(self.settings.value("show_diagnostics", "false")).lower() == "true"
+        self.set_diagnostics_visible(show)
+
+    def set_diagnostics_visible(self, visible):
+        self.tabs.setTabVisible(self.tabs.indexOf(self.tab_diag), visible)
+
+    def toggle_diagnostics(self):
+        index = self.tabs.indexOf(self.tab_diag)
+        visible = not self.tabs.isTabVisible(index)
+        self.set_diagnostics_visible(visible)
+        if visible:
+            self.tabs.setCurrentIndex(index)
+
+    def on_tab_changed(self, index):
+        if self.tabs.widget(index) is self.tab_update:
+            self.ensure_update_tab()
+        if self.tabs.widget(index) is self.tab_diag:
+            self.refresh_diagnostics()
+            self._diag_timer.start()
+        else:
+            self._diag_timer.stop()
+
+    def refresh_diagnostics(self):
+        rows = tracer.snapshot()
+        self.diag_table.setRowCount(len(rows))
+        for row, (stage, count, last_ms, avg_ms, p95_ms, max_ms) in enumerate(rows):
+            values = [stage, str(count)] + [f"{v:.1f}" for v in (last_ms, avg_ms, p95_ms, max_ms)]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.diag_table.setItem(row, col, item)
+        info = f"Log: {tracer.log_path or '(沒有寫 log)'}"
+        if tracer.profiling:
+            info += f"\ncProfile 錄製中，關程式時寫到: {tracer.profile_path}"
+        self.diag_info.setText(info)
 
     # ==========================
     # 核心邏輯
     # ==========================
-    def on_path_entered(self):
-        # 1. 取得使用者輸入的文字，並去除頭尾空白
-        raw_path = self.path_input.text().strip()
+    def current_scan_spec(self):
+        """ 照畫面上的路徑 / glob / 子資料夾勾選組出 ScanSpec """
+        return ScanSpec.parse(self.path_input.text(),
+                              self.include_input.text().strip() or "*.txt",
+                              self.exclude_input.text(), self.recursive_check.isChecked())
+
+    def on_path_entered(self, *args):
+        # 1. 取得使用者輸入的文字 (可以是 "路徑A; 路徑B")，並去除頭尾空白
+        spec = self.current_scan_spec()
         
-        if not raw_path:
+        if not spec.roots:
             return # 空的就不理你
 
         # 2. [防呆機制] 檢查路徑是否存在，且必須是「資料夾」
-        if os.path.exists(raw_path) and os.path.isdir(raw_path):
+        missing = [root for root in spec.roots if not os.path.isdir(root)]
+        try:
+            base = spec.base
+        except ValueError:
+            base = None # 不同磁碟機，沒有共同的上層資料夾
+        if not missing and base:
+            if spec == self.scan_spec and self.index.spec == spec:
+                # 同一個資料夾再按一次 Enter: 只重讀有變的檔案就好
+                self.refresh_changes()
+                return
+            
             # 驗證通過！更新全域變數
-            self.current_folder = raw_path
+            self.scan_spec = spec
+            self.current_folder = base
             
             # 這裡可以順便存入設定，這樣下次打開還是這個路徑
-            self.settings.setValue("last_folder", raw_path)
+            self.settings.setValue("last_folder", spec.text)
+            self.settings.setValue("scan_include", LIST_SEPARATOR.join(spec.include))
+            self.settings.setValue("scan_exclude", LIST_SEPARATOR.join(spec.exclude))
+            self.settings.setValue("scan_recursive", "true" if spec.recursive else "false")
             
-            # 呼叫核心載入邏輯
-            self.load_files_to_table()
-            self.init_search_filters()
+            # 呼叫核心載入邏輯 (背景跑，掃完檔名會自動初始化 Filter)
+            self.load_files_to_table(reset_filters=True)
             
             # 給點回饋，讓使用者知道成功了 (可以在狀態列顯示，這裡用 Print 代替)
-            print(f"認證: 路徑已切換至 {raw_path}")
+            print(f"認證: 路徑已切換至 {spec.text}")
             
         else:
             # 路徑錯誤，並還原
-            QMessageBox.warning(self, "路徑錯誤", 
-                                f"找不到這個路徑：\n{raw_path}\n\n請確認你沒打錯字，且這必須是一個「資料夾」！")
+            if missing:
+                QMessageBox.warning(self, "路徑錯誤", 
+                                    f"找不到這個路徑：\n{missing[0]}\n\n請確認你沒打錯字，且這必須是一個「資料夾」！")
+            else:
+                QMessageBox.warning(self, "路徑錯誤", "這幾個資料夾不在同一個磁碟機，沒辦法一起載入！")
             
             # 如果之前有有效的路徑，幫你切換回去 (貼心吧？)
             if self.current_folder:
-                self.path_input.setText(self.current_folder)
+                self.path_input.setText(self.scan_spec.text)
             else:
                 self.path_input.clear()
     
@@ -215,192 +1303,617 @@ class FepReleaseManager(QWidget):
         if folder:
             self.path_input.setText(folder)
             self.on_path_entered()
+
+    def add_folder(self):
+        """ 多加一個根資料夾 (跟目前的一起載入) """
+        folder = QFileDialog.getExistingDirectory(self, "加入資料夾")
+        if folder:
+            roots = split_list(self.path_input.text()) + [folder]
+            self.path_input.setText(f"{LIST_SEPARATOR} ".join(roots))
+            self.on_path_entered()
             
 
+    def recover_unfinished_batches(self):
+        """ 上次批次更新寫到一半就掛掉的話，在載入資料夾之前先收尾 """
+        messages = recover_journals(self.journal_dir)
+        if messages:
+            # 等視窗出來再跳訊息
+            QTimer.singleShot(0, lambda: QMessageBox.information(
+                self, "批次更新復原", "\n\n".join(messages)))
+
     def load_settings(self):
-        # 從設定檔讀取路徑
+        # 從設定檔讀取路徑 (跟掃描範圍)
         saved_folder = self.settings.value("last_folder")
-        if saved_folder and os.path.exists(saved_folder):
-            self.current_folder = saved_folder
-            self.path_input.setText(saved_folder)
-            self.load_files_to_table()
-            self.init_search_filters()
+        self.include_input.setText(self.settings.value("scan_include", "*.txt"))
+        self.exclude_input.setText(self.settings.value("scan_exclude", ""))
+        self.recursive_check.blockSignals(True)
+        self.recursive_check.setChecked(str(self.settings.value("scan_recursive", "false")).lower() == "true")
+        self.recursive_check.blockSignals(False)
+        if not saved_folder:
+            return
+        self.path_input.setText(saved_folder)
+        spec = self.current_scan_spec()
+        if spec.roots and all(os.path.exists(root) for root in spec.roots):
+            try:
+                self.current_folder = spec.base
+            except ValueError:
+                return
+            self.scan_spec = spec
+            # 真的載入等視窗畫出來再開始 (finish_startup)，這裡先把上次的樣子畫上去
+            self._startup_load = "snapshot" if self.show_startup_snapshot() else "full"
             print(f"記憶: 已自動載入 {saved_folder}")
+        else:
+            self.path_input.clear()
 
-    def load_files_to_table(self):
-        self.file_table.setRowCount(0)
-        if not self.current_folder: return
-        
+    # ==========================================
+    #  Logic: 啟動 (先畫上次的快照，第二頁 / 真的載入延到第一次畫完)
+    # ==========================================
+    def show_startup_snapshot(self):
+        """
+        用內容快取裡上次這個資料夾的樣子先填表格 / 索引 / 版號 (不 stat、不讀檔)
+        config.ini 的 startup_snapshot=false 可以關掉。回傳: 有沒有畫
+        """
+        if self.cache is None or str(self.settings.value("startup_snapshot", "true")).lower() == "false":
+            return False
+        with tracer.span("startup_snapshot") as extra:
+            rows = self.cache.snapshot(self.current_folder)
+            extra["rows"] = len(rows)
+            if not rows:
+                return False
+            self.index = FolderIndex(self.scan_spec)
+            self.index.apply_changes([NoteEntry(name, os.path.join(self.current_folder, name), tokens,
+                                                size, mtime_ns)
+                                      for name, size, mtime_ns, tokens, _ in rows], [])
+            self.table_model.set_names([row[0] for row in rows])
+            self.apply_row_heights(self.table_model.set_bodies([(row[0], row[4]) for row in rows]))
+            self.versions.update_many([(name, tokens, body) for name, _, _, tokens, body in rows])
+        self._snapshot_rows = len(rows)
         try:
-            files = [f for f in os.listdir(self.current_folder) if f.endswith(".txt")]
-            for f_name in files:
-                full_path = os.path.join(self.current_folder, f_name)
-                
-                content = ""
-                try:
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        lines = f.readlines()
-                        # 過濾掉 # 開頭的行
-                        filtered_lines = [line for line in lines if not line.strip().startswith("#")]
-                        content = "".join(filtered_lines).strip()
-                except: content = "(讀取失敗)"
-                
-                row = self.file_table.rowCount()
-                self.file_table.insertRow(row)
-                
-                # [修改點] 這裡！切掉副檔名再顯示
-                # f_name 是 "abc.txt"，display_name 變成 "abc"
-                display_name = os.path.splitext(f_name)[0] 
-                
-                self.file_table.setItem(row, 0, QTableWidgetItem(display_name))
-                
-                item = QTableWidgetItem(content)
-                item.setToolTip(content[:200] + "...")
-                self.file_table.setItem(row, 1, item)
-                
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+            self._saved_filters = json.loads(self.settings.value("last_filters", "") or "{}")
+        except ValueError:
+            self._saved_filters = None
+        return True
 
-    def init_search_filters(self):
-        """ 初始化 Filter 1 (加入去副檔名邏輯) """
-        self.filter_combo_1.blockSignals(True)
-        self.filter_combo_1.clear()
-        self.filter_combo_2.clear()
-        self.target_file_combo.clear()
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._startup_done:
+            QTimer.singleShot(self.STARTUP_FALLBACK_MS, self.finish_startup)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self._first_paint_at is None:
+            self._first_paint_at = time.perf_counter()
+            # 這一輪畫完 (event loop 回來) 才開始做事
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """ 第一次畫完之後: 建第二頁、開始真的載入資料夾 """
+        if self._startup_done: return
+        self._startup_done = True
+        first_paint = (self._first_paint_at or time.perf_counter()) - STARTED
+        unpack = unpack_seconds()
+        budget_ms = int(self.settings.value("startup_budget_ms", 1000))
+        tracer.record("startup_first_paint", first_paint, snapshot_rows=self._snapshot_rows,
+                      unpack_ms=None if unpack is None else round(unpack * 1000), budget_ms=budget_ms)
+        if budget_ms > 0 and first_paint * 1000 > budget_ms:
+            print(f"警告: 開程式到畫出視窗花了 {first_paint * 1000:.0f} ms，超過預算 {budget_ms} ms")
+        
+        with tracer.span("startup_update_tab"):
+            self.ensure_update_tab()
+        mode, self._startup_load = self._startup_load, None
+        if mode == "snapshot":
+            self.load_files_to_table(keep_rows=True) # 快照留著，掃完再對帳
+        elif mode == "full":
+            self.load_files_to_table(reset_filters=True)
+        else:
+            self.mark_interactive() # 沒有資料夾要載，第二頁建好就能用了
+
+    def ensure_update_tab(self):
+        """ 第二頁 (搜尋與更新) 第一次用到才建；建好順便初始化搜尋條件 (有快照的話還原上次的) """
+        if self._update_tab_ready: return
+        self._update_tab_ready = True
+        self.setup_update_tab()
+        self.init_search_filters()
+        saved, self._saved_filters = self._saved_filters, None
+        if saved and self.current_folder:
+            self.restore_filters(saved)
+
+    def restore_filters(self, saved):
+        """ 把 save_filters 存的條件套回去 (選項不存在的就當沒打) """
+        keys = [str(k) for k in saved.get("keys", [])]
+        while len(self.filter_combos) < len(keys):
+            self._add_filter_combo()
+        for combo, key in zip(self.filter_combos, keys):
+            combo.blockSignals(True)
+            combo.setCurrentText(key)
+            combo.blockSignals(False)
+        self.content_search.blockSignals(True)
+        self.content_search.setText(str(saved.get("search", "")))
+        self.content_search.blockSignals(False)
+        self.rebuild_filter_levels(1, keep_text=True)
+        self.apply_final_filter()
+        target = str(saved.get("target", ""))
+        idx = self.target_file_combo.findText(target) if target and not target.startswith("===") else -1
+        if idx > 0:
+            self.target_file_combo.setCurrentIndex(idx)
+
+    def save_filters(self):
+        """ 關程式時記下目前的搜尋條件，下次開 (有快照) 直接還原 """
+        if not self._update_tab_ready: return
+        self.settings.setValue("last_filters", json.dumps({
+            "keys": self.filter_keys(),
+            "search": self.content_search.text(),
+            "target": self.target_file_combo.currentText()}, ensure_ascii=False))
+
+    def mark_interactive(self):
+        """ 開程式後第一次可以拿真的資料篩選 / 更新 (檔名都掃完了) 的時間點 """
+        if self._interactive_at is not None: return
+        self._interactive_at = time.perf_counter()
+        tracer.record("startup_interactive", self._interactive_at - STARTED,
+                      files=len(self.index.entries), snapshot_rows=self._snapshot_rows)
+        print(f"效能: {self.startup_report()[0]}")
+        self.interactive.emit()
+
+    def startup_report(self):
+        """ 回傳: (給人看的一行字, 第一次畫面有沒有在預算內) """
+        budget_ms = int(self.settings.value("startup_budget_ms", 1000))
+        paint_ms = ((self._first_paint_at or time.perf_counter()) - STARTED) * 1000
+        text = f"啟動 第一次畫面 {paint_ms:.0f} ms"
+        if self._interactive_at is not None:
+            text += f" / 可以操作 {(self._interactive_at - STARTED) * 1000:.0f} ms"
+        text += f" (預算 {budget_ms} ms，快照 {self._snapshot_rows} 筆"
+        unpack = unpack_seconds()
+        if unpack is not None:
+            text += f"，exe 解壓 {unpack * 1000:.0f} ms"
+        text += ")"
+        return text, budget_ms <= 0 or paint_ms <= budget_ms
+
+    def load_files_to_table(self, reset_filters=False, keep_rows=False):
+        """
+        (背景) 重新載入表格。檔名掃到一批就列一批 (一個子資料夾一個子資料夾來)，內容讀完一批填一批。
+        reset_filters=True 代表換了資料夾，要順便清掉舊的搜尋條件。
+        keep_rows=True: 開程式畫的快照先留著 (照樣可以篩選)，掃完再對帳 (見 on_folder_scanned)
+        """
+        self.cancel_loading()
+        self.ensure_update_tab()
+        self._load_generation += 1
+        self._load_started = time.perf_counter()
+        self.watch_dirs([])
+        
+        if keep_rows:
+            self._snapshot_names = set(self.index.entries)
+        else:
+            # 舊資料夾的索引/選項先清掉，免得載入期間選到不存在的檔案
+            self._snapshot_names = None
+            self.table_model.set_names([])
+            self.index = FolderIndex(self.scan_spec)
+        if reset_filters:
+            self.init_search_filters()
         
         if not self.current_folder: return
         
-        files = [f for f in os.listdir(self.current_folder) if f.endswith(".txt")]
-        tokens_1 = set()
+        self.load_progress.setRange(0, 0) # 還不知道有幾個檔案，先轉圈圈
+        self.load_progress.show()
         
-        for f in files:
-            parts = f.split("-")
-            if len(parts) > 1:
-                # [修改點] 這裡！針對 parts[1] 也要做淨化
-                # 範例 A: fep-batch.txt      -> parts[1]="batch.txt" -> clean="batch"
-                # 範例 B: fep-batch-task.txt -> parts[1]="batch"     -> clean="batch"
-                raw_part_1 = parts[1]
-                clean_part_1 = raw_part_1.split(".")[0]
-                
-                tokens_1.add(clean_part_1)
+        self.content_index = None # 每次重新載入都丟掉，等有人搜內容再建
+        if self.previews is not None:
+            self.previews.close()
+        generation = self._load_generation
+        self.previews = PreviewLoader(self.current_folder, opener=self.preview_opener,
+                                      on_ready=lambda page: self._preview_signals.ready.emit(generation, page))
+        if not keep_rows:
+            self.versions = VersionRegistry() # 快照的版號先留著用，讀到真的內文會一個個蓋掉
+        self._git_repo, self._git_state = None, None
+        # config.ini 的 git_integration=false 可以關掉 (預設: 資料夾在 git repo 裡就用)
+        use_git = str(self.settings.value("git_integration", "true")).lower() != "false"
+        self._loader = FolderLoadWorker(self._load_generation, self.scan_spec, self.cache,
+                                        self.versions, use_git)
+        self._loader.signals.entries_found.connect(self.on_entries_found)
+        self._loader.signals.scanned.connect(self.on_folder_scanned)
+        self._loader.signals.batch_ready.connect(self.on_bodies_loaded)
+        self._loader.signals.finished.connect(self.on_loading_finished)
+        self._loader.signals.failed.connect(self.on_loading_failed)
+        QThreadPool.globalInstance().start(self._loader)
+
+    def cancel_loading(self):
+        """ 中止目前的背景載入 (換資料夾、關視窗時) """
+        if self._loader is not None:
+            self._loader.cancel()
+            self._loader = None
+        self._change_scan = None # 舊的增量掃描結果會被 generation 擋掉
+        if self._content_indexer is not None:
+            self._content_indexer.cancel()
+            self._content_indexer = None
+        self._pending_touched = None
+        self.load_progress.hide()
+
+    def on_entries_found(self, generation, entries):
+        """ 掃到一批檔名 (某些子資料夾掃完了): 先加進索引跟表格 """
+        if generation != self._load_generation: return
+        
+        if self._snapshot_names is not None:
+            self._snapshot_names.difference_update(entry.name for entry in entries)
+        with tracer.span("table_fill", rows=len(entries), source="scan"):
+            self.index.apply_changes(entries, [])
+            rows = self.table_model.add_names([entry.name for entry in entries])
+            self.apply_row_heights(rows)
+        # 選項不用每批都重建，最多 100ms 一次
+        if not self._scan_filter_timer.isActive():
+            self._scan_filter_timer.start()
+
+    def on_folder_scanned(self, generation, dir_mtimes):
+        """ 整棵樹掃完: 記下每個資料夾的 mtime、開始監看，接下來讀內容 """
+        if generation != self._load_generation: return
         
-        sorted_tokens = sorted(list(tokens_1))
-        self.filter_combo_1.addItem("") 
-        self.filter_combo_1.addItems(sorted_tokens)
+        if self._snapshot_names is not None:
+            # 快照裡有、這次卻沒掃到的: 上次關程式之後被刪掉了
+            gone, self._snapshot_names = sorted(self._snapshot_names), None
+            self.index.apply_changes([], gone)
+            self.versions.remove(gone)
+            if len(gone) > self.BULK_INSERT_ROWS:
+                self.table_model.set_names(self.index.names()) # 內文等一下讀檔時會一批批補回來
+            else:
+                self.table_model.remove_names(gone)
+        self.index.apply_changes([], [], dir_mtimes)
+        self.watch_dirs(self.index.directories())
+        
+        self.load_progress.setRange(0, len(self.index.entries))
+        self.load_progress.setValue(0)
         
-        self.filter_combo_1.blockSignals(False)
-        # 觸發連動
-        self.on_filter_1_changed(self.filter_combo_1.currentText())
+        self._scan_filter_timer.stop()
+        self.refresh_filter_options()
+        self.mark_interactive()
+
+    def on_bodies_loaded(self, generation, batch):
+        """ 一批內容讀完了，填進表格 """
+        if generation != self._load_generation: return
+        
+        with tracer.span("table_fill", rows=len(batch), source="bodies"):
+            rows = self.table_model.set_bodies(batch)
+            self.apply_row_heights(rows)
+        self.load_progress.setValue(self.load_progress.value() + len(batch))
+
+    def table_body_job(self, names):
+        """
+        (GUI thread) 表格捲到的列內文不在記憶體裡了: 先在這裡拿好資料夾 / stat，回傳在背景跑的函式
+        快取裡 size/mtime 對得上的直接拿，其他的重讀檔案
+        """
+        folder, cache = self.current_folder, self.cache
+        entries = [self.index.entries[name] for name in names if name in self.index.entries]
+        def job():
+            hits, misses = cache.lookup(folder, entries) if cache is not None else ([], entries)
+            bodies = [(name, body) for name, _, body in hits]
+            for entry in misses:
+                try:
+                    bodies.append((entry.name, read_note(entry.path)[1]))
+                except Exception:
+                    bodies.append((entry.name, READ_FAILED))
+            return bodies
+        return job
+
+    def _row_height(self, lines):
+        """ N 行字需要的列高 (px) """
+        return lines * self.fontMetrics().lineSpacing() + 8
+
+    def apply_row_heights(self, rows):
+        """ 只調整有變的列，列高直接用 Model 快取的行數換算，不去量字 """
+        v_header = self.file_table.verticalHeader()
+        for row in rows:
+            height = self._row_height(self.table_model.line_count(row))
+            if v_header.sectionSize(row) != height:
+                v_header.resizeSection(row, height)
+
+    def on_loading_finished(self, generation):
+        if generation != self._load_generation or self._loader is None: return # 已經取消了 (關視窗)
+        self._git_repo, self._git_state = self._loader.git_repo, self._loader.git_state
+        self.git_commit_check.setVisible(self._git_repo is not None)
+        self._loader = None
+        self.load_progress.hide()
+        tracer.record("load_total", time.perf_counter() - self._load_started,
+                      files=len(self.index.entries), folder=self.current_folder)
+        self.update_version_hint() # 版號讀完了，建議的下一號才準
+        if self.content_search.text().strip():
+            # 載入期間還不能搜內容，讀完再搜一次 (順便開始建索引)
+            self.refresh_filter_options()
+
+    def ensure_content_index(self):
+        """
+        第一次搜內容才在背景建索引 (載入中先不建，等檔案都掃完)
+        建好之前搜到的是不完整的結果，建好會再搜一次 (見 on_content_index_ready)
+        """
+        if self.content_index is not None or self._loader is not None or not self.current_folder:
+            return
+        self.content_index = ContentIndex()
+        names = sorted(self.index.entries)
+        batch = FolderLoadWorker.CACHED_BATCH
+        jobs = [self.table_body_job(names[i:i + batch]) for i in range(0, len(names), batch)]
+        self._content_indexer = ContentIndexWorker(self._load_generation, self.content_index, jobs)
+        self._content_indexer.signals.finished.connect(self.on_content_index_ready)
+        QThreadPool.globalInstance().start(self._content_indexer)
+
+    def on_content_index_ready(self, generation):
+        if generation != self._load_generation or self._content_indexer is None: return
+        self._content_indexer = None
+        if self.content_search.text().strip():
+            self.refresh_filter_options()
+
+    def on_loading_failed(self, generation, err_msg):
+        if generation != self._load_generation: return
+        self._loader = None
+        self.load_progress.hide()
+        self.mark_interactive()
+        QMessageBox.critical(self, "Error", err_msg)
 
     # ==========================================
-    #  Logic: 級聯搜尋 (Cascading Search)
+    #  Logic: 監看資料夾 / 增量更新
     # ==========================================
-
-    def init_search_filters(self):
-        """ 初始化 Filter 1 (加入去副檔名邏輯) """
-        self.filter_combo_1.blockSignals(True)
-        self.filter_combo_1.clear()
-        self.filter_combo_2.clear()
-        self.target_file_combo.clear()
+    def watch_dirs(self, dirs):
+        """ 換監看目標 (根資料夾 + 掃到的子資料夾) """
+        old = self.watcher.directories()
+        if old:
+            self.watcher.removePaths(old)
+        self._poll_timer.stop()
+        if not self.current_folder: return
         
+        dirs = list(dirs)[:self.MAX_WATCHED_DIRS]
+        if dirs:
+            self.watcher.addPaths(dirs)
+        poll_seconds = int(self.settings.value("poll_seconds", 30))
+        if poll_seconds > 0:
+            self._poll_timer.start(poll_seconds * 1000)
+
+    def schedule_change_scan(self, *args):
+        self._change_debounce.start()
+
+    def refresh_changes(self, touched=()):
+        """
+        (背景) 增量更新: 只重讀新增/修改的檔案，刪掉的直接拿掉。
+        touched: 明確知道剛被改過的檔名 (例如剛更新完的那批)
+        """
         if not self.current_folder: return
+        if self._loader is not None:
+            return # 整個資料夾正在重新載入，不用多此一舉
+        if self._change_scan is not None:
+            # 上一輪還沒跑完，記下來等它結束再補掃
+            self._pending_touched = (self._pending_touched or set()) | set(touched)
+            return
         
-        files = [f for f in os.listdir(self.current_folder) if f.endswith(".txt")]
-        tokens_1 = set()
+        self._change_scan = ChangeScanWorker(self._load_generation, self.scan_spec,
+                                             self.index.stat_snapshot(), touched, self.cache,
+                                             self.content_index, self.versions,
+                                             self._git_repo, self._git_state,
+                                             self.index.dir_snapshot())
+        self._change_scan.signals.changes_ready.connect(self.on_changes_ready)
+        self._change_scan.signals.failed.connect(self.on_change_scan_failed)
+        QThreadPool.globalInstance().start(self._change_scan)
+
+    def on_changes_ready(self, generation, changes):
+        """ 套用增量變動到 索引 / 表格 / 搜尋條件 / 預覽 """
+        if generation != self._load_generation: return
+        scan, self._change_scan = self._change_scan, None
+        if changes.git_state is not None:
+            self._git_state = changes.git_state
+        if self.content_index is not None and scan is not None and scan.content_index is not self.content_index:
+            # 掃描開始時內容索引還沒建: 這幾個檔案在這裡補 (通常沒幾個)
+            for name in changes.removed:
+                self.content_index.remove(name)
+            self.content_index.add_many([(n, b) for n, b in changes.bodies if b != READ_FAILED])
         
-        for f in files:
-            parts = f.split("-")
-            if len(parts) > 1:
-                # [修改點] 這裡！針對 parts[1] 也要做淨化
-                # 範例 A: fep-batch.txt      -> parts[1]="batch.txt" -> clean="batch"
-                # 範例 B: fep-batch-task.txt -> parts[1]="batch"     -> clean="batch"
-                raw_part_1 = parts[1]
-                clean_part_1 = raw_part_1.split(".")[0]
-                
-                tokens_1.add(clean_part_1)
+        dirs_before = self.index.directories()
+        self.index.apply_changes(changes.upserts, changes.removed, changes.dir_mtimes)
+        if self.index.directories() != dirs_before:
+            self.watch_dirs(self.index.directories()) # 多了/少了子資料夾
         
-        sorted_tokens = sorted(list(tokens_1))
-        self.filter_combo_1.addItem("") 
-        self.filter_combo_1.addItems(sorted_tokens)
+        if not changes.is_empty():
+            if self.previews is not None:
+                self.previews.invalidate(list(changes.modified) + list(changes.removed))
+            self.table_model.remove_names(changes.removed)
+            if len(changes.added) > self.BULK_INSERT_ROWS:
+                # 整個子資料夾搬進來之類的: 一次重排比一筆一筆插快
+                self.apply_row_heights(self.table_model.add_names(changes.added))
+            else:
+                self.table_model.insert_names(changes.added)
+            # 插入/刪除時 header 會自己把其他列的高度跟著位移，只要調有重讀的列
+            rows = self.table_model.set_bodies(changes.bodies)
+            self.apply_row_heights(rows)
+            
+            if changes.added or changes.removed or self.content_search.text().strip():
+                self.refresh_filter_options()
+            elif self.target_file_combo.currentText() in changes.modified:
+                self.reload_preview()
+            self.update_version_hint()
         
-        self.filter_combo_1.blockSignals(False)
-        # 觸發連動
-        self.on_filter_1_changed(self.filter_combo_1.currentText())
+        if self._pending_touched is not None:
+            touched, self._pending_touched = self._pending_touched, None
+            self.refresh_changes(touched)
 
-    def on_filter_1_changed(self, text):
-        """ Filter 1 變動 -> 更新 Filter 2 (比對邏輯更新) """
-        key1 = text.strip() # 這是選單裡已經乾淨的 "batch"
-        
-        self.filter_combo_2.blockSignals(True)
-        self.filter_combo_2.clear()
-        
+    def on_change_scan_failed(self, generation, err_msg):
+        if generation != self._load_generation: return
+        self._change_scan = None
+        self._pending_touched = None
+        print(f"警告: 增量掃描失敗 -> {err_msg}")
+
+    def refresh_filter_options(self):
+        """ 檔案有增減: 重建選項，但盡量保留使用者目前選的條件跟目標檔案 """
+        target = self.target_file_combo.currentText()
+        self.rebuild_filter_levels(1, keep_text=True)
+        self.apply_final_filter()
+        # 原本選的檔案還在的話就選回去 (批次選項的數字可能變了，不用硬選回去)
+        if not target.startswith("==="):
+            idx = self.target_file_combo.findText(target)
+            if idx > 0:
+                self.target_file_combo.setCurrentIndex(idx)
+
+    def closeEvent(self, event):
+        # 關視窗時把背景載入停掉，不然程式要等它讀完才會結束
+        self.cancel_loading()
+        self.save_filters()
+        if self.previews is not None:
+            self.previews.close()
+        if self._batch is not None:
+            self._batch.cancel() # 寫到一半的檔案會寫完，排隊中的就不做了
+        if self._undo is not None:
+            self._undo.cancel()
+        if self._export is not None:
+            self._export.cancel()
+        super().closeEvent(event)
+
+    # ==========================================
+    #  Logic: 級聯搜尋 (Cascading Search)
+    # ==========================================
+
+    def init_search_filters(self):
+        """ 初始化所有條件 (選項直接從索引拿，不再 listdir) """
+        self._filter_debounce.stop()
+        self._dirty_filter_level = None
+        self.target_file_combo.clear()
+        self.rebuild_filter_levels(1)
         if not self.current_folder: return
-        
-        files = [f for f in os.listdir(self.current_folder) if f.endswith(".txt")]
-        tokens_2 = set()
-        
-        for f in files:
-            parts = f.split("-")
-            if len(parts) > 1: # 至少要有 part 1
-                
-                # [修改點] 檔案裡的 part 1 也要洗乾淨才能跟 key1 比對
-                raw_part_1 = parts[1]
-                clean_part_1 = raw_part_1.split(".")[0]
-                
-                if key1 == "" or clean_part_1 == key1:
-                    # 如果條件一吻合，且還有第三段，才收集 Filter 2
-                    if len(parts) > 2:
-                        raw_part_2 = parts[2]
-                        clean_part_2 = raw_part_2.split(".")[0] # 之前教你的
-                        tokens_2.add(clean_part_2)
-
-        sorted_tokens_2 = sorted(list(tokens_2))
-        self.filter_combo_2.addItem("")
-        self.filter_combo_2.addItems(sorted_tokens_2)
-        
-        self.filter_combo_2.blockSignals(False)
         self.apply_final_filter()
 
+    def _add_filter_combo(self):
+        """ 多一層條件 (第 n 層對應檔名的 parts[n]) """
+        level = len(self.filter_combos) + 1
+        combo = QComboBox()
+        combo.setPlaceholderText(f"關鍵字 {chr(ord('A') + level - 1)}" if level <= 26 else f"關鍵字 {level}")
+        combo.setEditable(True)
+        combo.currentTextChanged.connect(lambda *args, lv=level: self.schedule_filter(lv))
+        self.filter_hbox.addWidget(combo)
+        self.filter_combos.append(combo)
+        return combo
+
+    def filter_keys(self):
+        """ 目前每一層的條件 (沒顯示的層是空字串 = 不限) """
+        return [combo.currentText().strip() for combo in self.filter_combos]
+
+    def rebuild_filter_levels(self, start_level, keep_text=False):
+        """
+        從 start_level 開始往下重建每一層的選項，上一層的條件決定下一層有什麼
+        範例: fep-batch-task-sub.txt -> A: batch、B: task、C: sub
+        下一層沒有任何選項 (檔名沒那麼多段) 就把後面的層藏起來
+        keep_text=True: 保留使用者已經選/打的字 (檔案增減時用)
+        """
+        level = start_level
+        while True:
+            if self.current_folder:
+                keys = self.filter_keys()[:level - 1]
+                tokens = self.index.tokens_at(level, keys, prefix=True)
+            else:
+                tokens = []
+            combo = self.filter_combos[level - 1] if level <= len(self.filter_combos) else None
+            text = combo.currentText() if (keep_text and combo is not None) else ""
+            if level > self.MIN_FILTER_LEVELS and not tokens and not text.strip():
+                break
+            if combo is None:
+                combo = self._add_filter_combo()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem("")
+            combo.addItems(tokens)
+            combo.setCurrentText(text)
+            combo.setVisible(True)
+            combo.blockSignals(False)
+            level += 1
+
+        for combo in self.filter_combos[level - 1:]:
+            combo.blockSignals(True)
+            combo.clear()
+            combo.setVisible(False)
+            combo.blockSignals(False)
+
+    def _make_debounce(self, msec, slot):
+        """ 單發的 QTimer: 一直 start() 會一直往後延，停下來 msec 後才呼叫 slot """
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.setInterval(msec)
+        timer.timeout.connect(slot)
+        return timer
+
+    def schedule_filter(self, level):
+        if self._dirty_filter_level is None or level < self._dirty_filter_level:
+            self._dirty_filter_level = level
+        self._filter_debounce.start()
+
+    def schedule_preview(self, *args):
+        """
+        換了選擇: 快取裡有 (之前預先讀好的) 就馬上顯示，沒有的話等停下來再讀
+        用方向鍵一路往下按時，停下來才去讀 + 預先讀前後幾個
+        """
+        self._preview_selected_at = time.perf_counter()
+        self._preview_name = None
+        self._preview_reader = None
+        filename = self.target_file_combo.currentText()
+        page = None
+        if self.previews is not None and filename and not filename.startswith(("===", "(無")):
+            page = self.previews.get(filename)
+        if page is not None:
+            self.show_preview(page, "cache")
+        elif filename.startswith("==="):
+            self.preview_target_file() # 摘要只用記憶體裡的資料，不用等
+        else:
+            self.preview_area.setPlainText("(讀取中...)")
+        self._preview_debounce.start()
+
+    def on_preview_debounced(self):
+        """ 選擇停下來了: 目前這個還沒顯示的話先去讀，再預先讀前後幾個 """
+        if self._preview_name != self.target_file_combo.currentText():
+            self.preview_target_file()
+        self.prefetch_previews()
+
+    def prefetch_previews(self):
+        """ 目標清單裡目前選到的前後幾個先在背景讀起來 (往移動的方向多讀幾個) """
+        idx = self.target_file_combo.currentIndex() - 1 # 第 0 個是整批選項 (選它就從第一個檔案開始讀)
+        if self.previews is None or not -1 <= idx < len(self._filtered_files):
+            return
+        step = -1 if idx < self._preview_index else 1
+        self._preview_index = idx
+        self.previews.prefetch(self._filtered_files, idx, step)
+
+    def on_filter_debounced(self):
+        level, self._dirty_filter_level = self._dirty_filter_level, None
+        if level is not None:
+            self.on_filter_changed(level)
+
+    def on_filter_changed(self, level):
+        """ 第 level 層變動 -> 更新下面每一層的選項 (還沒打完的字用前綴比對)，再篩檔案 """
+        if not self.current_folder: return
+        with tracer.span("filter", level=level) as extra:
+            self.rebuild_filter_levels(level + 1)
+            self.apply_final_filter()
+            extra["results"] = max(0, self.target_file_combo.count() - 1)
+
     def apply_final_filter(self):
-        """ 最終篩選 (比對邏輯更新) """
-        key1 = self.filter_combo_1.currentText().strip()
-        key2 = self.filter_combo_2.currentText().strip()
+        """ 最終篩選 """
+        keys = self.filter_keys()
         
         self.target_file_combo.blockSignals(True)
         self.target_file_combo.clear()
+        self._filtered_files = []
         
         if not self.current_folder: return
 
-        files = [f for f in os.listdir(self.current_folder) if f.endswith(".txt")]
-        filtered_files = []
+        # 注意：如果使用者選了 key2，但檔案根本沒有 part 2 (例如 fep-batch.txt)，那就不算符合
+        # 「bat」這種還沒打完的字用前綴比對 (index 裡的前綴樹，不用掃全部檔案)
+        filtered_files = self.index.filter_files(keys, prefix=True)
         
-        for f in files:
-            parts = f.split("-")
-            
-            # 只要長度 > 1，我們就有機會比對 Filter 1
-            if len(parts) > 1:
-                # 處理 Part 1
-                raw_part_1 = parts[1]
-                clean_part_1 = raw_part_1.split(".")[0]
-                
-                # 處理 Part 2 (如果有的話)
-                clean_part_2 = ""
-                if len(parts) > 2:
-                    clean_part_2 = parts[2].split(".")[0]
-                
-                # 開始比對
-                match_1 = (key1 == "" or clean_part_1 == key1)
-                
-                # 注意：如果使用者選了 key2，但檔案根本沒有 part 2 (例如 fep-batch.txt)，那就不算符合
-                match_2 = True
-                if key2 != "":
-                    if clean_part_2 == "": 
-                        match_2 = False # 沒東西可以比，失敗
-                    else:
-                        match_2 = (clean_part_2 == key2)
-                
-                if match_1 and match_2:
-                    filtered_files.append(f)
+        # 有填內容搜尋的話，在檔名篩選的結果裡再用內文篩一次 (照相關程度排序)
+        query = self.content_search.text().strip()
+        if query:
+            self.ensure_content_index()
+            if self.content_index is None:
+                filtered_files, status = [], "載入中，讀完再搜..."
+            else:
+                started = time.perf_counter()
+                filtered_files = self.content_index.search(query, candidates=set(filtered_files))
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                tracer.record("content_search", elapsed_ms / 1000, results=len(filtered_files))
+                status = f"{len(filtered_files)} 筆 ({elapsed_ms:.0f} ms)"
+                if self._content_indexer is not None:
+                    status += " 索引建立中..."
+            self.search_status.setText(status)
+        else:
+            self.search_status.setText("")
+        self._filtered_files = filtered_files
         
         if not filtered_files:
             self.target_file_combo.addItem("(無符合檔案)")
@@ -415,70 +1928,158 @@ class FepReleaseManager(QWidget):
             self.target_file_combo.setCurrentIndex(0) # 預設選這個「全選」選項
             
         self.target_file_combo.blockSignals(False)
+        self.update_version_hint()
         
         if filtered_files:
-            self.preview_target_file()
+            self.schedule_preview()
         else:
+            self._preview_debounce.stop()
+            self._preview_reader = None
             self.preview_area.clear()
 
+    def schedule_content_search(self, *args):
+        self._search_debounce.start()
+
     def preview_target_file(self):
-        """ 讀取選定的檔案並顯示在預覽區 """
+        """
+        顯示選定的檔案 (背景讀第一頁，其他的捲下去再讀)
+        整批選項不讀檔，顯示這批檔案的摘要 (版號、大小、分組...)
+        """
+        self._preview_reader = None
+        self._preview_name = None
         filename = self.target_file_combo.currentText()
-        if not filename or filename == "(無符合檔案)": 
+        if not filename or filename == "(無符合檔案)" or self.previews is None:
             self.preview_area.clear()
             return
-            
-        full_path = os.path.join(self.current_folder, filename)
+        
+        if filename.startswith("==="):
+            with tracer.span("preview", file="===", files=len(self._filtered_files)):
+                self.preview_area.setPlainText(batch_summary(
+                    self._filtered_files, self.index.entries, self.versions.version_of))
+            self._preview_name = filename
+            return
+        
+        page = self.previews.get(filename)
+        if page is not None:
+            self.show_preview(page, "cache")
+        else:
+            self.preview_area.setPlainText("(讀取中...)")
+            self.previews.request(filename) # 讀完會回到 on_preview_ready
+
+    def reload_preview(self):
+        """ 檔案改過了 (預覽快取已經 invalidate): 目前的預覽重讀一次 """
+        self._preview_selected_at = time.perf_counter()
+        self.preview_target_file()
+
+    def on_preview_ready(self, generation, page):
+        """ 背景讀完一個檔案 (預先讀的也會來): 剛好是目前選的就顯示 """
+        if generation != self._load_generation: return
+        if page.name == self.target_file_combo.currentText():
+            self.show_preview(page, "read")
+
+    def show_preview(self, page, source):
+        """ 顯示讀好的第一頁；還沒讀完的話準備好 reader，捲到底從第一頁後面接著讀 """
+        self._preview_name = page.name
+        self._preview_reader = None
+        tracer.record("preview", time.perf_counter() - self._preview_selected_at,
+                      file=page.name, source=source)
+        if page.error:
+            self.preview_area.setPlainText("(無法讀取檔案內容)")
+            return
+        self.preview_area.setPlainText(page.text)
+        if not page.state[1]:
+            reader = PagedTextReader(os.path.join(self.current_folder, page.name), opener=self.preview_opener)
+            reader.restore(page.state)
+            self._preview_reader = reader
+
+    def update_version_hint(self, *args):
+        """
+        顯示選中的檔案 (或整批) 目前的版號，流水號欄位帶入建議的下一號
+        整批剛好是一個 token 群組就直接拿預先算好的，有內容搜尋之類的才一個一個數
+        使用者自己改過流水號就只放在 placeholder，不蓋掉他打的字
+        """
+        selection = self.target_file_combo.currentText()
+        group, names = None, None
+        if selection.startswith("==="):
+            if not self.content_search.text().strip():
+                group = self.index.exact_group(self.filter_keys())
+            if group is None:
+                names = self._filtered_files
+        elif selection and not selection.startswith("(無"):
+            names = [selection]
+        
+        if group is None and names is None:
+            self.version_info.setText("")
+            suggestion = None
+        else:
+            stage, env = self.ver_stage.currentText(), self.ver_env.currentText()
+            suggestion = self.versions.suggest_next(stage, env, group, names)
+            latest, files, distinct = self.versions.summary(group, names)
+            if latest is None:
+                text = "目前: (沒有版號)"
+            elif not selection.startswith("==="):
+                text = f"目前: {latest.text}"
+            else:
+                total = len(self._filtered_files)
+                text = f"目前最新: {latest.text} ({files}/{total} 個檔案有版號"
+                text += f"，{distinct} 種版號不一致)" if distinct > 1 else ")"
+            self.version_info.setText(text)
+        
+        suggestion = suggestion or ""
+        self.ver_seq.setPlaceholderText(f"建議 {suggestion}" if suggestion else "")
+        current = self.ver_seq.text().strip()
+        if not current or current == self._auto_seq:
+            self.ver_seq.setText(suggestion)
+            self._auto_seq = suggestion
+
+    def on_preview_scrolled(self, value):
+        """ 預覽捲到底了: 還有下一頁就接著讀 """
+        reader = self._preview_reader
+        if reader is None or value < self.preview_area.verticalScrollBar().maximum():
+            return
+        if reader.at_end:
+            self._preview_reader = None
+            return
         try:
-            with open(full_path, "r", encoding="utf-8") as f:
-                content = f.read()
-                self.preview_area.setText(content)
+            text = reader.read_page()
         except Exception:
-            self.preview_area.setText("(無法讀取檔案內容)")
+            text = "\n(無法讀取後續內容)"
+            reader.at_end = True
+        if reader.hit_limit:
+            text += f"\n...(檔案太大，預覽只顯示前 {reader.max_bytes // (1024 * 1024)} MB)"
+        
+        cursor = self.preview_area.textCursor()
+        cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText(text)
     
     def process_single_file(self, filename, version_str, new_content):
         """ 
-        負責處理單一檔案的讀取、保留 Header、寫入。
+        負責處理單一檔案的讀取、保留 Header、寫入 (實際邏輯在 note_core.update_note)。
         回傳: True (成功) / False (失敗)
         """
         full_path = os.path.join(self.current_folder, filename)
         
         try:
-            # 1. 搶救 Header (# 開頭的行)
-            header_lines = []
-            if os.path.exists(full_path):
-                with open(full_path, "r", encoding="utf-8") as f:
-                    for line in f:
-                        if line.strip().startswith("#"):
-                            header_lines.append(line)
-            
-            # 2. 準備內容
-            final_text_list = header_lines[:] 
-            if final_text_list and not final_text_list[-1].endswith("\n"):
-                final_text_list.append("\n")
-            
-            final_text_list.append(f"\n{version_str}\n")
-            final_text_list.append(new_content + "\n")
-            
-            # 3. 寫入
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.writelines(final_text_list)
-            
+            update_note(full_path, version_str, new_content)
             return True, "" # 成功，無錯誤訊息
             
         except Exception as e:
             return False, str(e) # 失敗，回傳錯誤原因
 
-    def update_file_logic(self):
+    def collect_update_request(self):
+        """
+        檢查畫面上填的東西 (更新 / 乾跑共用)
+        回傳: (目標檔名 list, 版號字串, 新內容)；有缺就跳警告並回傳 None
+        """
         # --- 1. 檢查基本環境 ---
         if not self.current_folder:
             QMessageBox.warning(self, "你累了嗎？", "請先到第一頁選擇資料夾！")
-            return
+            return None
 
         selection = self.target_file_combo.currentText()
         if not selection or selection.startswith("(無"):
             QMessageBox.warning(self, "目標錯誤", "請選擇一個有效的目標檔案！")
-            return
+            return None
 
         # --- 2. 檢查並組裝版號 ---
         # 格式: [階段].[流水號].[環境]
@@ -489,28 +2090,38 @@ class FepReleaseManager(QWidget):
         if not seq:
             QMessageBox.warning(self, "格式錯誤", "流水號 (Sequence) 不能空白！\n你是要發布空號嗎？")
             self.ver_seq.setFocus() # 把游標移過去提醒你
-            return
+            return None
             
         # 這裡可以加強邏輯：確保流水號是數字 (選做)
         # if not seq.isdigit(): ...
 
         # 組合後的字串，例如: "1.001.D"
-        full_version_str = f"[{stage}].[{seq}].[{env}]"
+        full_version_str = format_version(stage, seq, env)
 
         # --- 3. 檢查內容 ---
         new_content = self.content_input.toPlainText().strip()
         if not new_content:
             QMessageBox.warning(self, "缺漏", "更新內容沒填！你是要發布無字天書嗎？")
-            return
+            return None
         
-        target_files_list = []
         # 檢查是否選中了我們剛剛加的那個 "=== ... (BATCH) ==="
         if selection.startswith("==="):
             # [核彈模式] 抓出下拉選單裡除了第一個(全選)以外的所有檔案
             count = self.target_file_combo.count()
             # 從 index 1 開始抓到最後
             target_files_list = [self.target_file_combo.itemText(i) for i in range(1, count)]
-            
+        else:
+            # [單體模式] 就只有選中的那一個
+            target_files_list = [selection]
+        return target_files_list, full_version_str, new_content
+
+    def update_file_logic(self):
+        request = self.collect_update_request()
+        if request is None:
+            return
+        target_files_list, full_version_str, new_content = request
+        
+        if self.target_file_combo.currentText().startswith("==="):
             # [絕對防呆] 跳出恐怖的警告視窗
             reply = QMessageBox.question(self, "高風險操作確認", 
                                          f"⚠️ 警告！你即將同時修改 {len(target_files_list)} 個檔案！\n\n"
@@ -520,41 +2131,268 @@ class FepReleaseManager(QWidget):
                                          QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.No:
                 return # 怕了就取消
-        else:
-            # [單體模式] 就只有選中的那一個
-            target_files_list = [selection]
 
-        # --- 4. 執行核心 I/O (讀取舊Header -> 寫入新檔) ---
-        success_count = 0
-        error_logs = []
+        # --- 4. 執行核心 I/O (讀取舊Header -> 寫入新檔)，丟到背景平行跑 ---
+        self.start_batch_update(target_files_list, full_version_str, new_content)
+
+    def export_report_logic(self):
+        """ 把目標清單裡的檔案 (跟批次更新的範圍一樣) 匯出成報表 """
+        if not self.current_folder or not self._filtered_files:
+            QMessageBox.warning(self, "沒東西", "目前的篩選條件沒有任何檔案可以匯出！")
+            return
+        if self._export is not None:
+            return # 上一份還在寫
+        path, _ = QFileDialog.getSaveFileName(
+            self, "匯出報表", os.path.join(self.current_folder, "release-report.md"),
+            "Markdown (*.md);;JSON (*.json);;CSV (*.csv)")
+        if not path: return
         
-        for fname in target_files_list:
-            is_ok, err_msg = self.process_single_file(fname, full_version_str, new_content)
-            if is_ok:
-                success_count += 1
-            else:
-                error_logs.append(f"{fname}: {err_msg}")
+        versions = self.versions.version_of if self._loader is None else None
+        self._export = ExportWorker(self.current_folder, list(self._filtered_files), path,
+                                    self.export_group.currentData(), versions)
+        self._export.signals.progress.connect(self.on_export_progress)
+        self._export.signals.finished.connect(self.on_export_finished)
+        self._export.signals.failed.connect(self.on_export_failed)
+        self._export.signals.cancelled.connect(self.on_export_cancelled)
+        self.export_btn.setEnabled(False)
+        QThreadPool.globalInstance().start(self._export)
+
+    def on_export_progress(self, done, total):
+        self.export_btn.setText(f"匯出中... {done} / {total}")
+
+    def on_export_finished(self, count, path):
+        self._export = None
+        self.export_btn.setText("📄 匯出報表...")
+        self.export_btn.setEnabled(True)
+        QMessageBox.information(self, "匯出完成", f"已匯出 {count} 個檔案:\n{path}")
+
+    def on_export_cancelled(self):
+        """ 取消 (關視窗時) 不留下寫一半的報表，也不用跳訊息 """
+        self._export = None
+        self.export_btn.setText("📄 匯出報表...")
+        self.export_btn.setEnabled(True)
+
+    def on_export_failed(self, err_msg):
+        self._export = None
+        self.export_btn.setText("📄 匯出報表...")
+        self.export_btn.setEnabled(True)
+        QMessageBox.critical(self, "匯出失敗", err_msg)
+
+    def dry_run_logic(self):
+        """ 先看 diff 再決定要不要套用 (這個視窗本身就是確認，套用時不再問一次) """
+        request = self.collect_update_request()
+        if request is None:
+            return
+        target_files_list, full_version_str, new_content = request
+        # 視窗關掉後背景可能還在算最後一頁，留著參照到下一次乾跑
+        self._dry_run = DryRunDialog(self.current_folder, target_files_list,
+                                     full_version_str, new_content, self)
+        if self._dry_run.exec() == QDialog.Accepted:
+            self.start_batch_update(target_files_list, full_version_str, new_content,
+                                    self._dry_run.plans)
+
+    def start_batch_update(self, target_files_list, version_str, new_content, plans=None):
+        """ 開背景 worker 跑更新，顯示進度視窗 (可以按取消)；plans 是乾跑預覽過的結果 """
+        max_workers = int(self.settings.value("batch_workers", 4))
+        # 預設用交易式寫入 (暫存檔 + rename + journal)，config.ini 設 safe_writes=false 才走舊的直接覆寫
+        safe_writes = str(self.settings.value("safe_writes", "true")).lower() != "false"
+        self._batch = BatchUpdateWorker(self.current_folder, target_files_list,
+                                        version_str, new_content, max_workers,
+                                        self.journal_dir if safe_writes else None, plans,
+                                        self.snapshots)
+        self._batch.signals.progress.connect(self.on_batch_progress)
+        self._batch.signals.finished.connect(self.on_batch_finished)
+        
+        self._batch_progress = QProgressDialog("更新中...", "取消", 0, len(target_files_list), self)
+        self._batch_progress.setWindowTitle("批次更新")
+        self._batch_progress.setWindowModality(Qt.WindowModal)
+        self._batch_progress.setMinimumDuration(300) # 很快就做完的話就不用跳視窗
+        self._batch_progress.setAutoClose(False)
+        self._batch_progress.setAutoReset(False)
+        self._batch_progress.canceled.connect(self._batch.cancel)
         
+        self.set_update_buttons_enabled(False) # 跑完之前不准再按
+        QThreadPool.globalInstance().start(self._batch)
+
+    def on_batch_progress(self, done, total, name):
+        # 視窗是 modal 的，setValue 裡面會跑 event loop，finished 可能就在這時候把視窗收掉
+        dialog = self._batch_progress
+        if dialog is None: return
+        dialog.setValue(done)
+        dialog.setLabelText(f"{'復原中' if self._undo is not None else '更新中'}... {done} / {total}\n{name}")
 
+    def on_batch_finished(self, report):
+        version_str = self._batch.version_str
+        self._batch = None
+        if self._batch_progress is not None:
+            self._batch_progress.close()
+            self._batch_progress = None
+        self.set_update_buttons_enabled(True)
+        
         # --- 5. 收尾工作 ---
-        if len(error_logs) == 0:
-            QMessageBox.information(self, "大成功", 
-                                    f"任務完成！\n成功更新 {success_count} 個檔案。")
+        success_count = len(report.succeeded)
+        error_logs = [f"{r.name}: {r.error}" for r in report.failed]
+        
+        if len(error_logs) == 0 and not report.cancelled:
+            box = QMessageBox(QMessageBox.Information, "大成功", 
+                              f"任務完成！\n成功更新 {success_count} 個檔案。\n\n"
+                              f"{report.throughput_text()}", parent=self)
         else:
-            err_str = "\n".join(error_logs)
-            QMessageBox.warning(self, "部分失敗", 
-                                f"成功: {success_count}\n失敗: {len(error_logs)}\n\n錯誤詳情:\n{err_str}")
+            text = f"成功: {success_count}\n失敗: {len(error_logs)}\n"
+            if report.cancelled:
+                text += f"取消 (沒動到): {report.skipped}\n"
+            text += f"\n{report.throughput_text()}"
+            if error_logs:
+                text += "\n\n錯誤詳情:\n" + "\n".join(error_logs[:20])
+                if len(error_logs) > 20:
+                    text += f"\n... 還有 {len(error_logs) - 20} 個 (見詳細資料)"
+            box = QMessageBox(QMessageBox.Warning, "已取消" if report.cancelled else "部分失敗",
+                              text, parent=self)
+        # 每個檔案的結果放在「詳細資料」裡
+        box.setDetailedText("\n".join(
+            f"{'OK ' if r.ok else 'NG '} {r.name}" + ("" if r.ok else f" ({r.error})")
+            for r in sorted(report.results)))
+        box.exec()
         
         # 重新整理介面，讓使用者看到最新的狀態
-        self.load_files_to_table()      # 更新第一頁表格
-        self.content_input.clear()      # 清空輸入框，避免重複送出
-        self.preview_target_file()      # 更新當前的預覽區 (你會看到新的內容出現)
-        self.ver_seq.clear()            # 清空流水號
+        # 寫成功的版號已經知道了，先直接記進去 (背景重讀完會再對一次)
+        self.versions.set_version([(r.name, self.index.entries[r.name].tokens)
+                                   for r in report.succeeded if r.name in self.index.entries],
+                                  version_str)
+        self.refresh_changes([r.name for r in report.results]) # 只重讀剛剛寫過的檔案 (表格 + 預覽)
+        if self.previews is not None:
+            self.previews.invalidate([r.name for r in report.results]) # 預覽快取裡的是改之前的內容
+        if report.succeeded and not report.cancelled:
+            self.content_input.clear()  # 清空輸入框，避免重複送出
+            self.ver_seq.clear()        # 清空流水號 (下面會帶入下一號)
+        self.reload_preview()           # 更新當前的預覽區 (你會看到新的內容出現)
+        self.update_version_hint()
+        
+        if report.succeeded and self._git_repo is not None and self.git_commit_check.isChecked():
+            self.start_git_commit([r.name for r in report.succeeded], version_str)
+
+    def set_update_buttons_enabled(self, enabled):
+        """ 批次更新 / 復原跑的時候，會寫檔的按鈕都先鎖起來 """
+        self.update_btn.setEnabled(enabled)
+        self.dry_run_btn.setEnabled(enabled)
+        if enabled:
+            self.refresh_undo_state()
+        else:
+            self.undo_btn.setEnabled(False)
+
+    def refresh_undo_state(self):
+        """ 復原按鈕: 有幾批可以復原 (只數紀錄檔，不讀內容) """
+        count = self.snapshots.count() if self.snapshots is not None else 0
+        self.undo_count.setRange(1, max(1, count))
+        self.undo_count.setEnabled(count > 1)
+        self.undo_btn.setEnabled(count > 0 and self._batch is None and self._undo is None)
+        self.undo_btn.setToolTip(f"可以復原 {count} 批 (備份在 {self.snapshot_dir})" if count
+                                 else "還沒有可以復原的批次")
+
+    def undo_logic(self):
+        """ 把最近 N 批更新寫回原本的內容 (之後又被改過的檔案不會蓋掉) """
+        if self.snapshots is None or self._undo is not None: return
+        batches = self.snapshots.batches()[:self.undo_count.value()]
+        if not batches:
+            self.refresh_undo_state()
+            return
+        lines = [f"{time.strftime('%m/%d %H:%M', time.localtime(b.created))}  {b.version}  "
+                 f"{len(b.files)} 個檔案" + ("" if b.folder == self.current_folder else f"  ({b.folder})")
+                 for b in batches]
+        files = len({(b.folder, name) for b in batches for name in b.files})
+        reply = QMessageBox.question(self, "復原批次更新",
+                                     f"要把下面 {len(batches)} 批改過的 {files} 個檔案寫回更新前的內容嗎？\n\n"
+                                     + "\n".join(lines),
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        
+        self._undo = UndoWorker(self.snapshots, len(batches), int(self.settings.value("batch_workers", 4)))
+        self._undo.signals.progress.connect(self.on_batch_progress)
+        self._undo.signals.finished.connect(self.on_undo_finished)
+        self._batch_progress = QProgressDialog("復原中...", "取消", 0, files, self)
+        self._batch_progress.setWindowTitle("復原")
+        self._batch_progress.setWindowModality(Qt.WindowModal)
+        self._batch_progress.setMinimumDuration(300)
+        self._batch_progress.setAutoClose(False)
+        self._batch_progress.setAutoReset(False)
+        self._batch_progress.canceled.connect(self._undo.cancel)
+        self.set_update_buttons_enabled(False)
+        QThreadPool.globalInstance().start(self._undo)
+
+    def on_undo_finished(self, report):
+        batches = self._undo.batches
+        self._undo = None
+        if self._batch_progress is not None:
+            self._batch_progress.close()
+            self._batch_progress = None
+        self.set_update_buttons_enabled(True)
+        
+        text = f"已復原 {len(report.succeeded)} 個檔案 ({len(batches)} 批)。\n\n{report.throughput_text()}"
+        if report.failed:
+            text += f"\n\n沒有復原 {len(report.failed)} 個 (紀錄留著，可以之後再試):\n" + "\n".join(
+                f"{r.name}: {r.error}" for r in sorted(report.failed)[:20])
+        if report.cancelled:
+            text += f"\n\n取消 (沒動到): {report.skipped}"
+        if report.failed:
+            QMessageBox.warning(self, "復原", text)
+        else:
+            QMessageBox.information(self, "復原", text)
+        
+        # 只重讀剛剛寫回去的檔案 (別的資料夾的批次就交給監看 / 輪詢)
+        here = {name for b in batches if b.folder == self.current_folder for name in b.files}
+        names = [r.name for r in report.results if r.name in here]
+        if self.previews is not None: # 還沒載入資料夾也可以復原 (批次紀錄跟資料夾無關)
+            self.previews.invalidate(names) # 重讀完之前換到這些檔案也不要顯示快取裡的舊內容
+        self.refresh_changes(names)
+
+    def start_git_commit(self, names, version_str):
+        """ (背景) 剛寫完的檔案整批 git add + commit """
+        self._git_commit = GitCommitWorker(self._git_repo, self.current_folder, names,
+                                           default_commit_message(version_str, len(names)))
+        self._git_commit.signals.finished.connect(self.on_git_committed)
+        self._git_commit.signals.failed.connect(self.on_git_commit_failed)
+        self.git_commit_check.setEnabled(False)
+        QThreadPool.globalInstance().start(self._git_commit)
+
+    def on_git_committed(self, commit_hash):
+        self._git_commit = None
+        self.git_commit_check.setEnabled(True)
+        self.git_commit_check.setText(f"完成後 git commit (上次: {commit_hash[:8]})" if commit_hash
+                                      else "完成後 git commit (上次: 沒有變動)")
+        self.refresh_changes() # 剛 commit 的檔案在 git 眼中變乾淨了，快照跟著更新
+
+    def on_git_commit_failed(self, err_msg):
+        self._git_commit = None
+        self.git_commit_check.setEnabled(True)
+        QMessageBox.warning(self, "git commit 失敗", f"檔案已經更新，但 commit 沒有成功:\n\n{err_msg}")
         
 
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
+    # --profile out.prof (或環境變數 FEP_PROFILE): 整個 session 用 cProfile 錄下來，關程式時寫檔
+    # --diagnostics: 一打開就顯示診斷分頁
+    # --startup-report: 量啟動時間 (第一次畫面 / 可以操作)，印出來就關掉；超過 startup_budget_ms 的話 exit code = 1
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", default=os.environ.get(PROFILE_ENV, ""))
+    parser.add_argument("--diagnostics", action="store_true")
+    parser.add_argument("--startup-report", action="store_true")
+    opts, qt_args = parser.parse_known_args()
+    if opts.profile:
+        tracer.start_profile(opts.profile)
+    
+    app = QApplication([sys.argv[0]] + qt_args)
     app.setStyle("Fusion")
     window = FepReleaseManager()
+    if opts.diagnostics:
+        window.set_diagnostics_visible(True)
+    if opts.startup_report:
+        window.interactive.connect(window.close)
     window.show()
-    sys.exit(app.exec())
+    exit_code = app.exec()
+    if opts.startup_report:
+        report, within_budget = window.startup_report()
+        print(report)
+        exit_code = exit_code or (0 if within_budget else 1)
+    if tracer.profiling:
+        print(f"效能: profile 已寫到 {tracer.stop_profile()}")
+    sys.exit(exit_code)
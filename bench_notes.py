@@ -0,0 +1,399 @@
+"""
+效能基準測試 (不是單元測試，pytest 不會收它)
+
+產生假的 release note 資料夾 (fep-<a>-<b>.txt)，在 Qt offscreen 底下真的開一個 GUI 來量:
+  - load_files_to_table : 冷啟動 (快取清空) / 熱啟動 (SQLite 快取)，含第一批檔名出現的時間
+  - 級聯篩選             : Filter 1 一個字一個字打、再選 Filter 2 (跳過 debounce，量的是實際工作)
+  - preview_target_file : 選檔案到預覽顯示出來 (隨機跳 / 方向鍵一格一格往下，看預先讀取命中多少)
+  - 批次更新             : update_file_logic (背景 worker，含確認框) / process_single_file (一個一個寫)
+另外附上程式內建的各階段紀錄 (note_trace)，看得到背景的掃描 / 讀檔 / 建索引各花多久。
+結果是一份 JSON，存起來就能跟之後的版本比 (資料夾長到 10k、100k 時有沒有變慢)。
+
+範例:
+  python bench_notes.py --files 1000,10000 --repeat 5 > bench_output.txt
+  python bench_notes.py --files 100000 --body-lines 40 --output bench_100k.json
+  python bench_notes.py --files 1000 --skip-batch --preview-latency-ms 80   (模擬很慢的網路磁碟)
+
+假資料放在 --workdir (預設系統暫存資料夾)，同樣的參數第二次跑會直接沿用，不用重產。
+config.ini / 快取 / journal 也都放在 workdir 裡 (FEP_APP_DIR)，不會動到真正的設定。
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import statistics
+import tempfile
+import contextlib
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from note_core import APP_DIR_ENV, ScanSpec
+from note_trace import tracer
+from note_preview import LatencyOpener
+
+WORDS_A = ["batch", "online", "api", "report", "sync", "gateway", "auth", "ledger",
+           "notify", "export", "import", "billing", "audit", "search", "cache", "queue"]
+WORDS_B = ["task", "job", "fix", "feature", "hotfix", "config", "schema", "cron"]
+BODY_WORDS = ["修正", "匯率", "交易", "批次", "上線", "ticket", "module", "rollback",
+              "timeout", "retry", "config", "版本", "檢核", "欄位", "report", "fix"]
+
+
+# ==========================
+# 假資料
+# ==========================
+def note_name(i, n_a, n_b):
+    """ 第 i 個檔案的檔名 (同樣的 i 永遠同一個名字) """
+    a = f"{WORDS_A[i % len(WORDS_A)]}{(i % n_a) // len(WORDS_A) or ''}"
+    b = f"{WORDS_B[(i // n_a) % len(WORDS_B)]}{i}"
+    return f"fep-{a}-{b}.txt"
+
+
+def note_text(i, seed, header_lines, body_lines, line_chars):
+    """ 第 i 個檔案的內容 (用 seed + i 當亂數種子，可以重產一模一樣的) """
+    rng = random.Random(seed * 1_000_003 + i)
+    lines = [f"# header {k}: owner-{rng.randint(1, 50)} {'x' * rng.randint(0, 20)}"
+             for k in range(header_lines)]
+    lines.append("")
+    lines.append(f"[{rng.choice('12')}].[{rng.randint(1, 999):03d}].[{rng.choice('DTP')}]")
+    for _ in range(body_lines):
+        words, size = [], 0
+        while size < line_chars:
+            word = rng.choice(BODY_WORDS)
+            words.append(word)
+            size += len(word) + 1
+        lines.append(" ".join(words))
+    return "\n".join(lines) + "\n"
+
+
+def ensure_corpus(workdir, args, n):
+    """ 產生 (或沿用) n 個檔案的資料夾，回傳路徑 """
+    params = {"files": n, "tokens_a": args.tokens_a, "header_lines": args.header_lines,
+              "body_lines": args.body_lines, "line_chars": args.line_chars, "seed": args.seed}
+    folder = os.path.join(workdir, "corpus-{files}-{tokens_a}-{header_lines}-{body_lines}-"
+                                   "{line_chars}-{seed}".format(**params))
+    marker = os.path.join(folder, "bench.json")
+    if os.path.exists(marker):
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == params:
+                return folder
+
+    os.makedirs(folder, exist_ok=True)
+    started = time.perf_counter()
+    for i in range(n):
+        write_note(folder, i, args)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    log(f"產生 {n} 個檔案: {time.perf_counter() - started:.1f}s -> {folder}")
+    return folder
+
+
+def write_note(folder, i, args):
+    path = os.path.join(folder, note_name(i, args.tokens_a, len(WORDS_B)))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(note_text(i, args.seed, args.header_lines, args.body_lines, args.line_chars))
+
+
+def restore_notes(folder, n, names, args):
+    """ 批次更新改掉的檔案還原回原本的假資料 (下次跑結果才會一樣) """
+    index_of = {note_name(i, args.tokens_a, len(WORDS_B)): i for i in range(n)}
+    for name in names:
+        if name in index_of:
+            write_note(folder, index_of[name], args)
+
+
+# ==========================
+# 量測工具
+# ==========================
+def log(msg):
+    print(msg, file=sys.stderr, flush=True)
+
+
+def summarize(samples_ms):
+    """ 一串毫秒數 -> 統計值 """
+    if not samples_ms:
+        return None
+    ordered = sorted(samples_ms)
+    return {"n": len(ordered),
+            "min_ms": round(ordered[0], 3),
+            "median_ms": round(statistics.median(ordered), 3),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max_ms": round(ordered[-1], 3)}
+
+
+class Harness:
+    """ 開一個 offscreen 的 FepReleaseManager，提供「等到某件事發生」跟自動關對話框 """
+
+    def __init__(self):
+        from PySide6.QtWidgets import QApplication, QMessageBox
+        from PySide6.QtCore import QTimer, QEventLoop
+        import ReleaseNoteApp
+
+        self.app = QApplication.instance() or QApplication([])
+        self.QMessageBox = QMessageBox
+        self.QEventLoop = QEventLoop
+        self.dialogs = [] # 被自動按掉的對話框文字
+        # 確認框按 Yes、結果框按 OK (timer 在 exec() 的巢狀 event loop 裡一樣會跑)
+        self._pilot = QTimer()
+        self._pilot.setInterval(5)
+        self._pilot.timeout.connect(self._close_dialogs)
+        self._pilot.start()
+
+        self.window = ReleaseNoteApp.FepReleaseManager()
+        self.window.show()
+        self.pump()
+
+    def _close_dialogs(self):
+        box = self.app.activeModalWidget()
+        if isinstance(box, self.QMessageBox):
+            self.dialogs.append(box.text())
+            yes = box.button(self.QMessageBox.Yes)
+            if yes is not None:
+                yes.click()
+            else:
+                box.accept()
+
+    def pump(self, msec=10):
+        self.app.processEvents(self.QEventLoop.AllEvents, msec)
+
+    def wait_until(self, predicate, timeout=600.0):
+        """ 一直跑 event loop 直到 predicate() 成立，回傳經過的秒數 """
+        started = time.perf_counter()
+        while not predicate():
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError("benchmark 等太久了")
+            self.app.processEvents(self.QEventLoop.AllEvents, 5)
+            time.sleep(0.0005)
+        return time.perf_counter() - started
+
+    def idle(self):
+        """ 等背景工作 (載入 / 增量掃描 / 批次) 都停下來 """
+        w = self.window
+        self.wait_until(lambda: w._loader is None and w._change_scan is None and w._batch is None)
+        self.pump(50)
+
+
+# ==========================
+# 各項量測
+# ==========================
+def bench_load(h, folder, repeat):
+    """ 冷啟動一次 + 熱啟動 repeat 次 """
+    w = h.window
+    w.scan_spec = ScanSpec.parse(folder)
+    w.current_folder = w.scan_spec.base
+
+    def one_load():
+        started = time.perf_counter()
+        w.load_files_to_table(reset_filters=True)
+        h.wait_until(lambda: w.table_model.rowCount() > 0)
+        first_rows = time.perf_counter() - started
+        h.wait_until(lambda: w._loader is None)
+        total = time.perf_counter() - started
+        h.idle()
+        return first_rows * 1000, total * 1000
+
+    if w.cache is not None:
+        w.cache.clear()
+    cold_first, cold_total = one_load()
+    warm = [one_load() for _ in range(repeat)]
+    return {"rows": w.table_model.rowCount(),
+            "cold_first_rows_ms": round(cold_first, 3),
+            "cold_total_ms": round(cold_total, 3),
+            "warm_first_rows": summarize([first for first, _ in warm]),
+            "warm_total": summarize([total for _, total in warm]),
+            "cache": w.cache is not None}
+
+
+def bench_filters(h, rng, samples):
+    """ Filter 1 逐字輸入 + 選 Filter 2 (直接呼叫 on_filter_changed，不等 debounce) """
+    w = h.window
+    combo_1, combo_2 = w.filter_combos[0], w.filter_combos[1]
+    tokens = [combo_1.itemText(i) for i in range(1, combo_1.count())]
+    keystrokes, selects, result_sizes = [], [], []
+    for token in rng.sample(tokens, min(samples, len(tokens))):
+        for k in range(1, len(token) + 1):
+            combo_1.setEditText(token[:k])
+            started = time.perf_counter()
+            w.on_filter_changed(1)
+            keystrokes.append((time.perf_counter() - started) * 1000)
+        if combo_2.count() > 1:
+            combo_2.setCurrentText(combo_2.itemText(rng.randrange(1, combo_2.count())))
+            started = time.perf_counter()
+            w.on_filter_changed(2)
+            selects.append((time.perf_counter() - started) * 1000)
+        result_sizes.append(max(0, w.target_file_combo.count() - 1))
+    combo_1.setEditText("")
+    w.on_filter_changed(1)
+    w._filter_debounce.stop()
+    w._preview_debounce.stop()
+    return {"levels_1": len(tokens),
+            "filter_1_keystroke": summarize(keystrokes),
+            "filter_2_select": summarize(selects),
+            "median_result_files": statistics.median(result_sizes) if result_sizes else 0}
+
+
+def bench_preview(h, rng, samples, dwell_ms):
+    """
+    選檔案 -> 預覽顯示出來 (跳過 debounce，量的是實際等待)
+    random: 隨機跳 (幾乎都要真的讀)；step: 方向鍵一格一格往下，每格停 dwell_ms 看一下 (預先讀取應該接得住)
+    """
+    w = h.window
+    combo = w.target_file_combo
+    if combo.count() < 2:
+        return None
+    opener = w.preview_opener
+    opens_before = opener.calls
+
+    def select(index):
+        started = time.perf_counter()
+        combo.setCurrentIndex(index)
+        hit = w._preview_name == combo.currentText() # 快取裡有的話換選擇時就顯示了
+        w._preview_debounce.stop()
+        w.on_preview_debounced()
+        h.wait_until(lambda: w._preview_name == combo.currentText())
+        return (time.perf_counter() - started) * 1000, hit
+
+    jumps = [select(rng.randrange(1, combo.count()))[0] for _ in range(samples)]
+    steps, hits = [], 0
+    start = rng.randrange(1, max(2, combo.count() - samples))
+    for index in range(start, min(combo.count(), start + samples)):
+        elapsed, hit = select(index)
+        steps.append(elapsed)
+        hits += hit
+        pause_until = time.perf_counter() + dwell_ms / 1000
+        h.wait_until(lambda: time.perf_counter() >= pause_until)
+    return {"random": summarize(jumps),
+            "step": summarize(steps),
+            "step_hit_rate": round(hits / len(steps), 3) if steps else None,
+            "opens": opener.calls - opens_before,
+            "latency_ms": round(opener.latency * 1000, 3)}
+
+
+def bench_batch(h, folder, n, args, rng):
+    """ 選一組 Filter 1 走 update_file_logic (整批)，再用 process_single_file 一個一個寫同一批 """
+    w = h.window
+    combo_1 = w.filter_combos[0]
+    token = combo_1.itemText(rng.randrange(1, combo_1.count()))
+    combo_1.setEditText(token)
+    w.on_filter_changed(1)
+    w._filter_debounce.stop()
+    names = [w.target_file_combo.itemText(i) for i in range(1, w.target_file_combo.count())]
+    if args.batch_limit and len(names) > args.batch_limit:
+        names = names[:args.batch_limit]
+    result = {"filter_1": token, "files": len(names)}
+
+    # --- 1. GUI 的批次更新 (背景 worker + 交易式寫入，含確認框/結果框) ---
+    w.target_file_combo.setCurrentIndex(0)
+    if w.target_file_combo.count() - 1 != len(names):
+        # 有設 batch_limit: 直接走 start_batch_update (update_file_logic 一定是整個清單)
+        run = lambda: w.start_batch_update(names, "[1].[999].[T]", "benchmark content")
+    else:
+        w.ver_seq.setText("999")
+        w.content_input.setPlainText("benchmark content")
+        run = w.update_file_logic
+    started = time.perf_counter()
+    run()
+    h.wait_until(lambda: w._batch is None)
+    elapsed = time.perf_counter() - started
+    result["update_file_logic_ms"] = round(elapsed * 1000, 3)
+    result["update_files_per_sec"] = round(len(names) / elapsed, 1) if elapsed else None
+    h.idle()
+
+    # --- 2. 一個一個寫 (process_single_file，沒有平行、沒有 journal) ---
+    times = []
+    for name in names:
+        started = time.perf_counter()
+        w.process_single_file(name, "[1].[998].[T]", "benchmark content")
+        times.append((time.perf_counter() - started) * 1000)
+    result["process_single_file"] = summarize(times)
+
+    restore_notes(folder, n, names, args)
+    w.refresh_changes(names)
+    h.idle()
+    return result
+
+
+def run(args):
+    workdir = os.path.abspath(args.workdir or os.path.join(tempfile.gettempdir(), "fep-bench"))
+    app_home = os.path.join(workdir, "app")
+    os.makedirs(app_home, exist_ok=True)
+    os.environ[APP_DIR_ENV] = app_home
+    # 每次都從空的設定開始 (不自動載入上次的資料夾)
+    with open(os.path.join(app_home, "config.ini"), "w", encoding="utf-8") as f:
+        f.write(f"[General]\nbatch_workers={args.workers}\n")
+
+    sizes = [int(n) for n in args.files.split(",") if n.strip()]
+    folders = {n: ensure_corpus(workdir, args, n) for n in sizes}
+
+    h = Harness()
+    # 預覽開檔一律經過 LatencyOpener (數開了幾次檔；--preview-latency-ms 可以模擬網路磁碟)
+    h.window.preview_opener = LatencyOpener(args.preview_latency_ms / 1000)
+    import PySide6
+    report = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "python": platform.python_version(),
+                       "pyside6": PySide6.__version__,
+                       "platform": platform.platform(),
+                       "cpu_count": os.cpu_count(),
+                       "params": {k: v for k, v in vars(args).items() if k != "output"}},
+              "results": []}
+    for n in sizes:
+        rng = random.Random(args.seed)
+        log(f"--- {n} 個檔案 ---")
+        tracer.reset()
+        entry = {"files": n}
+        entry["load_files_to_table"] = bench_load(h, folders[n], args.repeat)
+        log(f"  load: {entry['load_files_to_table']['cold_total_ms']:.0f} ms (冷)")
+        entry["filter_cascade"] = bench_filters(h, rng, args.samples)
+        entry["preview_target_file"] = bench_preview(h, rng, args.samples * args.repeat, args.preview_dwell_ms)
+        if not args.skip_batch:
+            entry["batch_update"] = bench_batch(h, folders[n], n, args, rng)
+        # 程式內建的各階段紀錄 (背景 worker 的掃描 / 讀檔 / 建索引也在裡面)
+        entry["trace"] = {stage: {"count": count, "avg_ms": round(avg_ms, 3),
+                                  "p95_ms": round(p95_ms, 3), "max_ms": round(max_ms, 3)}
+                          for stage, count, _, avg_ms, p95_ms, max_ms in tracer.snapshot()}
+        report["results"].append(entry)
+
+    h.window.close()
+    return report
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bench-notes", description="FEP Release Manager 效能基準測試")
+    parser.add_argument("--files", default="1000,10000", help="檔案數，可以多組用逗號隔開 (預設 1000,10000)")
+    parser.add_argument("--tokens-a", type=int, default=64, help="檔名第二段 (Filter 1) 有幾種 (預設 64)")
+    parser.add_argument("--header-lines", type=int, default=4, help="每個檔案幾行 # Header (預設 4)")
+    parser.add_argument("--body-lines", type=int, default=20, help="每個檔案內文幾行 (預設 20)")
+    parser.add_argument("--line-chars", type=int, default=60, help="內文每行大約幾個字 (預設 60)")
+    parser.add_argument("--repeat", type=int, default=3, help="熱啟動載入重複幾次 (預設 3)")
+    parser.add_argument("--samples", type=int, default=10, help="篩選 / 預覽抽幾個樣本 (預設 10)")
+    parser.add_argument("--preview-latency-ms", type=float, default=0,
+                        help="預覽每次開檔前先等幾 ms，模擬網路磁碟 (預設 0)")
+    parser.add_argument("--preview-dwell-ms", type=int, default=150,
+                        help="方向鍵往下看時每格停幾 ms (預設 150)")
+    parser.add_argument("--workers", type=int, default=4, help="批次更新的 batch_workers (預設 4)")
+    parser.add_argument("--batch-limit", type=int, default=0, help="批次更新最多寫幾個檔 (0 = 整組)")
+    parser.add_argument("--skip-batch", action="store_true", help="不量批次更新 (不寫檔)")
+    parser.add_argument("--seed", type=int, default=1, help="亂數種子 (預設 1)")
+    parser.add_argument("--workdir", help="假資料 / 設定放哪 (預設系統暫存資料夾下的 fep-bench)")
+    parser.add_argument("--output", help="JSON 寫到這個檔 (預設印到 stdout)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    # 程式本身的 print (提示訊息) 改到 stderr，stdout 只留 JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+持久化快取 (SQLite，放在 config.ini 旁邊)
+
+每個檔案用 (資料夾, 檔名, size, mtime) 當 key，存 Header、過濾後的內文、檔名 token。
+下次開程式只要 stat 一輪，size/mtime 沒變的直接拿快取，有變的才重讀。
+很久沒開的資料夾會被踢掉，整個快取維持在 max_bytes 以下。
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA_VERSION = 1
+
+
+class NoteCache:
+    """ 可以在多個 thread 共用 (內部有 lock) """
+    LOOKUP_CHUNK = 500 # SQLite 一個語句的參數個數有上限 (舊版 999)
+
+    def __init__(self, db_path, max_bytes=64 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+
+    def _init_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if row is not None and row[0] != str(SCHEMA_VERSION):
+                # 格式改過了，舊資料直接丟掉重建 (反正只是快取)
+                self._conn.execute("DROP TABLE IF EXISTS notes")
+                self._conn.execute("DROP TABLE IF EXISTS folders")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS folders (
+                    folder    TEXT PRIMARY KEY,
+                    last_used REAL NOT NULL
+                )""")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS notes (
+                    folder   TEXT NOT NULL,
+                    name     TEXT NOT NULL,
+                    size     INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    tokens   TEXT NOT NULL,
+                    header   TEXT NOT NULL,
+                    body     TEXT NOT NULL,
+                    PRIMARY KEY (folder, name)
+                )""")
+            self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)",
+                               (str(SCHEMA_VERSION),))
+
+    def clear(self):
+        """ 整個快取清空 (下次載入全部重讀) """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM notes")
+            self._conn.execute("DELETE FROM folders")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ==========================
+    # 讀 / 寫
+    # ==========================
+    def lookup(self, folder, entries):
+        """
+        拿快取裡 size/mtime 都對得上的檔案
+        回傳: ([(檔名, Header, 內文), ...], 需要重讀的 NoteEntry list)
+        """
+        entries = list(entries)
+        cached = {}
+        # 只查要的那幾個檔名 (掃描時是一個子資料夾一個子資料夾查，不要每次都撈整個 folder)
+        for i in range(0, len(entries), self.LOOKUP_CHUNK):
+            chunk = [e.name for e in entries[i:i + self.LOOKUP_CHUNK]]
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT name, size, mtime_ns, header, body FROM notes "
+                    f"WHERE folder = ? AND name IN ({','.join('?' * len(chunk))})",
+                    [folder] + chunk).fetchall()
+            for name, size, mtime_ns, header, body in rows:
+                cached[name] = (size, mtime_ns, header, body)
+
+        hits, misses = [], []
+        for entry in entries:
+            row = cached.get(entry.name)
+            if row is not None and row[0] == entry.size and row[1] == entry.mtime_ns:
+                hits.append((entry.name, json.loads(row[2]), row[3]))
+            else:
+                misses.append(entry)
+        return hits, misses
+
+    def snapshot(self, folder):
+        """
+        上次載入這個資料夾時的樣子 (不 stat，開程式時先畫出來給人看，真的掃完再對帳)
+        回傳: [(檔名, size, mtime_ns, token list, 內文), ...] 照檔名排
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, size, mtime_ns, tokens, body FROM notes WHERE folder = ? ORDER BY name",
+                (folder,)).fetchall()
+        return [(name, size, mtime_ns, json.loads(tokens), body)
+                for name, size, mtime_ns, tokens, body in rows]
+
+    def store(self, folder, entries, batch):
+        """
+        存一批剛讀完的 [(檔名, Header, 內文), ...]
+        entries 是 {檔名: NoteEntry} (拿 size/mtime/token 用)，讀失敗的 (Header 是 None) 不存
+        """
+        rows = []
+        for name, header_lines, body in batch:
+            entry = entries.get(name)
+            if entry is None or header_lines is None:
+                continue
+            rows.append((folder, name, entry.size, entry.mtime_ns,
+                         json.dumps(entry.tokens, ensure_ascii=False),
+                         json.dumps(header_lines, ensure_ascii=False), body))
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO notes VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def forget(self, folder, names):
+        """ 檔案被刪掉了，快取也拿掉 """
+        if not names:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM notes WHERE folder = ? AND name = ?",
+                                   [(folder, name) for name in names])
+
+    def sync_folder(self, folder, existing_names):
+        """ 整個資料夾載入完: 清掉已經不存在的檔案、更新使用時間，順便檢查容量 """
+        existing = set(existing_names)
+        with self._lock:
+            cached = [r[0] for r in self._conn.execute(
+                "SELECT name FROM notes WHERE folder = ?", (folder,))]
+        self.forget(folder, [name for name in cached if name not in existing])
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO folders VALUES (?, ?)", (folder, time.time()))
+        self.evict(keep=folder)
+
+    # ==========================
+    # 容量控管
+    # ==========================
+    def evict(self, keep=None):
+        """ 超過 max_bytes 就從最久沒用的資料夾開始整個踢掉 (keep 那個不踢) """
+        with self._lock, self._conn:
+            sizes = dict(self._conn.execute(
+                "SELECT folder, SUM(LENGTH(header) + LENGTH(body) + LENGTH(name)) "
+                "FROM notes GROUP BY folder"))
+            total = sum(sizes.values())
+            if total <= self.max_bytes:
+                return
+            last_used = dict(self._conn.execute("SELECT folder, last_used FROM folders"))
+            # 沒紀錄使用時間的 (舊資料) 當作最舊
+            for folder in sorted(sizes, key=lambda f: last_used.get(f, 0)):
+                if total <= self.max_bytes:
+                    break
+                if folder == keep:
+                    continue
+                self._conn.execute("DELETE FROM notes WHERE folder = ?", (folder,))
+                self._conn.execute("DELETE FROM folders WHERE folder = ?", (folder,))
+                total -= sizes[folder]
+
+
+def open_cache(db_path, max_bytes=64 * 1024 * 1024):
+    """ 開快取；檔案壞掉就砍掉重來，還是開不起來就回傳 None (沒快取照樣能用) """
+    for attempt in range(2):
+        try:
+            return NoteCache(db_path, max_bytes)
+        except sqlite3.DatabaseError:
+            if attempt == 0 and os.path.exists(db_path):
+                try:
+                    os.remove(db_path)
+                except OSError:
+                    return None
+    return None
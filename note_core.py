@@ -0,0 +1,932 @@
+"""
+FEP Release Manager 的核心邏輯 (不依賴 Qt，GUI 跟腳本都可以用)
+"""
+import io
+import os
+import re
+import sys
+import mmap
+import stat
+import codecs
+import difflib
+import time
+import fnmatch
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+NOTE_EXT = ".txt"
+LIST_SEPARATOR = ";" # 多個資料夾 / 多個 glob 之間用分號隔開
+
+# 版號格式: [階段].[流水號].[環境]，例如 [1].[042].[T]
+VERSION_STAGES = ["1", "2"]
+VERSION_ENVS = ["D", "T", "P"]
+
+
+APP_DIR_ENV = "FEP_APP_DIR" # 設了這個環境變數就改放那裡 (跑 benchmark、多開不同設定時用)
+
+
+def app_dir():
+    """ config.ini / journal 放的地方: EXE 旁邊，或是原始碼旁邊 """
+    override = os.environ.get(APP_DIR_ENV)
+    if override:
+        return override
+    if getattr(sys, 'frozen', False):
+        # 情況 A: 如果是被打包成的 EXE，sys.executable 就是 EXE 的完整路徑
+        return os.path.dirname(sys.executable)
+    # 情況 B: 如果是普通的 Python 腳本
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def format_version(stage, seq, env):
+    """ ("1", "042", "T") -> "[1].[042].[T]" """
+    return f"[{stage}].[{seq}].[{env}]"
+
+
+def parse_version_arg(text):
+    """
+    命令列用的簡寫: "1.042.T" -> "[1].[042].[T]" (也吃已經有中括號的寫法)
+    格式不對就丟 ValueError
+    """
+    parts = [p.strip("[] ") for p in text.strip().split(".")]
+    if len(parts) != 3 or not parts[1]:
+        raise ValueError(f"版號格式要是 [階段].[流水號].[環境]，例如 1.042.T：{text}")
+    stage, seq, env = parts
+    env = env.upper()
+    if stage not in VERSION_STAGES:
+        raise ValueError(f"階段別只能是 {'/'.join(VERSION_STAGES)}：{stage}")
+    if env not in VERSION_ENVS:
+        raise ValueError(f"環境別只能是 {'/'.join(VERSION_ENVS)}：{env}")
+    return format_version(stage, seq, env)
+
+# 一個檔案的索引資料: 檔名、完整路徑、切好的 token、stat 資訊
+NoteEntry = namedtuple("NoteEntry", ["name", "path", "tokens", "size", "mtime_ns"])
+
+
+def split_tokens(filename):
+    """ 檔名切成 token: "fep-batch-task.txt" -> ("fep", "batch", "task") """
+    # 每一段都砍掉 "." 後面的東西，跟以前 parts[i].split(".")[0] 的規則一樣
+    # 範例 A: fep-batch.txt      -> ("fep", "batch")
+    # 範例 B: fep-batch-task.txt -> ("fep", "batch", "task")
+    return tuple(part.split(".")[0] for part in filename.split("-"))
+
+
+def split_list(text, commas=False):
+    """
+    "a; b;;c" -> ["a", "b", "c"]
+    commas=True 的話逗號也算分隔 (glob 用；資料夾不行，Windows 路徑本來就可以有逗號，例如 D:\\a,b)
+    """
+    if commas:
+        text = text.replace(",", LIST_SEPARATOR)
+    return [part.strip() for part in text.split(LIST_SEPARATOR) if part.strip()]
+
+
+class ScanSpec(namedtuple("ScanSpec", ["roots", "include", "exclude", "recursive"])):
+    """
+    要掃哪些東西: 一到多個根資料夾 + 要收/要排除的 glob + 要不要往子資料夾掃
+    glob 沒有 "/" 的只比對檔名 (例如 *.txt、archive)，有 "/" 的比對相對路徑 (例如 sysA/old/*)
+    預設 (一個資料夾、*.txt、不遞迴) 跟以前只看最上層 .txt 一模一樣
+    """
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, roots, include="*" + NOTE_EXT, exclude="", recursive=False):
+        """
+        roots / include / exclude 可以是 "a;b" 字串或 list (list 裡也可以是 "a;b")
+        glob 也可以用逗號隔開 ("*.txt, *.md")，資料夾只認分號
+        """
+        def as_list(value, commas=False):
+            if isinstance(value, str):
+                return split_list(value, commas)
+            return [part for v in value for part in split_list(v, commas)]
+        seen, unique = set(), []
+        for root in as_list(roots):
+            root = os.path.normpath(root)
+            if os.path.normcase(root) not in seen:
+                seen.add(os.path.normcase(root))
+                unique.append(root)
+        return cls(tuple(unique), tuple(as_list(include, True)), tuple(as_list(exclude, True)), bool(recursive))
+
+    @property
+    def base(self):
+        """
+        所有根資料夾共同的上層，檔名 (index 的 key) 都是相對這裡的路徑，
+        所以 os.path.join(base, 檔名) 一樣拿得到完整路徑。
+        不同磁碟機 (C: / D:) 沒有共同上層，會丟 ValueError
+        """
+        if not self.roots:
+            return ""
+        if len(self.roots) == 1:
+            return self.roots[0]
+        return os.path.commonpath([os.path.abspath(r) for r in self.roots])
+
+    @property
+    def text(self):
+        """ 顯示 / 存進設定用的 "a;b" """
+        return LIST_SEPARATOR.join(self.roots)
+
+
+def as_spec(folder):
+    """ 資料夾字串 (可以是 "a;b") 或 ScanSpec 都收 """
+    if isinstance(folder, ScanSpec):
+        return folder
+    return ScanSpec.parse(folder or "")
+
+
+def _glob_match(rel, patterns):
+    name = rel.rsplit("/", 1)[-1]
+    return any(fnmatch.fnmatch(rel if "/" in p else name, p) for p in patterns)
+
+
+def _scan_dir(spec, path, rel_dir, is_root):
+    """
+    掃一層資料夾 (一次 os.scandir)
+    回傳: (資料夾, mtime_ns, [NoteEntry], [(子資料夾, 相對路徑), ...])
+    """
+    try:
+        dir_mtime_ns = os.stat(path).st_mtime_ns
+        it = os.scandir(path)
+    except OSError:
+        if is_root:
+            raise # 根資料夾打不開要讓使用者知道
+        return path, None, [], [] # 子資料夾沒權限 / 掃到一半被砍掉，跳過
+
+    entries, subdirs = [], []
+    with it:
+        for de in it:
+            rel = f"{rel_dir}/{de.name}" if rel_dir else de.name
+            try:
+                if de.is_dir(follow_symlinks=False):
+                    if spec.recursive and not _glob_match(rel, spec.exclude):
+                        subdirs.append((de.path, rel))
+                    continue
+                # 先比檔名，不符合的連 stat 都不用做
+                if not _glob_match(rel, spec.include) or _glob_match(rel, spec.exclude):
+                    continue
+                if not de.is_file():
+                    continue
+                st = de.stat()
+            except OSError:
+                continue # 掃到一半被砍掉之類的，跳過
+            entries.append(NoteEntry(rel, de.path, split_tokens(de.name),
+                                     st.st_size, st.st_mtime_ns))
+    return path, dir_mtime_ns, entries, subdirs
+
+
+def iter_scan(spec, max_workers=8, cancel=None):
+    """
+    平行掃描 (每個資料夾一個 os.scandir 工作，掃到子資料夾就再丟進 pool)
+    每掃完一個資料夾就 yield (資料夾, mtime_ns, [NoteEntry])，不用等整棵樹掃完
+    NoteEntry.name 是相對 spec.base 的路徑 ("/" 分隔)，只有一個根又不遞迴時就是檔名
+    """
+    spec = as_spec(spec)
+    base = spec.base
+    seen = set() # 根資料夾互相包含、symlink 繞回來的，都只掃一次
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = set()
+
+        def submit(path, rel, is_root=False):
+            key = os.path.normcase(os.path.realpath(path)) if spec.recursive else path
+            if key not in seen:
+                seen.add(key)
+                pending.add(executor.submit(_scan_dir, spec, path, rel, is_root))
+
+        for root in spec.roots:
+            rel = os.path.relpath(root, base).replace(os.sep, "/")
+            submit(root, "" if rel == "." else rel, is_root=True)
+
+        while pending:
+            if cancel is not None and cancel.is_set():
+                for fut in pending:
+                    fut.cancel()
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pending.discard(fut)
+                path, dir_mtime_ns, entries, subdirs = fut.result()
+                for sub_path, sub_rel in subdirs:
+                    submit(sub_path, sub_rel)
+                if dir_mtime_ns is not None:
+                    yield path, dir_mtime_ns, entries
+
+
+def scan_tree(spec, max_workers=8):
+    """
+    整個掃完再回傳
+    回傳: ({資料夾: mtime_ns}, {檔名: NoteEntry})
+    """
+    dir_mtimes, entries = {}, {}
+    for path, dir_mtime_ns, found in iter_scan(spec, max_workers):
+        dir_mtimes[path] = dir_mtime_ns
+        for entry in found:
+            entries.setdefault(entry.name, entry)
+    return dir_mtimes, entries
+
+
+def stat_entry(spec, name):
+    """
+    單一檔名 (相對 spec.base) -> NoteEntry，規則跟 _scan_dir 一樣
+    (要在某個根資料夾底下、沒遞迴就不能在子資料夾、中間的資料夾沒被排除、glob 符合)
+    不在掃描範圍或檔案不存在就回傳 None
+    """
+    spec = as_spec(spec)
+    base = spec.base
+    parts = name.split("/")
+    for root in spec.roots:
+        root_rel = os.path.relpath(root, base).replace(os.sep, "/")
+        root_parts = [] if root_rel == "." else root_rel.split("/")
+        if parts[:len(root_parts)] != root_parts or len(parts) <= len(root_parts):
+            continue
+        if len(parts) - len(root_parts) > 1 and not spec.recursive:
+            continue
+        if any(_glob_match("/".join(parts[:depth]), spec.exclude)
+               for depth in range(len(root_parts) + 1, len(parts))):
+            continue
+        if not _glob_match(name, spec.include) or _glob_match(name, spec.exclude):
+            return None
+        path = os.path.join(base, *parts)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        return NoteEntry(name, path, split_tokens(parts[-1]), st.st_size, st.st_mtime_ns)
+    return None
+
+
+def dirs_changed(dir_mtimes):
+    """ 上次掃過的資料夾有沒有哪個 mtime 變了 (新增/刪除/改名都會改到) """
+    for path, mtime_ns in dir_mtimes.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime_ns:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def diff_entries(known, entries):
+    """
+    比對舊的 stat_snapshot 跟新掃到的 entries
+    回傳: (新增, 修改, 刪除) 三個排序好的檔名 list
+    """
+    added, modified = [], []
+    for name, entry in entries.items():
+        old = known.get(name)
+        if old is None:
+            added.append(name)
+        elif old != (entry.size, entry.mtime_ns):
+            modified.append(name)
+    removed = [name for name in known if name not in entries]
+    return sorted(added), sorted(modified), sorted(removed)
+
+
+class TokenTrie:
+    """
+    token 的前綴樹。每個節點都記著「這個前綴底下」有哪些檔名，
+    所以打一個字只是往下走一層，不用再掃一遍所有檔案。
+    """
+    __slots__ = ("children", "names")
+
+    def __init__(self):
+        self.children = {}
+        self.names = set()
+
+    def insert(self, token, name):
+        node = self
+        node.names.add(name)
+        for ch in token:
+            node = node.children.setdefault(ch, TokenTrie())
+            node.names.add(name)
+
+    def remove(self, token, name):
+        path = [(None, self)]
+        node = self
+        for ch in token:
+            node = node.children.get(ch)
+            if node is None:
+                break
+            path.append((ch, node))
+        for _, node in path:
+            node.names.discard(name)
+        # 沒人用的分支剪掉
+        for i in range(len(path) - 1, 0, -1):
+            ch, node = path[i]
+            if not node.names:
+                del path[i - 1][1].children[ch]
+
+    def names_with_prefix(self, prefix):
+        node = self
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return _EMPTY
+        return node.names
+
+
+_EMPTY = frozenset()
+
+
+class TokenTreeNode:
+    """
+    檔名 token 的階層樹: fep-batch-task-sub.txt 會走 batch -> task -> sub。
+    某一層的選項就是上一層選到的節點的 children，不用回頭掃所有檔案。
+    count 是這個節點底下有幾個檔案 (刪到 0 就把節點拿掉)。
+    """
+    __slots__ = ("children", "count")
+
+    def __init__(self):
+        self.children = {}
+        self.count = 0
+
+    def insert(self, path):
+        node = self
+        node.count += 1
+        for token in path:
+            node = node.children.setdefault(token, TokenTreeNode())
+            node.count += 1
+
+    def remove(self, path):
+        nodes = [self]
+        for token in path:
+            child = nodes[-1].children.get(token)
+            if child is None:
+                return
+            nodes.append(child)
+        for node in nodes:
+            node.count -= 1
+        for i in range(len(path), 0, -1):
+            if nodes[i].count <= 0:
+                del nodes[i - 1].children[path[i - 1]]
+
+
+class FolderIndex:
+    """
+    資料夾的檔名索引 (記憶體快取)。
+    用 os.scandir 掃過一輪 (可以是多個根資料夾 + 子資料夾，見 ScanSpec)，切好 token、記下 stat，
+    之後 Filter 1 / Filter 2 / 目標清單 / 表格都直接問它，不用再 listdir。
+    有任何一個資料夾的 mtime 變了 (新增/刪除/改名) 才會重掃。
+    folder 是檔名的基準路徑 (ScanSpec.base)，os.path.join(folder, 檔名) 就是完整路徑
+    """
+
+    def __init__(self, folder=""):
+        self.spec = ScanSpec.parse("")
+        self.folder = ""
+        self.entries = {}        # 檔名 -> NoteEntry
+        self.by_level = []       # by_level[i] = {token: set(檔名)}，i 就是 parts 的 index
+        self.tries = []          # tries[i] = parts[i] 的前綴樹 (打字時做前綴比對)
+        self.tree = TokenTreeNode() # parts[1:] 的階層樹 (每一層的選項直接從這裡拿)
+        self._last_match = {}    # 上一次前綴比對的結果 (依 key 個數分開記)，下一個字直接從這裡縮小
+        self._cascadable = set() # 至少有 parts[1] 的檔案 (才會出現在級聯搜尋)
+        self._dir_mtimes = {}    # 掃過的資料夾 -> mtime_ns
+        if folder:
+            self.set_folder(folder)
+
+    def set_folder(self, folder):
+        """ 換資料夾 (路徑字串或 ScanSpec): 清掉舊索引，下次 refresh 一定重掃 """
+        spec = as_spec(folder)
+        if spec != self.spec:
+            self.spec = spec
+            self.folder = spec.base
+            self._clear()
+
+    def _clear(self):
+        self.entries = {}
+        self.by_level = []
+        self.tries = []
+        self.tree = TokenTreeNode()
+        self._last_match = {}
+        self._cascadable = set()
+        self._dir_mtimes = {}
+
+    def refresh(self, force=False):
+        """
+        檢查資料夾 mtime，有變才重掃。
+        回傳: True (有重掃) / False (沿用快取)
+        """
+        if not self.spec.roots:
+            self._clear()
+            return False
+
+        if not force and self._dir_mtimes and not dirs_changed(self._dir_mtimes):
+            return False
+
+        dir_mtimes, entries = scan_tree(self.spec)
+        self._clear()
+        for entry in entries.values():
+            self._add(entry)
+        self._dir_mtimes = dir_mtimes
+        return True
+
+    def directories(self):
+        """ 掃過的所有資料夾 (給 QFileSystemWatcher 監看) """
+        return sorted(self._dir_mtimes)
+
+    def stat_snapshot(self):
+        """ {檔名: (size, mtime_ns)}，給背景的變動偵測拿去比對 """
+        return {name: (e.size, e.mtime_ns) for name, e in self.entries.items()}
+
+    def dir_snapshot(self):
+        """ {資料夾: mtime_ns} 的副本 (git 模式的增量掃描只更新有動到的資料夾) """
+        return dict(self._dir_mtimes)
+
+    def apply_changes(self, upserts, removed, dir_mtimes=None):
+        """
+        增量更新: upserts 是新增/修改的 NoteEntry，removed 是被刪掉的檔名
+        dir_mtimes: 這次掃到的 {資料夾: mtime_ns} (整個換掉)
+        """
+        for name in removed:
+            self._remove(name)
+        for entry in upserts:
+            self._remove(entry.name)
+            self._add(entry)
+        if dir_mtimes is not None:
+            self._dir_mtimes = dict(dir_mtimes)
+
+    def _add(self, entry):
+        self.entries[entry.name] = entry
+        for level, token in enumerate(entry.tokens):
+            while len(self.by_level) <= level:
+                self.by_level.append({})
+                self.tries.append(TokenTrie())
+            self.by_level[level].setdefault(token, set()).add(entry.name)
+            self.tries[level].insert(token, entry.name)
+        if len(entry.tokens) > 1:
+            self._cascadable.add(entry.name)
+            self.tree.insert(entry.tokens[1:])
+        self._last_match.clear()
+
+    def _remove(self, name):
+        entry = self.entries.pop(name, None)
+        if entry is None:
+            return
+        for level, token in enumerate(entry.tokens):
+            names = self.by_level[level].get(token)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.by_level[level][token]
+            self.tries[level].remove(token, name)
+        if len(entry.tokens) > 1:
+            self.tree.remove(entry.tokens[1:])
+        self._cascadable.discard(name)
+        self._last_match.clear()
+
+    # ==========================
+    # 查詢
+    # ==========================
+    def names(self):
+        """ 所有 .txt 檔名 (排序過) """
+        return sorted(self.entries)
+
+    def _key_names(self, level, key, prefix):
+        """
+        某一層的 key 對到哪些檔名
+        回傳: (檔名 set, 是不是完全符合)
+        剛好是某個 token 就用完全符合 (從下拉選單選的)，不然在 prefix 模式下用前綴比對 (還在打字)
+        """
+        if level >= len(self.by_level):
+            return _EMPTY, True
+        exact = self.by_level[level].get(key)
+        if exact is not None or not prefix:
+            return exact or _EMPTY, True
+        return self.tries[level].names_with_prefix(key), False
+
+    def match(self, keys, prefix=False):
+        """
+        級聯比對: keys[0] 對 parts[1]、keys[1] 對 parts[2] ...
+        空字串代表不限。選了 key 但檔案根本沒有那一段，就不算符合。
+        prefix=True 時，不是完整 token 的 key 用前綴比對 ("bat" 會對到 batch、batman)
+        回傳: 符合的檔名 set (不要改它)
+        """
+        keys = tuple(keys)
+        result = self._cascadable
+        levels = range(1, len(keys) + 1)
+
+        # 打字通常是在上一次的 key 後面多一個字 -> 結果一定是上一次的子集合，從那裡開始縮
+        last = self._last_match.get(len(keys)) if prefix else None
+        if last is not None and all(
+                new == old or (new.startswith(old) and not was_exact)
+                for new, old, was_exact in zip(keys, last[0], last[1])):
+            result = last[2]
+            levels = [lv for lv in levels if keys[lv - 1] != last[0][lv - 1]]
+
+        exact_flags = []
+        for level in range(1, len(keys) + 1):
+            key = keys[level - 1]
+            if key == "":
+                exact_flags.append(False)
+                continue
+            names, is_exact = self._key_names(level, key, prefix)
+            exact_flags.append(is_exact)
+            if level in levels and result:
+                result = result & names
+
+        if prefix:
+            self._last_match[len(keys)] = (keys, tuple(exact_flags), result)
+        return result
+
+    def filter_files(self, keys, prefix=False):
+        """ 同 match，但回傳排序好的 list (給目標檔案下拉選單用) """
+        return sorted(self.match(keys, prefix))
+
+    def exact_group(self, keys):
+        """
+        keys 篩出來的剛好是一整個 token 群組 (前面每一層都是完整 token、後面都不限) 的話
+        回傳那個群組 tuple (例如 ("batch", "task"))，不然 None (中間有不限、或是還沒打完的字)
+        """
+        keys = list(keys)
+        while keys and keys[-1] == "":
+            keys.pop()
+        for level, key in enumerate(keys, start=1):
+            if level >= len(self.by_level) or key not in self.by_level[level]:
+                return None
+        return tuple(keys)
+
+    @property
+    def depth(self):
+        """ 檔名最多切到第幾段 (fep-batch-task-sub.txt -> 3)，也就是最多幾層篩選 """
+        return max(0, len(self.by_level) - 1)
+
+    def tokens_at(self, level, keys=(), prefix=False):
+        """
+        在前面幾層條件 (keys) 篩完之後，列出 parts[level] 有哪些 token
+        例如 tokens_at(2, ["batch"]) -> Filter 1 選 batch 時 Filter 2 的選項
+        直接沿著階層樹往下走，花的時間只跟符合的節點數有關，跟資料夾大小無關
+        """
+        keys = (tuple(keys) + ("",) * level)[:level - 1] # 沒給的層 = 不限
+        nodes = [self.tree]
+        for lv, key in enumerate(keys, start=1):
+            if key == "":
+                nodes = [child for node in nodes for child in node.children.values()]
+            elif not prefix or (lv < len(self.by_level) and key in self.by_level[lv]):
+                # 完全符合 (跟 match 的規則一樣: 剛好是某個 token 就不用前綴比對)
+                nodes = [node.children[key] for node in nodes if key in node.children]
+            else:
+                nodes = [child for node in nodes
+                         for token, child in node.children.items() if token.startswith(key)]
+            if not nodes:
+                return []
+        tokens = set()
+        for node in nodes:
+            tokens.update(node.children)
+        return sorted(tokens)
+
+
+# ==========================
+# 讀檔 (表格的「完整內容」)
+# ==========================
+READ_FAILED = "(讀取失敗)"
+
+# 有些 note 是自動產生的 log，動輒好幾 MB，全部塞進記憶體會爆
+BODY_LIMIT = 256 * 1024        # 表格 / 快取 / 搜尋最多保留幾個字的內文
+TRUNCATED_MARK = "\n...(內容太長，以下省略)"
+MMAP_THRESHOLD = 1024 * 1024   # 超過 1MB 的檔案改用 mmap 找 Header，不用整個 decode
+
+# 跟 is_header_line 一樣的規則: 前面只有空白 (含全形空白) 然後是 #
+_HEADER_LINE_RE = re.compile(rb"^(?:[ \t\f\v\r]|\xe3\x80\x80)*#[^\n]*(?:\n|\Z)", re.M)
+
+
+def is_header_line(line):
+    """ # 開頭的行是 Header，更新時要保留、顯示時要濾掉 """
+    return line.strip().startswith("#")
+
+
+def _decode_header_line(raw):
+    """ mmap 抓到的 bytes -> 跟用文字模式讀到的一樣 (換行統一成 \\n) """
+    line = raw.decode("utf-8")
+    if line.endswith("\r\n"):
+        return line[:-2] + "\n"
+    if line.endswith("\r"):
+        return line[:-1] + "\n"
+    return line
+
+
+def scan_header_lines_mmap(path):
+    """ 大檔案用: mmap 整個檔案，用 regex 直接在 bytes 上找 # 開頭的行 (記憶體只用在 Header 上) """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return [_decode_header_line(m.group()) for m in _HEADER_LINE_RE.finditer(mm)]
+
+
+def read_note(path, body_limit=BODY_LIMIT):
+    """
+    讀檔並把 Header 跟內文分開 (一行一行串流讀，不會整個檔案塞進記憶體)
+    內文超過 body_limit 個字就截斷；這時候剩下的 Header 改用 mmap 找
+    回傳: (Header 行的 list, 過濾掉 # 開頭的行、去頭去尾空白的內文)
+    """
+    header_lines, body_lines = [], []
+    body_len = 0
+    truncated = False
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if is_header_line(line):
+                header_lines.append(line)
+                continue
+            body_lines.append(line)
+            body_len += len(line)
+            if body_len > body_limit:
+                truncated = True
+                break
+
+    body = "".join(body_lines).strip()
+    if truncated:
+        header_lines = scan_header_lines_mmap(path)
+        body = body[:body_limit] + TRUNCATED_MARK
+    return header_lines, body
+
+
+def read_note_body(path):
+    """ 讀檔並過濾掉 # 開頭的行，回傳去頭去尾空白的內文 """
+    return read_note(path)[1]
+
+
+def iter_notes(entries, max_workers=8, batch_size=64, flush_interval=0.1, cancel=None):
+    """
+    用 thread pool 平行讀檔 (網路磁碟上 I/O 會卡，開多一點 thread 比較快)。
+    每讀完 batch_size 個，或距離上一批超過 flush_interval 秒，就吐一批 [(檔名, Header, 內文), ...]。
+    讀不到的檔案 Header 是 None、內文是 READ_FAILED。
+    cancel 是 threading.Event，被 set 之後就把還沒跑的工作丟掉並結束。
+    """
+    def job(entry):
+        try:
+            header_lines, body = read_note(entry.path)
+            return entry.name, header_lines, body
+        except Exception:
+            return entry.name, None, READ_FAILED
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(job, entry) for entry in entries]
+        batch = []
+        last_flush = time.monotonic()
+        for fut in as_completed(futures):
+            if cancel is not None and cancel.is_set():
+                return
+            batch.append(fut.result())
+            now = time.monotonic()
+            if len(batch) >= batch_size or now - last_flush >= flush_interval:
+                yield batch
+                batch = []
+                last_flush = now
+        if batch:
+            yield batch
+    finally:
+        # 正常結束時 futures 都跑完了；被取消的話就把排隊中的丟掉，不等它們
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_note_bodies(entries, **kwargs):
+    """ 同 iter_notes，但每批只有 [(檔名, 內文), ...] """
+    for batch in iter_notes(entries, **kwargs):
+        yield [(name, body) for name, _, body in batch]
+
+
+class PagedTextReader:
+    """
+    分頁讀檔 (預覽用): 每次只讀 page_bytes，捲到底再讀下一頁。
+    每一頁都重新開檔 + seek，不會一直佔著檔案 (Windows 上佔著的話別人就改不了名)。
+    """
+
+    def __init__(self, path, page_bytes=64 * 1024, max_bytes=8 * 1024 * 1024, opener=open):
+        self.path = path
+        self.page_bytes = page_bytes
+        self.max_bytes = max_bytes # 預覽最多讀到這裡，再多就請用編輯器開
+        self.opener = opener # 換成別的 (例如 note_preview.LatencyOpener) 可以模擬慢的網路磁碟
+        self.offset = 0
+        self.at_end = False
+        # 增量 decoder: 中文字 / \r\n 被切在兩頁中間也不會壞掉
+        self._decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder("utf-8")(), translate=True)
+
+    @property
+    def hit_limit(self):
+        return not self.at_end and self.offset >= self.max_bytes
+
+    def read_page(self):
+        """ 讀下一頁，回傳文字 (已經讀完就回傳空字串) """
+        if self.at_end or self.hit_limit:
+            return ""
+        with self.opener(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read(self.page_bytes)
+        self.offset += len(data)
+        if len(data) < self.page_bytes:
+            self.at_end = True
+        return self._decoder.decode(data, final=self.at_end)
+
+    def state(self):
+        """ 讀到哪裡 (含 decoder 裡切一半的字)，之後可以用 restore 從這裡接著讀 """
+        return self.offset, self.at_end, self._decoder.getstate()
+
+    def restore(self, state):
+        self.offset, self.at_end, decoder_state = state
+        self._decoder.setstate(decoder_state)
+
+
+# ==========================
+# 更新 (保留 Header、換掉內文)
+# ==========================
+def read_header_lines(path):
+    """ 搶救 Header (# 開頭的行)，檔案不存在就回傳空的 """
+    header_lines = []
+    if os.path.exists(path):
+        if os.path.getsize(path) > MMAP_THRESHOLD:
+            return scan_header_lines_mmap(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if is_header_line(line):
+                    header_lines.append(line)
+    return header_lines
+
+
+def build_note_text(header_lines, version_str, new_content):
+    """ Header + 空行 + 版號 + 新內容 """
+    final_text_list = header_lines[:]
+    if final_text_list and not final_text_list[-1].endswith("\n"):
+        final_text_list.append("\n")
+
+    final_text_list.append(f"\n{version_str}\n")
+    final_text_list.append(new_content + "\n")
+    return "".join(final_text_list)
+
+
+def update_note(path, version_str, new_content, plan=None):
+    """
+    單一檔案: 讀舊 Header -> 組新內容 -> 寫回去
+    plan: 乾跑 (plan_note) 時算好的結果，檔案從那時候到現在沒變過就直接寫它，不用再讀一次
+    回傳: (讀了幾 bytes, 寫了幾 bytes)；失敗直接丟 Exception
+    """
+    text = planned_text(plan, path)
+    if text is None:
+        bytes_read = os.path.getsize(path) if os.path.exists(path) else 0
+        text = build_note_text(read_header_lines(path), version_str, new_content)
+    else:
+        bytes_read = 0 # 預覽時讀過了，這次沒讀
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return bytes_read, len(text.encode("utf-8"))
+
+
+# ==========================
+# 乾跑 (Dry Run): 先算出每個檔案改完長怎樣，給人看 diff
+# ==========================
+DIFF_MAX_LINES = 400 # 一個檔案的 diff 最多顯示幾行 (自動產生的大 log 改完整個內文都不一樣)
+DIFF_READ_LIMIT = 256 * 1024 # diff 最多拿舊檔案前面幾個字來比 (好幾 MB 的 log 不要整個讀進來)
+
+# size / mtime_ns: 算的時候檔案的狀態 (之後用來判斷 plan 還能不能直接寫)
+# new_text: 改完的完整內容；diff: unified diff 文字 (沒變就是空字串)；error: 讀不到的原因
+NotePlan = namedtuple("NotePlan", ["name", "size", "mtime_ns", "new_text", "diff", "error"])
+
+
+def plan_note(folder, name, version_str, new_content, diff_max_lines=DIFF_MAX_LINES,
+              diff_read_limit=DIFF_READ_LIMIT):
+    """
+    不寫檔，只算出 update_note 會寫出什麼 + 跟現在的 diff
+    一行一行串流讀 (跟 read_note 一樣)，diff 只拿前面 diff_read_limit 個字比；
+    超過的話剩下的 Header 照 read_header_lines 的方式找，整個檔案不會塞進記憶體
+    讀不到的檔案回傳 error 有值、new_text 是 None 的 NotePlan
+    """
+    path = os.path.join(folder, name)
+    header_lines, old_lines = [], []
+    old_len = 0
+    truncated = False
+    try:
+        st = os.stat(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if old_len >= diff_read_limit:
+                    truncated = True
+                    break
+                old_lines.append(line)
+                old_len += len(line)
+                if is_header_line(line):
+                    header_lines.append(line)
+        if truncated:
+            header_lines = read_header_lines(path)
+    except Exception as e:
+        return NotePlan(name, 0, 0, None, "", str(e))
+
+    new_text = build_note_text(header_lines, version_str, new_content)
+    diff = []
+    for line in difflib.unified_diff(old_lines, new_text.splitlines(keepends=True),
+                                     fromfile=f"{name} (目前)", tofile=f"{name} (更新後)", n=2):
+        if len(diff) >= diff_max_lines:
+            diff.append(f"... (diff 太長，只顯示前 {diff_max_lines} 行)\n")
+            break
+        diff.append(line if line.endswith("\n") else line + "\n")
+    if truncated:
+        diff.append(f"... (檔案太大，只拿前 {diff_read_limit // 1024} KB 來比，後面的內文一樣會被換掉)\n")
+    return NotePlan(name, st.st_size, st.st_mtime_ns, new_text, "".join(diff), "")
+
+
+def plan_notes(folder, names, version_str, new_content, max_workers=8):
+    """ 一次乾跑好幾個 (平行讀檔)，回傳的 NotePlan 順序跟 names 一樣 """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as executor:
+        return list(executor.map(lambda name: plan_note(folder, name, version_str, new_content),
+                                 names))
+
+
+def planned_text(plan, path):
+    """ plan 還有效 (檔案的 size/mtime 跟乾跑時一樣) 就回傳當時算好的內容，不然 None (要重算) """
+    if plan is None or plan.new_text is None:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    if st.st_size != plan.size or st.st_mtime_ns != plan.mtime_ns:
+        return None
+    return plan.new_text
+
+
+# 單一檔案的結果: 成功與否、錯誤訊息、I/O 量
+# elapsed: 這個檔案花了幾秒 (讀 Header + 寫入)，給效能紀錄用
+FileResult = namedtuple("FileResult", ["name", "ok", "error", "bytes_read", "bytes_written", "elapsed"],
+                        defaults=(0.0,))
+
+
+class BatchReport:
+    """ 一次批次更新的結果 + 吞吐量 """
+
+    def __init__(self, total):
+        self.total = total
+        self.results = []
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    @property
+    def succeeded(self):
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self):
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def skipped(self):
+        """ 被取消、根本沒跑到的檔案數 """
+        return self.total - len(self.results)
+
+    @property
+    def total_bytes(self):
+        return sum(r.bytes_read + r.bytes_written for r in self.results)
+
+    @property
+    def files_per_sec(self):
+        return len(self.results) / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def bytes_per_sec(self):
+        return self.total_bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def throughput_text(self):
+        return (f"耗時 {self.elapsed:.2f} 秒，{self.files_per_sec:.1f} 檔/秒，"
+                f"{self.bytes_per_sec / 1024:.1f} KB/秒")
+
+
+def run_batch_update(folder, names, version_str, new_content,
+                     max_workers=4, cancel=None, progress=None, plans=None, snapshot=None):
+    """
+    平行批次更新 (每個檔案各自 讀 Header -> 寫回)。
+    max_workers 限制同時寫幾個檔 (網路磁碟別一次開太多)。
+    cancel 是 threading.Event，set 之後還沒開始的檔案就不做了。
+    progress(完成數, 總數, FileResult) 每做完一個檔案呼叫一次 (在呼叫端的 thread)。
+    plans: 乾跑算好的 {檔名: NotePlan}，之後沒被改過的檔案直接寫預覽過的內容
+    snapshot: note_snapshots.SnapshotRecorder，每個檔案覆寫前先備份原本的內容 (備份失敗就不寫)
+    回傳: BatchReport
+    """
+    report = BatchReport(len(names))
+    started = time.perf_counter()
+    plans = plans or {}
+
+    def job(name):
+        if cancel is not None and cancel.is_set():
+            return None
+        file_started = time.perf_counter()
+        try:
+            path = os.path.join(folder, name)
+            if snapshot is not None:
+                snapshot.capture(name, path)
+            bytes_read, bytes_written = update_note(path, version_str, new_content, plans.get(name))
+            return FileResult(name, True, "", bytes_read, bytes_written,
+                              time.perf_counter() - file_started)
+        except Exception as e:
+            return FileResult(name, False, str(e), 0, 0, time.perf_counter() - file_started)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(job, name) for name in names]
+        for fut in as_completed(futures):
+            result = fut.result()
+            if result is None:
+                continue # 被取消，沒做
+            report.results.append(result)
+            if progress is not None:
+                progress(len(report.results), report.total, result)
+        # 取消之後排隊中的工作會馬上回 None，正在寫的那幾個還是會寫完並記錄下來
+
+    report.cancelled = report.skipped > 0
+    report.elapsed = time.perf_counter() - started
+    return report
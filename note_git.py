@@ -0,0 +1,171 @@
+"""
+Git 整合 (不依賴 Qt，直接叫 git 指令，不用另外裝套件)
+
+note 資料夾本身就在 git working tree 裡 (例如 D:\\SourceTree\\FEPP2\\source\\fep-release-note):
+  - 找變動: 不用把整個資料夾 stat 一遍，問 git status (它有 index 的 stat 快取) 哪些檔案不乾淨，
+    再加上 HEAD 有沒有動 (pull / checkout)，只看這些檔案
+  - 批次更新完: 整批 git add + git commit 各一次 (pathspec 從 stdin 丟進去，幾百個檔案也不會超過命令列長度)
+找不到 git、不是 repo、指令失敗，一律丟 GitError，呼叫端退回原本的全掃描
+"""
+import os
+import subprocess
+from collections import namedtuple
+
+GIT_EXE = "git"
+GIT_TIMEOUT = 60 # 秒
+
+# 一次 git 狀態快照: HEAD 的 commit + 當下不乾淨的檔案 {repo 相對路徑: XY 狀態碼}
+GitState = namedtuple("GitState", ["head", "dirty"])
+
+
+class GitError(Exception):
+    pass
+
+
+def _run_git(cwd, args, stdin=None):
+    """ 跑 git，回傳 stdout (bytes)；失敗丟 GitError """
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = 0x08000000 # CREATE_NO_WINDOW: 打包成 --noconsole 時不要一直閃黑窗
+    try:
+        # --literal-pathspecs: 傳進去的都是真的檔名，fep-[x].txt 的 [ ] * ? 不能被當成萬用字元
+        proc = subprocess.run([GIT_EXE, "-c", "core.quotepath=false", "--literal-pathspecs"] + args, cwd=cwd,
+                              input=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                              timeout=GIT_TIMEOUT, **kwargs)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise GitError(f"無法執行 git: {e}")
+    if proc.returncode != 0:
+        raise GitError(proc.stderr.decode("utf-8", "replace").strip() or f"git {args[0]} 失敗")
+    return proc.stdout
+
+
+def _pathspec(paths):
+    """ --pathspec-from-file=- --pathspec-file-nul 要的格式 """
+    return b"".join(p.encode("utf-8", "surrogateescape") + b"\0" for p in paths)
+
+
+class GitRepo:
+    def __init__(self, toplevel):
+        self.toplevel = toplevel
+
+    @classmethod
+    def find(cls, folder):
+        """ folder 在某個 git working tree 裡就回傳 GitRepo，不然 None (沒裝 git 也是 None) """
+        if not folder or not os.path.isdir(folder):
+            return None
+        try:
+            out = _run_git(folder, ["rev-parse", "--show-toplevel"])
+        except GitError:
+            return None
+        return cls(os.path.normpath(out.decode("utf-8", "surrogateescape").strip()))
+
+    # ==========================
+    # 路徑換算 (repo 相對 <-> note 資料夾相對，都用 "/")
+    # ==========================
+    def to_repo_path(self, base, name):
+        return os.path.relpath(os.path.join(base, name), self.toplevel).replace(os.sep, "/")
+
+    def from_repo_path(self, base, repo_path):
+        """ repo 相對路徑 -> 相對 base 的檔名；不在 base 底下就 None """
+        rel = os.path.relpath(os.path.join(self.toplevel, repo_path), base).replace(os.sep, "/")
+        return None if rel == ".." or rel.startswith("../") else rel
+
+    def pathspecs_for(self, spec):
+        """ ScanSpec 的每個根資料夾 -> repo 相對路徑 (git status 只看這些地方)；有根不在 repo 裡就丟 GitError """
+        specs = []
+        for root in spec.roots:
+            try:
+                rel = os.path.relpath(os.path.abspath(root), self.toplevel).replace(os.sep, "/")
+            except ValueError:
+                rel = ".." # 不同磁碟機
+            if rel == ".." or rel.startswith("../"):
+                raise GitError(f"{root} 不在 {self.toplevel} 這個 repo 裡")
+            specs.append(rel)
+        return specs
+
+    # ==========================
+    # 狀態 / 變動
+    # ==========================
+    def head(self):
+        """ 目前 HEAD 的 commit (還沒有任何 commit 的新 repo 是空字串) """
+        try:
+            return _run_git(self.toplevel, ["rev-parse", "-q", "--verify", "HEAD"]).decode().strip()
+        except GitError:
+            return ""
+
+    def status(self, pathspecs=()):
+        """
+        git status (只看 pathspecs 底下) -> {repo 相對路徑: XY}
+        未追蹤的檔案也列 (新增的 note)；改名的話新舊兩個路徑都算
+        """
+        out = _run_git(self.toplevel, ["status", "--porcelain=v1", "-z", "--untracked-files=all",
+                                       "--no-renames", "--"] + list(pathspecs or ["."]))
+        dirty = {}
+        for item in out.split(b"\0"):
+            if len(item) < 4:
+                continue
+            dirty[item[3:].decode("utf-8", "surrogateescape")] = item[:2].decode()
+        return dirty
+
+    def is_ignored(self, repo_path):
+        """
+        被 .gitignore 擋掉的話 git status 根本不會回報新檔案
+        (--no-index: 資料夾本身有檔案被追蹤也照樣看規則，不然 check-ignore 會直接說沒被忽略)
+        """
+        try:
+            _run_git(self.toplevel, ["check-ignore", "-q", "--no-index", "--", repo_path])
+            return True
+        except GitError:
+            return False # exit code 1 = 沒被忽略
+
+    def snapshot(self, pathspecs=()):
+        return GitState(self.head(), self.status(pathspecs))
+
+    def changed_between(self, old_head, new_head, pathspecs=()):
+        """ 兩個 commit 之間有動到的檔案 (pull / checkout / 別人 commit) """
+        if not old_head or not new_head or old_head == new_head:
+            return set()
+        out = _run_git(self.toplevel, ["diff", "--name-only", "-z", "--no-renames",
+                                       old_head, new_head, "--"] + list(pathspecs or ["."]))
+        return {p.decode("utf-8", "surrogateescape") for p in out.split(b"\0") if p}
+
+    def changes_since(self, state, pathspecs=()):
+        """
+        從上次的快照到現在，可能有變的檔案 (repo 相對路徑)
+        = 現在不乾淨的 + 上次不乾淨的 (可能被還原了) + HEAD 之間有動的
+        其他檔案跟 HEAD 一樣、HEAD 也沒動，內容一定沒變，不用看
+        回傳: (候選路徑 set, 新的 GitState)
+        """
+        if state is None:
+            raise GitError("沒有上次的 git 快照") # 呼叫端退回全掃描
+        new_state = self.snapshot(pathspecs)
+        if state.head != new_state.head and not (state.head and new_state.head):
+            raise GitError("HEAD 從無到有 (或反過來)，沒辦法比") # 一樣退回全掃描
+        candidates = set(new_state.dirty) | set(state.dirty)
+        candidates |= self.changed_between(state.head, new_state.head, pathspecs)
+        return candidates, new_state
+
+    # ==========================
+    # 提交
+    # ==========================
+    def commit(self, paths, message):
+        """
+        整批 add + commit (各一次 git 指令)，只提交這些檔案 (別人 stage 的東西不會被一起帶進去)
+        回傳: 新的 commit hash；這些檔案其實都沒變的話回傳空字串
+        """
+        if not paths:
+            return ""
+        spec = _pathspec(paths)
+        _run_git(self.toplevel, ["add", "--pathspec-from-file=-", "--pathspec-file-nul"], stdin=spec)
+        # git diff 不吃 --pathspec-from-file，改看這些檔案所在資料夾的 status (資料夾沒幾個)
+        dirs = sorted({os.path.dirname(p) or "." for p in paths})
+        wanted = set(paths)
+        if not any(path in wanted and xy[0] not in " ?" for path, xy in self.status(dirs).items()):
+            return "" # 寫進去的內容跟原本一模一樣，沒東西可以 commit
+        _run_git(self.toplevel, ["commit", "-q", "-m", message,
+                                 "--pathspec-from-file=-", "--pathspec-file-nul"], stdin=spec)
+        return self.head()
+
+
+def default_commit_message(version_str, count):
+    return f"Release note {version_str} ({count} 個檔案)"
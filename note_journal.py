@@ -0,0 +1,250 @@
+"""
+交易式批次寫入 (Write-Ahead Journal)
+
+流程:
+  1. prepare: 每個檔案先寫到旁邊的暫存檔 (xxx.txt.fep-tmp) 並 fsync，原檔完全不動
+  2. commit : 全部暫存檔都寫好之後，journal 補一行 commit 並 fsync (這一刻才算「決定要套用」)
+  3. apply  : 用 os.replace 把暫存檔一個個換上去 (atomic rename)，最後每個資料夾只 fsync 一次
+  4. done   : 刪掉 journal
+
+中途當機 / 網路斷線的話，下次啟動時 recover_journals 會:
+  - 沒有 commit -> rollback: 刪掉暫存檔，原檔都還在
+  - 有 commit   -> roll forward: 把還沒換上去的暫存檔換完
+所以一個批次不會只套用一半。
+"""
+import os
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from note_core import read_header_lines, build_note_text, planned_text, BatchReport, FileResult
+
+TMP_SUFFIX = ".fep-tmp"
+JOURNAL_EXT = ".journal"
+
+
+def fsync_dir(folder):
+    """ 讓 rename 本身也落地 (Windows 沒辦法對資料夾 fsync，就跳過) """
+    if os.name != "posix":
+        return
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class Journal:
+    """ 一個批次的 journal 檔 (JSON Lines，一行一筆狀態，每寫一行就 fsync) """
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def create(cls, journal_dir, folder, names, version_str):
+        os.makedirs(journal_dir, exist_ok=True)
+        batch_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        journal = cls(os.path.join(journal_dir, batch_id + JOURNAL_EXT))
+        journal.append({"state": "prepare", "batch": batch_id, "folder": folder,
+                        "version": version_str, "files": list(names)})
+        return journal
+
+    def append(self, record):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read(self):
+        """ 回傳: (prepare 那一行, 最後的 state) """
+        header, state = None, None
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break # 寫到一半就斷電的最後一行，當作沒寫
+                if header is None:
+                    header = record
+                state = record.get("state")
+        return header, state
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def fsync_parent_dirs(folder, names):
+    """ 檔名可以帶子資料夾 (遞迴掃描)，每個有動到的資料夾都 fsync 一次 """
+    for parent in sorted({os.path.dirname(os.path.join(folder, name)) for name in names}):
+        fsync_dir(parent)
+
+
+def _tmp_path(path):
+    return path + TMP_SUFFIX
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def prepare_note(path, version_str, new_content, plan=None):
+    """
+    寫暫存檔並 fsync (原檔不動)
+    plan: 乾跑算好的 NotePlan，檔案沒變過就直接用 (同 note_core.update_note)
+    回傳: (讀了幾 bytes, 寫了幾 bytes)
+    """
+    text = planned_text(plan, path)
+    if text is None:
+        bytes_read = os.path.getsize(path) if os.path.exists(path) else 0
+        text = build_note_text(read_header_lines(path), version_str, new_content)
+    else:
+        bytes_read = 0
+    with open(_tmp_path(path), "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    return bytes_read, len(text.encode("utf-8"))
+
+
+def run_safe_batch_update(folder, names, version_str, new_content, journal_dir,
+                          max_workers=4, cancel=None, progress=None, plans=None, snapshot=None):
+    """
+    交易式版本的 note_core.run_batch_update (參數跟回傳都一樣)。
+    全部檔案 prepare 成功才會套用；有任何一個失敗或被取消，整批都不動。
+    暫存檔的寫入 + fsync 是平行做的，commit 只 fsync 一次 journal、每個資料夾也只 fsync 一次，
+    所以速度跟以前直接覆寫差不多。
+    """
+    report = BatchReport(len(names))
+    started = time.perf_counter()
+    plans = plans or {}
+    journal = Journal.create(journal_dir, folder, names, version_str)
+
+    # --- 1. prepare (平行) ---
+    def job(name):
+        if cancel is not None and cancel.is_set():
+            return None
+        file_started = time.perf_counter()
+        try:
+            path = os.path.join(folder, name)
+            if snapshot is not None:
+                snapshot.capture(name, path) # prepare 時原檔還沒動，這時候備份的就是更新前的內容
+            bytes_read, bytes_written = prepare_note(path, version_str, new_content, plans.get(name))
+            return FileResult(name, True, "", bytes_read, bytes_written,
+                              time.perf_counter() - file_started)
+        except Exception as e:
+            return FileResult(name, False, str(e), 0, 0, time.perf_counter() - file_started)
+
+    prepared = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(job, name) for name in names]
+        for fut in as_completed(futures):
+            result = fut.result()
+            if result is None:
+                continue
+            prepared.append(result)
+            if progress is not None:
+                progress(len(prepared), report.total, result)
+
+    failed = [r for r in prepared if not r.ok]
+    if failed or len(prepared) < len(names):
+        # --- 有人失敗 / 被取消: 整批 rollback ---
+        for name in names:
+            _remove_quietly(_tmp_path(os.path.join(folder, name)))
+        journal.append({"state": "rollback"})
+        journal.remove()
+        # 成功 prepare 的也沒有套用，一律標成沒做
+        report.results = [r if not r.ok else
+                          FileResult(r.name, False, "整批取消，未套用", r.bytes_read, 0, r.elapsed)
+                          for r in prepared]
+        report.cancelled = len(prepared) < len(names)
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    # --- 2. commit ---
+    journal.append({"state": "commit"})
+
+    # --- 3. apply (rename 很快，直接做) ---
+    results = []
+    for r in prepared:
+        path = os.path.join(folder, r.name)
+        try:
+            os.replace(_tmp_path(path), path)
+            results.append(r)
+        except Exception as e:
+            # commit 之後還失敗的話 journal 會留著，下次啟動再補做
+            results.append(FileResult(r.name, False, str(e), r.bytes_read, 0, r.elapsed))
+    fsync_parent_dirs(folder, [r.name for r in results if r.ok])
+
+    # --- 4. done ---
+    if all(r.ok for r in results):
+        journal.append({"state": "done"})
+        journal.remove()
+    report.results = results
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def recover_journals(journal_dir):
+    """
+    啟動時呼叫: 把上次沒跑完的批次收尾。
+    回傳: 給人看的訊息 list (沒事就是空的)
+    """
+    messages = []
+    if not os.path.isdir(journal_dir):
+        return messages
+
+    for fname in sorted(os.listdir(journal_dir)):
+        if not fname.endswith(JOURNAL_EXT):
+            continue
+        journal = Journal(os.path.join(journal_dir, fname))
+        try:
+            header, state = journal.read()
+        except OSError as e:
+            messages.append(f"{fname}: 無法讀取 journal ({e})")
+            continue
+        if header is None:
+            journal.remove()
+            continue
+
+        folder = header["folder"]
+        names = header["files"]
+        batch = header.get("batch", fname)
+        if not os.path.isdir(folder):
+            # 網路磁碟還沒掛上之類的，journal 先留著
+            messages.append(f"批次 {batch}: 找不到資料夾 {folder}，下次再處理。")
+            continue
+
+        if state in ("done", "rollback"):
+            pass # 其實已經結束了，只是沒來得及刪 journal
+        elif state == "commit":
+            # roll forward: 暫存檔還在的就換上去
+            restored, errors = 0, []
+            for name in names:
+                path = os.path.join(folder, name)
+                if os.path.exists(_tmp_path(path)):
+                    try:
+                        os.replace(_tmp_path(path), path)
+                        restored += 1
+                    except OSError as e:
+                        errors.append(f"{name}: {e}")
+            if errors:
+                messages.append(f"批次 {batch} 補寫失敗，journal 保留下次再試:\n" + "\n".join(errors))
+                continue
+            fsync_parent_dirs(folder, names)
+            messages.append(f"批次 {batch} ({header.get('version', '')}) 上次沒寫完，"
+                            f"已補完 {restored} 個檔案。")
+        else:
+            # 沒 commit: rollback，原檔都沒被動過
+            for name in names:
+                _remove_quietly(_tmp_path(os.path.join(folder, name)))
+            messages.append(f"批次 {batch} ({header.get('version', '')}) 上次沒完成，"
+                            f"已整批取消 (原檔未變動)。")
+        journal.remove()
+    return messages
@@ -0,0 +1,209 @@
+"""
+預覽的背景讀檔 + 預先讀取 (不依賴 Qt)
+
+網路磁碟每開一個檔都要等一趟來回，用方向鍵一個一個往下看時每一格都會卡一下:
+  - 讀檔一律丟到背景 thread，畫面不用等
+  - 選到某個檔案時，順便把目標清單裡前後幾個 (往移動的方向多讀幾個) 先讀起來
+  - 讀好的第一頁放在有上限的 LRU 快取裡，下一格通常已經在裡面了
+  - 清單很快捲過去時，還沒開始讀的預先讀取會被取消 (正在讀的讀完就放進快取)
+另外附一個會故意變慢的 opener (LatencyOpener)，在本機就能重現網路磁碟的延遲 (bench_notes.py 用)。
+"""
+import os
+import time
+import threading
+from collections import OrderedDict, Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from note_core import PagedTextReader
+from note_trace import tracer
+
+# 一個檔案預覽的第一頁: text 是內容，state 是讀完第一頁的位置 (PagedTextReader.state)，error 是讀不到的原因
+PreviewPage = namedtuple("PreviewPage", ["name", "text", "state", "error", "loaded_at"])
+
+
+class LatencyOpener:
+    """ 每次開檔前先睡 latency 秒，模擬高延遲的網路磁碟 (測試 / benchmark 用) """
+
+    def __init__(self, latency, opener=open):
+        self.latency = latency
+        self.opener = opener
+        self.calls = 0 # 開了幾次檔 (看預先讀取 / 快取有沒有效)
+        self._lock = threading.Lock()
+
+    def __call__(self, path, mode="r", *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self.opener(path, mode, *args, **kwargs)
+
+
+class PreviewLoader:
+    """
+    一個資料夾的預覽讀取器 (換資料夾就換一個新的，舊的 close 掉)
+    on_ready(PreviewPage) 會在背景 thread 被呼叫 (GUI 那邊要自己轉回主執行緒)
+    """
+    AHEAD = 4  # 往移動的方向預先讀幾個
+    BEHIND = 1 # 反方向讀幾個
+
+    def __init__(self, folder, on_ready=None, max_entries=64, max_age=10.0, max_workers=4, opener=open):
+        self.folder = folder
+        self.on_ready = on_ready
+        self.max_entries = max_entries
+        self.max_age = max_age # 快取只信這麼多秒 (別台電腦改的檔案，監看不一定馬上知道)
+        self.opener = opener
+        self._cache = OrderedDict() # 檔名 -> PreviewPage，最近用到的在後面
+        self._pending = {}          # 檔名 -> (編號, Future) 排隊中 / 讀取中
+        self._seq = 0               # 每排一次 +1 (讀完時對一下還是不是同一次，被 invalidate 過就丟掉)
+        self._wanted = set()        # 目前在預先讀取範圍裡的檔名 (範圍外的排隊工作會被取消)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="preview")
+        # 馬上要看的另外開一條，不用排在預先讀取後面 (網路磁碟上多等一趟就很明顯)
+        self._urgent = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preview-now")
+        self._closed = False
+
+    # ==========================
+    # 快取
+    # ==========================
+    def get(self, name):
+        """ 快取裡有 (而且還沒過期) 就回傳 PreviewPage，不然 None """
+        with self._lock:
+            page = self._cache.get(name)
+            if page is None:
+                return None
+            if time.monotonic() - page.loaded_at > self.max_age:
+                del self._cache[name]
+                return None
+            self._cache.move_to_end(name)
+            return page
+
+    def invalidate(self, names):
+        """ 這些檔案被改過 / 刪掉了，快取拿掉 (正在讀的讀完也不要放進來) """
+        with self._lock:
+            for name in names:
+                self._cache.pop(name, None)
+                pending = self._pending.pop(name, None)
+                if pending is not None:
+                    pending[1].cancel()
+
+    def _store(self, page):
+        with self._lock:
+            self._cache[page.name] = page
+            self._cache.move_to_end(page.name)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    # ==========================
+    # 讀取
+    # ==========================
+    def _read(self, name, seq, prefetch):
+        with tracer.span("preview_read", file=name, prefetch=prefetch):
+            reader = PagedTextReader(os.path.join(self.folder, name), opener=self.opener)
+            try:
+                text = reader.read_page()
+                page = PreviewPage(name, text, reader.state(), "", time.monotonic())
+            except Exception as e:
+                page = PreviewPage(name, "", None, str(e), time.monotonic())
+        with self._lock:
+            pending = self._pending.get(name)
+            current = pending is not None and pending[0] == seq # 讀的時候被 invalidate 的話就不算數
+            if current:
+                del self._pending[name]
+        if not current:
+            return
+        if not page.error:
+            self._store(page)
+        if self.on_ready is not None and not self._closed:
+            self.on_ready(page)
+
+    def _submit(self, name, prefetch):
+        """ 已經在快取 (還沒過期) / 在排隊的就不重複讀 (呼叫前要拿著 lock) """
+        if self._closed or name in self._pending:
+            return
+        page = self._cache.get(name)
+        if page is not None:
+            if time.monotonic() - page.loaded_at <= self.max_age:
+                return
+            del self._cache[name]
+        self._seq += 1
+        executor = self._executor if prefetch else self._urgent
+        self._pending[name] = (self._seq, executor.submit(self._read, name, self._seq, prefetch))
+
+    def request(self, name):
+        """ 馬上要看的檔案: 背景讀，讀完呼叫 on_ready (已經在讀的就等它) """
+        with self._lock:
+            self._wanted.add(name)
+            pending = self._pending.get(name)
+            if pending is not None and pending[1].cancel():
+                del self._pending[name] # 還排在預先讀取的隊伍裡: 抽出來改排馬上要看的那條
+            self._submit(name, False)
+
+    def prefetch(self, names, index, step=1):
+        """
+        names[index] 是目前選到的檔案，step 是上一次移動的方向 (+1 往下、-1 往上)
+        把它前後幾個排進來讀；之前排了、但已經不在這個範圍裡的 (還沒開始讀) 取消掉
+        """
+        ahead, behind = (self.AHEAD, self.BEHIND) if step >= 0 else (self.BEHIND, self.AHEAD)
+        window = [names[i] for i in range(index + 1, min(len(names), index + 1 + ahead))]
+        window += [names[i] for i in range(index - 1, max(-1, index - 1 - behind), -1)]
+        with self._lock:
+            self._wanted = set(window)
+            if 0 <= index < len(names):
+                self._wanted.add(names[index])
+            for name, (_, fut) in list(self._pending.items()):
+                if name not in self._wanted and fut.cancel():
+                    del self._pending[name]
+            for name in window:
+                self._submit(name, True)
+
+    def close(self):
+        """ 換資料夾 / 關程式: 排隊中的都不讀了 (正在讀的讀完就丟掉) """
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._urgent.shutdown(wait=False, cancel_futures=True)
+
+
+# ==========================
+# 整批 (=== 選項) 的摘要: 全部用記憶體裡的索引 / 版號，不讀檔
+# ==========================
+def batch_summary(names, entries, version_of, max_list=50):
+    """
+    names: 目標清單裡的檔名；entries: {檔名: NoteEntry}；version_of(檔名) -> NoteVersion 或 None
+    回傳: 給預覽區顯示的文字
+    """
+    versions = Counter()
+    groups = Counter()
+    total_size, latest = 0, None
+    for name in names:
+        version = version_of(name)
+        versions[version.text if version is not None else None] += 1
+        entry = entries.get(name)
+        if entry is None:
+            continue
+        groups[entry.tokens[1] if len(entry.tokens) > 1 else "(無)"] += 1
+        total_size += entry.size
+        if latest is None or entry.mtime_ns > latest.mtime_ns:
+            latest = entry
+
+    lines = [f"整批共 {len(names)} 個檔案，合計 {total_size / 1024:.1f} KB"]
+    if latest is not None:
+        modified = time.strftime("%Y-%m-%d %H:%M", time.localtime(latest.mtime_ns / 1e9))
+        lines.append(f"最近修改: {modified} ({latest.name})")
+    lines.append("")
+    lines.append("目前版號:")
+    for text, count in sorted(versions.items(), key=lambda kv: (-kv[1], kv[0] or "")):
+        lines.append(f"  {text or '(沒有版號)'}  {count} 個")
+    if len(groups) > 1:
+        lines.append("")
+        lines.append("檔名第二段:")
+        for group, count in groups.most_common(20):
+            lines.append(f"  {group}  {count} 個")
+        if len(groups) > 20:
+            lines.append(f"  ... 還有 {len(groups) - 20} 組")
+    lines.append("")
+    lines.append("檔案:")
+    for name in names[:max_list]:
+        version = version_of(name)
+        lines.append(f"  {name}  {version.text if version is not None else ''}".rstrip())
+    if len(names) > max_list:
+        lines.append(f"  ... 還有 {len(names) - max_list} 個")
+    return "\n".join(lines)
@@ -0,0 +1,305 @@
+"""
+彙整報表匯出 (Markdown / JSON / CSV)，不依賴 Qt
+
+部署完要貼一份總表時，不用再從表格「完整內容」一格一格複製:
+  - 內文用跟表格一樣的規則 (拿掉 # 開頭的 Header、去頭尾空白)，但不截斷: 表格只留前 BODY_LIMIT 個字，
+    報表要完整的 (大檔案用 PagedTextReader 一頁一頁讀，一次只有一個大檔案的內文在記憶體裡)
+  - 可以照檔名 token、照版號分組 (可以兩層: 先 token 再版號，或反過來)
+  - 邊讀邊寫 (一次只讀一小段檔案)，幾萬個檔案記憶體也不會一直長
+分組要先知道每個檔案在哪一組: token 看檔名就知道；版號先很快掃一輪每個檔案的版號那一行
+(GUI 已經有 VersionRegistry 的話直接用它)，排好順序再開始讀內文。
+寫到檔案的話先寫暫存檔，整份寫完才換成正式檔名 (取消 / 失敗不會留下寫一半的報表)。
+"""
+import os
+import sys
+import csv
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from note_core import split_tokens, is_header_line, read_note, PagedTextReader, READ_FAILED, BODY_LIMIT
+from note_versions import parse_body_version
+
+FORMATS = ("md", "json", "csv")
+GROUP_FIELDS = ("token", "version")
+NO_VERSION = "(無版號)"
+NO_TOKEN = "(無)"
+READ_CHUNK = 64 # 一次平行讀幾個檔案 (記憶體裡最多就這麼多份內文)
+
+
+class ExportCancelled(Exception):
+    """ 匯出到一半被取消 (export_report_file 會把寫一半的暫存檔刪掉) """
+
+
+def format_from_path(path, default="md"):
+    """ 看副檔名決定格式: .md / .markdown / .json / .csv """
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext == "markdown":
+        return "md"
+    return ext if ext in FORMATS else default
+
+
+def parse_group_by(text):
+    """ "token,version" -> ("token", "version")；"none" 或空的 -> () """
+    fields = tuple(f.strip().lower() for f in text.split(",") if f.strip() and f.strip().lower() != "none")
+    for field in fields:
+        if field not in GROUP_FIELDS:
+            raise ValueError(f"分組只能是 {' / '.join(GROUP_FIELDS)} (用逗號隔開)：{field}")
+    return fields
+
+
+def read_version_line(path):
+    """ 只讀到版號那一行 (Header 之後第一個非空白行) 就停，回傳 NoteVersion 或 None """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if is_header_line(line) or not line.strip():
+                    continue
+                return parse_body_version(line)
+    except (OSError, UnicodeDecodeError):
+        pass
+    return None
+
+
+def token_group(name, level=1):
+    """ fep-batch-task-sub.txt，level=2 -> "batch-task" (檔名沒那麼多段就到有的為止) """
+    tokens = split_tokens(os.path.basename(name))[1:level + 1]
+    return "-".join(tokens) if tokens else NO_TOKEN
+
+
+def _version_sort_key(version):
+    """ 版號分組: 流水號新的在前面，不是數字的流水號接在後面，沒版號的放最後 """
+    if version is None:
+        return (2, 0, "", "", "")
+    if version.seq.isdigit():
+        return (0, -int(version.seq), version.seq, version.stage, version.env)
+    return (1, 0, version.seq, version.stage, version.env)
+
+
+def order_names(folder, names, group_by=("token",), level=1, versions=None, max_workers=8):
+    """
+    照分組排好順序
+    versions: 檔名 -> NoteVersion (或 None) 的 callable；沒給就自己掃一輪版號那一行
+    回傳: [(檔名, 分組值 tuple, NoteVersion), ...]
+    """
+    if versions is None:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            found = list(executor.map(lambda n: read_version_line(os.path.join(folder, n)), names))
+    else:
+        found = [versions(name) for name in names]
+
+    rows = []
+    for name, version in zip(names, found):
+        keys, sort_keys = [], []
+        for field in group_by:
+            if field == "token":
+                group = token_group(name, level)
+                keys.append(group)
+                sort_keys.append((group == NO_TOKEN, group))
+            else:
+                keys.append(version.text if version is not None else NO_VERSION)
+                sort_keys.append(_version_sort_key(version))
+        rows.append((tuple(sort_keys), name, tuple(keys), version))
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return [(name, keys, version) for _, name, keys, version in rows]
+
+
+def read_full_body(path):
+    """ 完整內文 (不截斷): PagedTextReader 一頁一頁讀，邊讀邊拿掉 # 開頭的行，規則跟 read_note 一樣 """
+    reader = PagedTextReader(path, max_bytes=sys.maxsize)
+    parts, rest = [], ""
+    while not reader.at_end:
+        lines = (rest + reader.read_page()).split("\n")
+        rest = lines.pop() # 最後一行可能被切在兩頁中間，跟下一頁接起來再判斷
+        parts.extend(line + "\n" for line in lines if not is_header_line(line))
+    if rest and not is_header_line(rest):
+        parts.append(rest)
+    return "".join(parts).strip()
+
+
+def _read_body(folder, name):
+    """ 小檔案一起平行讀；可能超過 BODY_LIMIT 的回傳 None，輪到它時再完整讀 (見 iter_records) """
+    path = os.path.join(folder, name)
+    try:
+        if os.path.getsize(path) > BODY_LIMIT: # bytes 沒超過的話字數一定沒超過
+            return None
+        return read_note(path)[1]
+    except Exception:
+        return READ_FAILED
+
+
+def _read_large_body(folder, name):
+    try:
+        return read_full_body(os.path.join(folder, name))
+    except Exception:
+        return READ_FAILED
+
+
+def _content_of(body, version):
+    """ 內文拿掉第一行的版號 (版號另外一欄) """
+    if version is not None and body.split("\n", 1)[0].strip() == version.text:
+        return body.split("\n", 1)[1].strip() if "\n" in body else ""
+    return body
+
+
+def iter_records(folder, ordered, max_workers=8, cancel=None):
+    """
+    照 order_names 排好的順序一段一段平行讀，一筆一筆吐出
+    yield: (檔名, 分組值 tuple, NoteVersion 或 None, 內文 (不含版號那行))
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i in range(0, len(ordered), READ_CHUNK):
+            if cancel is not None and cancel.is_set():
+                return
+            chunk = ordered[i:i + READ_CHUNK]
+            bodies = executor.map(lambda row: _read_body(folder, row[0]), chunk)
+            for (name, keys, version), body in zip(chunk, bodies):
+                if body is None:
+                    body = _read_large_body(folder, name)
+                yield name, keys, version, _content_of(body, version)
+
+
+# ==========================
+# 各種格式的 writer (開頭 / 換組 / 一筆 / 結尾)
+# ==========================
+class MarkdownWriter:
+    def __init__(self, out, meta):
+        self.out = out
+        self.meta = meta
+        self.group_by = meta["group_by"]
+        self._last_keys = None
+
+    def begin(self):
+        self.out.write("# FEP Release Report\n\n")
+        self.out.write(f"- 產生時間: {self.meta['generated']}\n")
+        self.out.write(f"- 資料夾: {self.meta['folder']}\n")
+        self.out.write(f"- 檔案數: {self.meta['count']}\n")
+        if self.group_by:
+            self.out.write(f"- 分組: {' → '.join(self.meta['group_labels'])}\n")
+        self.out.write("\n")
+
+    def record(self, name, keys, version, content):
+        if keys != self._last_keys:
+            # 只有變了的那一層 (跟它下面的) 要重新下標題
+            depth = 0
+            if self._last_keys is not None:
+                while depth < len(keys) and keys[depth] == self._last_keys[depth]:
+                    depth += 1
+            for level in range(depth, len(keys)):
+                self.out.write(f"{'#' * (level + 2)} {keys[level]}\n\n")
+            self._last_keys = keys
+        title = name
+        if "version" not in self.group_by and version is not None:
+            title += f" — {version.text}"
+        fence = "```"
+        while fence in content:
+            fence += "`"
+        self.out.write(f"{'#' * (len(keys) + 2)} {title}\n\n{fence}text\n{content}\n{fence}\n\n")
+
+    def end(self):
+        pass
+
+
+class JsonWriter:
+    """ {"generated":..., "files": [...]} 邊寫邊吐；分組就是排序 + 每筆的 group 欄位 """
+    def __init__(self, out, meta):
+        self.out = out
+        self.meta = meta
+        self._first = True
+
+    def begin(self):
+        head = {k: self.meta[k] for k in ("generated", "folder", "count", "group_by")}
+        text = json.dumps(head, ensure_ascii=False, indent=2)
+        self.out.write(text[:-2] + ',\n  "files": [')
+
+    def record(self, name, keys, version, content):
+        item = {"file": name,
+                "group": dict(zip(self.meta["group_by"], keys)),
+                "version": version.text if version is not None else None,
+                "stage": version.stage if version is not None else None,
+                "seq": version.seq if version is not None else None,
+                "env": version.env if version is not None else None,
+                "content": content}
+        self.out.write(("\n    " if self._first else ",\n    ") + json.dumps(item, ensure_ascii=False))
+        self._first = False
+
+    def end(self):
+        self.out.write("\n  ]\n}\n")
+
+
+class CsvWriter:
+    """ 一個檔案一列 (out 要用 newline="" 開) """
+    COLUMNS = ["file", "token_group", "version", "stage", "seq", "env", "content"]
+
+    def __init__(self, out, meta):
+        self.writer = csv.writer(out)
+        self.level = meta["level"]
+
+    def begin(self):
+        self.writer.writerow(self.COLUMNS)
+
+    def record(self, name, keys, version, content):
+        v = version or ("", "", "")
+        self.writer.writerow([name, token_group(name, self.level),
+                              version.text if version is not None else "", v[0], v[1], v[2], content])
+
+    def end(self):
+        pass
+
+
+WRITERS = {"md": MarkdownWriter, "json": JsonWriter, "csv": CsvWriter}
+
+
+def export_report(out, folder, names, fmt="md", group_by=("token",), level=1, versions=None,
+                  max_workers=8, cancel=None, progress=None):
+    """
+    把 names 這些 note 串流寫成一份報表到 out (已經開好的文字檔；CSV 記得 newline="")
+    group_by: ("token",)、("version",)、("token", "version")... 或 () 不分組
+    level: token 分組看到檔名第幾段 (1 = parts[1]，2 = parts[1]-parts[2] ...)
+    versions / cancel / progress(完成數, 總數) 都可以不給
+    回傳: 寫了幾筆；被取消的話丟 ExportCancelled (結尾沒寫，out 裡是不完整的報表)
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"格式只能是 {' / '.join(FORMATS)}：{fmt}")
+    ordered = order_names(folder, names, group_by, level, versions, max_workers)
+    token_label = "檔名 token" if level == 1 else f"檔名前 {level} 段 token"
+    labels = [token_label if f == "token" else "版號" for f in group_by]
+    meta = {"generated": time.strftime("%Y-%m-%d %H:%M:%S"), "folder": folder,
+            "count": len(ordered), "group_by": list(group_by), "group_labels": labels,
+            "level": level}
+    writer = WRITERS[fmt](out, meta)
+    writer.begin()
+    done = 0
+    for name, keys, version, content in iter_records(folder, ordered, max_workers, cancel):
+        writer.record(name, keys, version, content)
+        done += 1
+        if progress is not None:
+            progress(done, len(ordered))
+    if done < len(ordered):
+        raise ExportCancelled(f"匯出已取消 ({done} / {len(ordered)})")
+    writer.end()
+    return done
+
+
+def export_report_file(path, folder, names, fmt=None, **kwargs):
+    """
+    export_report 寫到檔案: 先寫同一個資料夾的暫存檔，完成才換成 path
+    取消 / 失敗的話暫存檔刪掉、原本的 path 不動，Exception 照樣丟出去
+    fmt 沒給就看副檔名；CSV 加 BOM (Excel 直接開中文才不會亂碼)
+    回傳: 寫了幾筆
+    """
+    fmt = fmt or format_from_path(path)
+    encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp, "w", encoding=encoding, newline="" if fmt == "csv" else None) as out:
+            count = export_report(out, folder, names, fmt, **kwargs)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return count
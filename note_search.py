@@ -0,0 +1,123 @@
+"""
+內容全文搜尋 (倒排索引)
+
+英數字: 轉小寫後切成單字 (ticket-1234 -> "ticket", "1234")
+中日韓: 沒有空白可以切，改用單字 + 相鄰兩字 (bigram)，
+        "修正匯率" -> "修", "正", "匯", "率", "修正", "正匯", "匯率"
+查詢時每個詞都要出現 (AND)，用 tf-idf 排序。
+索引是增量維護的 (add / remove)，可以在背景 thread 一邊讀檔一邊建。
+GUI 第一次用到內容搜尋才建 (熱啟動只看快取，不用每次都重新切詞)。
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+# 假名、CJK 統一漢字 (含擴充 A、相容區)、韓文
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+_TOKEN_RE = re.compile(f"([{_CJK}]+)|([0-9a-z_]+)")
+
+
+def _cjk_terms(run, with_unigrams):
+    if len(run) == 1:
+        return [run]
+    bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+    return list(run) + bigrams if with_unigrams else bigrams
+
+
+def tokenize(text, for_query=False):
+    """
+    切詞。文件要同時收單字跟 bigram；查詢的中文只用 bigram (比較準)，只打一個字才用單字
+    """
+    terms = []
+    for cjk, word in _TOKEN_RE.findall(text.lower()):
+        if cjk:
+            terms.extend(_cjk_terms(cjk, with_unigrams=not for_query))
+        else:
+            terms.append(word)
+    return terms
+
+
+class ContentIndex:
+    """ 檔名 -> 內文 的倒排索引 (thread-safe) """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}  # 詞 -> {檔名: 權重 (1 + log 出現次數)，加入時先算好}
+        self._doc_terms = {} # 檔名 -> Counter (刪除/更新時要知道它有哪些詞)
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, name, text):
+        """ 新增或更新一份文件 """
+        self.add_many([(name, text)])
+
+    def add_many(self, docs, replace=True):
+        """
+        docs: [(檔名, 內文), ...]
+        replace=False: 已經在索引裡的不蓋掉 (背景補建索引時，增量掃描先放進來的比較新)
+        """
+        # 切詞比較花時間，不用鎖著做
+        prepared = [(name, Counter(tokenize(text))) for name, text in docs]
+        with self._lock:
+            for name, counts in prepared:
+                if not replace and name in self._doc_terms:
+                    continue
+                self._remove_locked(name)
+                self._doc_terms[name] = counts
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[name] = 1 + math.log(tf)
+
+    def remove(self, name):
+        with self._lock:
+            self._remove_locked(name)
+
+    def _remove_locked(self, name):
+        counts = self._doc_terms.pop(name, None)
+        if counts is None:
+            return
+        for term in counts:
+            docs = self._postings.get(term)
+            if docs is not None:
+                docs.pop(name, None)
+                if not docs:
+                    del self._postings[term]
+
+    def search(self, query, candidates=None, limit=None):
+        """
+        回傳: 依分數排好的檔名 list (每個詞都要有出現)
+        candidates: 只在這些檔名裡找 (例如檔名篩選的結果)，None 代表全部
+        """
+        terms = list(dict.fromkeys(tokenize(query, for_query=True)))
+        if not terms:
+            return []
+
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if any(p is None for p in postings):
+                return []
+            n_docs = len(self._doc_terms)
+            # 從最少文件的詞開始交集，候選會縮得最快
+            postings.sort(key=len)
+            matched = postings[0].keys()
+            if candidates is not None:
+                matched = matched & candidates
+            for docs in postings[1:]:
+                if not matched:
+                    return []
+                matched = docs.keys() & matched
+
+            scores = dict.fromkeys(matched, 0.0)
+            for docs in postings:
+                idf = math.log(1 + n_docs / len(docs))
+                for name in scores:
+                    scores[name] += docs[name] * idf
+
+        # 先照檔名排，再用 stable sort 照分數排 -> 同分的照檔名
+        ranked = sorted(scores)
+        if limit:
+            return heapq.nlargest(limit, ranked, key=scores.__getitem__)
+        ranked.sort(key=scores.__getitem__, reverse=True)
+        return ranked
@@ -0,0 +1,370 @@
+"""
+批次更新前的備份 + 復原 (不依賴 Qt)
+
+每個檔案被批次更新覆寫之前，先把原本的 bytes 存到 EXE 旁邊的 snapshots/:
+  objects/ab/cdef...    原本的內容 (zlib 壓縮)，檔名就是內容的 sha256
+                        每個檔案切成兩塊存: 開頭 # 的 Header (每個檔案都不一樣) + 後面的版號跟內文
+                        上一次整批寫的是同一段內文，所以 500 個檔案的後半段只會存一份
+  batches/<批次>.json   這一批改了哪些檔案: 檔名 -> 原本內容的 hash list + 寫完之後的 size/mtime
+
+復原 (undo): 最近 N 批一起算好每個檔案要回到哪個版本 (最舊那批的原本內容)，再平行寫回去。
+寫完之後又被別人改過的檔案 (size/mtime 跟批次寫完時對不上) 不會蓋掉，除非 force。
+容量: 超過 max_bytes 就從最舊的批次開始丟 (復原一定是從最新的往回，舊的最用不到)，沒有批次用到的 object 一起刪。
+"""
+import os
+import codecs
+import json
+import time
+import uuid
+import zlib
+import hashlib
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from note_core import BatchReport, FileResult
+
+SNAPSHOT_DIR = "snapshots"
+BATCH_EXT = ".json"
+COMPRESS_LEVEL = 6
+ORPHAN_GRACE = 3600 # 秒: 沒有批次用到、但這麼久之內才寫的 object 先不刪 (可能是別的程序正在跑的批次)
+
+# 一批的紀錄: files 是 {檔名: {"before": [hash, ...] 或 None (原本不存在), "size": ..., "mtime_ns": ...}}
+BatchSnapshot = namedtuple("BatchSnapshot", ["batch", "created", "folder", "version", "files"])
+
+
+def split_chunks(data):
+    """ 原始 bytes -> [開頭 # 那幾行 Header, 其他]，接起來就是原本的檔案 (空的那塊不回傳) """
+    pos = len(codecs.BOM_UTF8) if data.startswith(codecs.BOM_UTF8) else 0
+    while data.startswith(b"#", pos):
+        nl = data.find(b"\n", pos)
+        pos = len(data) if nl < 0 else nl + 1
+    return [chunk for chunk in (data[:pos], data[pos:]) if chunk]
+
+
+def _write_atomic(path, data):
+    """ 先寫暫存檔再 rename，寫到一半掛掉也不會留下壞掉的檔案 """
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotRecorder:
+    """ 一個批次的備份: 每個檔案寫之前 capture，整批做完 commit (可以多個 thread 一起 capture) """
+
+    def __init__(self, store, folder, version_str):
+        self.store = store
+        self.folder = folder
+        self.version_str = version_str
+        self.batch = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+        self.created = time.time()
+        self._before = {} # 檔名 -> [hash, ...] (None = 原本不存在)
+        self._lock = threading.Lock()
+
+    def capture(self, name, path):
+        """ 覆寫之前呼叫: 存下原本的內容 (讀不到就丟 Exception，這個檔案就不要寫了) """
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            digests = None
+        else:
+            digests = [self.store.put(chunk) for chunk in split_chunks(data)]
+        with self._lock:
+            self._before[name] = digests
+
+    def commit(self, names):
+        """
+        批次做完: 只記真的有寫成功的檔案 (連同寫完之後的 size/mtime，復原時用來判斷有沒有被別人改過)
+        回傳: 這一批的 BatchSnapshot (一個都沒寫成功就 None，不留紀錄)
+        """
+        files = {}
+        for name in names:
+            if name not in self._before:
+                continue
+            try:
+                st = os.stat(os.path.join(self.folder, name))
+            except OSError:
+                continue
+            files[name] = {"before": self._before[name], "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if not files:
+            return None
+        snap = BatchSnapshot(self.batch, self.created, self.folder, self.version_str, files)
+        self.store.write_batch(snap)
+        self.store.evict(keep=self.batch)
+        return snap
+
+
+class SnapshotStore:
+    """ 內容定址 (sha256) + 去重 + 壓縮的備份區，見模組說明 """
+
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, "objects")
+        self.batches_dir = os.path.join(root, "batches")
+        self._lock = threading.Lock() # evict / undo 不要同時跑
+
+    # ==========================
+    # object (內容)
+    # ==========================
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put(self, data):
+        """ 存一份內容 (已經有一樣的就不再寫)，回傳 hash """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        try:
+            os.utime(path) # 已經有了: 碰一下 mtime 就好 (剛用到，不要被當成沒人用的刪掉)
+            return digest
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, zlib.compress(data, COMPRESS_LEVEL))
+        return digest
+
+    def get(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def restore_bytes(self, digests):
+        """ capture 存的 hash list -> 原本的檔案內容 """
+        return b"".join(self.get(digest) for digest in digests)
+
+    # ==========================
+    # 批次紀錄
+    # ==========================
+    def begin(self, folder, version_str):
+        return SnapshotRecorder(self, folder, version_str)
+
+    def _batch_path(self, batch):
+        return os.path.join(self.batches_dir, batch + BATCH_EXT)
+
+    def write_batch(self, snap):
+        os.makedirs(self.batches_dir, exist_ok=True)
+        data = json.dumps(snap._asdict(), ensure_ascii=False).encode("utf-8")
+        _write_atomic(self._batch_path(snap.batch), data)
+
+    def _rewrite_batch(self, snap):
+        """ 改寫紀錄但保留原本的 mtime (evict 用紀錄檔的 mtime 排新舊，不要因為對帳就變成最新的一批) """
+        path = self._batch_path(snap.batch)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self.write_batch(snap)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def _read_batch(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return BatchSnapshot(**json.load(f))
+
+    def batches(self):
+        """ 所有可以復原的批次，新的在前面 (紀錄壞掉的跳過) """
+        try:
+            fnames = [f for f in os.listdir(self.batches_dir) if f.endswith(BATCH_EXT)]
+        except FileNotFoundError:
+            return []
+        result = []
+        for fname in fnames:
+            try:
+                result.append(self._read_batch(os.path.join(self.batches_dir, fname)))
+            except (OSError, ValueError, TypeError):
+                continue
+        # 批次 id 只到秒，同一秒跑兩批的話要靠 created 才分得出先後
+        result.sort(key=lambda snap: (snap.created, snap.batch), reverse=True)
+        return result
+
+    def count(self):
+        """ 有幾批可以復原 (只數檔案，不讀內容) """
+        try:
+            return sum(1 for f in os.listdir(self.batches_dir) if f.endswith(BATCH_EXT))
+        except FileNotFoundError:
+            return 0
+
+    # ==========================
+    # 復原
+    # ==========================
+    def undo(self, count=1, max_workers=8, force=False, cancel=None, progress=None):
+        """
+        把最近 count 批改過的檔案寫回更新前的內容 (平行)
+        同一個檔案被好幾批改過: 回到最舊那一批之前的內容，被改過沒的檢查看最新那一批寫完的樣子
+        force=False: 批次之後又被改過的檔案不動 (算失敗，紀錄留著，之後可以 force 再來一次)
+        progress(完成數, 總數, FileResult) 同 note_core.run_batch_update
+        回傳: (BatchReport, 復原到的 BatchSnapshot list (新到舊))
+        """
+        with self._lock:
+            history = self.batches()
+            selected, older = history[:max(0, count)], history[max(0, count):]
+            targets = {} # (資料夾, 檔名) -> [原本內容的 hash list, 最新一批寫完的 size/mtime]
+            for snap in selected: # 新 -> 舊
+                for name, rec in snap.files.items():
+                    key = (snap.folder, name)
+                    if key in targets:
+                        targets[key][0] = rec["before"] # 更舊的那一批才是最原本的
+                    else:
+                        targets[key] = [rec["before"], (rec["size"], rec["mtime_ns"])]
+
+            report = BatchReport(len(targets))
+            started = time.perf_counter()
+            restored_stat = {} # (資料夾, 檔名) -> 寫回去之後的 (size, mtime_ns)，給更舊的批次對帳用
+
+            def job(key):
+                if cancel is not None and cancel.is_set():
+                    return None
+                folder, name = key
+                before, expected = targets[key]
+                path = os.path.join(folder, name)
+                file_started = time.perf_counter()
+                try:
+                    if not force:
+                        try:
+                            st = os.stat(path)
+                            current = (st.st_size, st.st_mtime_ns)
+                        except FileNotFoundError:
+                            current = None
+                        if current != expected:
+                            raise RuntimeError("批次之後又被改過 (或刪掉)，沒有蓋掉")
+                    if before is None:
+                        # 原本不存在 (批次新建的檔案): 復原 = 刪掉
+                        if os.path.exists(path):
+                            os.remove(path)
+                        written = 0
+                    else:
+                        data = self.restore_bytes(before)
+                        _write_atomic(path, data)
+                        written = len(data)
+                        st = os.stat(path)
+                        restored_stat[key] = (st.st_size, st.st_mtime_ns)
+                    return FileResult(name, True, "", 0, written, time.perf_counter() - file_started)
+                except Exception as e:
+                    return FileResult(name, False, str(e), 0, 0, time.perf_counter() - file_started)
+
+            restored = set()
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+                futures = {executor.submit(job, key): key for key in targets}
+                for fut in as_completed(futures):
+                    result = fut.result()
+                    if result is None:
+                        continue
+                    report.results.append(result)
+                    if result.ok:
+                        restored.add(futures[fut])
+                    if progress is not None:
+                        progress(len(report.results), report.total, result)
+            report.cancelled = report.skipped > 0
+            report.elapsed = time.perf_counter() - started
+
+            # 復原成功的檔案從紀錄拿掉；整批都還原了就刪掉那一批 (沒成功的留著下次再試)
+            for snap in selected:
+                left = {n: rec for n, rec in snap.files.items() if (snap.folder, n) not in restored}
+                if not left:
+                    try:
+                        os.remove(self._batch_path(snap.batch))
+                    except OSError:
+                        pass
+                elif len(left) != len(snap.files):
+                    self.write_batch(snap._replace(files=left))
+            # 更舊的批次記的是它自己寫完的 size/mtime；內容剛剛被寫回那個樣子了，但 mtime 是新的
+            # 不更新的話下一次復原會把這些檔案全部當成「被別人改過」
+            for snap in older:
+                files = dict(snap.files)
+                for name, rec in snap.files.items():
+                    stat = restored_stat.get((snap.folder, name))
+                    if stat is not None:
+                        files[name] = dict(rec, size=stat[0], mtime_ns=stat[1])
+                if files != snap.files:
+                    self._rewrite_batch(snap._replace(files=files))
+        self.evict()
+        return report, selected
+
+    # ==========================
+    # 容量控管 (舊的先丟)
+    # ==========================
+    def _object_sizes(self):
+        """ {hash: (壓縮後大小, mtime)} """
+        sizes = {}
+        try:
+            subdirs = os.listdir(self.objects_dir)
+        except FileNotFoundError:
+            return sizes
+        for sub in subdirs:
+            try:
+                with os.scandir(os.path.join(self.objects_dir, sub)) as it:
+                    for de in it:
+                        if de.is_file() and not de.name.endswith(".tmp"):
+                            st = de.stat()
+                            sizes[sub + de.name] = (st.st_size, st.st_mtime)
+            except NotADirectoryError:
+                continue
+        return sizes
+
+    def usage(self):
+        """ 目前佔多少空間 (bytes) """
+        return sum(size for size, _ in self._object_sizes().values())
+
+    def evict(self, keep=None):
+        """
+        超過 max_bytes 就從最舊的批次 (紀錄檔的 mtime = 寫入時間) 開始丟，keep 那一批不丟
+        容量只算批次用得到的 object + 紀錄檔；沒有批次用到的 object 先刪 (ORPHAN_GRACE 之內的除外，
+        可能是別的程序正在跑的批次，也不算進容量，不然會為了刪不掉的東西一直丟有用的批次)
+        """
+        with self._lock:
+            try:
+                fnames = [f for f in os.listdir(self.batches_dir) if f.endswith(BATCH_EXT)]
+            except FileNotFoundError:
+                fnames = []
+            batches = [] # (mtime, 批次 id, 用到的 hash set, 紀錄檔大小)
+            for fname in fnames:
+                path = os.path.join(self.batches_dir, fname)
+                try:
+                    st = os.stat(path)
+                    snap = self._read_batch(path)
+                except (OSError, ValueError, TypeError):
+                    continue
+                hashes = {digest for rec in snap.files.values() for digest in rec["before"] or ()}
+                batches.append((st.st_mtime, snap.batch, hashes, st.st_size))
+
+            objects = self._object_sizes()
+            refs = {}
+            for _, _, hashes, _ in batches:
+                for digest in hashes:
+                    refs[digest] = refs.get(digest, 0) + 1
+            now = time.time()
+            self._remove_orphans(objects, refs, now)
+            total = sum(objects[digest][0] for digest in refs if digest in objects) + sum(b[3] for b in batches)
+
+            for mtime, batch, hashes, manifest_size in sorted(batches):
+                if total <= self.max_bytes:
+                    break
+                if batch == keep:
+                    continue
+                try:
+                    os.remove(self._batch_path(batch))
+                except OSError:
+                    continue
+                total -= manifest_size
+                for digest in hashes:
+                    refs[digest] -= 1
+                    if refs[digest] == 0:
+                        total -= objects.get(digest, (0, 0))[0]
+            self._remove_orphans(objects, refs, now) # 剛剛丟掉的批次用的 object
+
+    def _remove_orphans(self, objects, refs, now):
+        """ 刪掉沒有批次用到、而且超過 ORPHAN_GRACE 的 object (刪掉的也從 objects 拿掉) """
+        for digest, (_, mtime) in list(objects.items()):
+            if refs.get(digest, 0) == 0 and now - mtime > ORPHAN_GRACE:
+                try:
+                    os.remove(self._object_path(digest))
+                except OSError:
+                    continue
+                del objects[digest]
@@ -0,0 +1,178 @@
+"""
+效能紀錄 (不依賴 Qt)
+
+每個主要階段 (掃描、讀檔、填表格、篩選、預覽、每個檔案的更新...) 花了多久:
+  - 記在記憶體裡做統計 (次數 / 最近一次 / 平均 / p95 / 最大)，給診斷分頁看
+  - 一行一筆 JSON 寫到 rotating log (logs/fep-trace.log)，使用者說「卡住了」就請他把 log 傳過來
+
+另外可以把整個 session 用 cProfile 錄下來:
+  FEP_PROFILE=out.prof 或 --profile out.prof，關程式時寫出 (python -m pstats out.prof 可以看)
+  背景 worker 的 thread 也會錄 (每個 worker 一份，最後合併)
+"""
+import os
+import json
+import time
+import cProfile
+import pstats
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+PROFILE_ENV = "FEP_PROFILE"
+LOG_NAME = "fep-trace.log"
+
+
+class StageStats:
+    """ 一個階段的統計 """
+    __slots__ = ("count", "total", "max", "last", "recent")
+    RECENT = 256 # p95 只看最近這麼多筆
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=self.RECENT)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+        self.recent.append(seconds)
+
+    @property
+    def p95(self):
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+
+
+class Tracer:
+    """ thread-safe，背景 worker 跟 GUI 都往同一個 tracer 記 """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._logger = None
+        self.log_path = ""
+        self._main_profile = None
+        self._thread_profiles = []
+        self.profile_path = ""
+
+    # ==========================
+    # 紀錄
+    # ==========================
+    def configure_log(self, log_dir, max_bytes=1024 * 1024, backups=3):
+        """ 開 rotating log；開不起來 (唯讀之類的) 就只記在記憶體 """
+        try:
+            os.makedirs(log_dir, exist_ok=True)
+            handler = RotatingFileHandler(os.path.join(log_dir, LOG_NAME), maxBytes=max_bytes,
+                                          backupCount=backups, encoding="utf-8", delay=True)
+        except OSError:
+            return False
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("fep.trace")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+            old.close()
+        logger.addHandler(handler)
+        self._logger = logger
+        self.log_path = handler.baseFilename
+        return True
+
+    def record(self, stage, seconds, **fields):
+        """ 記一筆: stage 是階段名稱，fields 是額外資訊 (檔案數、檔名...) """
+        with self._lock:
+            stats = self._stats.get(stage)
+            if stats is None:
+                stats = self._stats[stage] = StageStats()
+            stats.add(seconds)
+        if self._logger is not None:
+            record = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "stage": stage,
+                      "ms": round(seconds * 1000, 3), "thread": threading.current_thread().name}
+            record.update(fields)
+            self._logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    @contextmanager
+    def span(self, stage, **fields):
+        """
+        with tracer.span("preview", file=name) as extra:
+            ...
+            extra["lines"] = 10   # 做完才知道的資訊也可以補進去
+        """
+        extra = dict(fields)
+        started = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            self.record(stage, time.perf_counter() - started, **extra)
+
+    def snapshot(self):
+        """ [(階段, 次數, 最近 ms, 平均 ms, p95 ms, 最大 ms), ...] 照階段名稱排 """
+        with self._lock:
+            rows = [(stage, s.count, s.last * 1000, s.total / s.count * 1000, s.p95 * 1000,
+                     s.max * 1000) for stage, s in self._stats.items()]
+        return sorted(rows)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    # ==========================
+    # cProfile
+    # ==========================
+    @property
+    def profiling(self):
+        return self._main_profile is not None
+
+    def start_profile(self, path):
+        """ 從現在開始錄 (呼叫的這個 thread = 主 thread) """
+        self.profile_path = os.path.abspath(path)
+        self._thread_profiles = []
+        self._main_profile = cProfile.Profile()
+        self._main_profile.enable()
+
+    @contextmanager
+    def profile_thread(self):
+        """ 包在背景 worker 的 run() 外面: 有在錄的話這個 thread 也錄進去 """
+        if not self.profiling:
+            yield
+            return
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # Python 3.12+ 的 cProfile 用 sys.monitoring (整個程序只能有一個，主 thread 那份已經佔走了)
+            # 這時候主 thread 那份本來就會錄到所有 thread，這裡不錄；錄不了也不能害 worker 跑不完
+            prof = None
+        try:
+            yield
+        finally:
+            if prof is not None:
+                prof.disable()
+                with self._lock:
+                    self._thread_profiles.append(prof)
+
+    def stop_profile(self):
+        """ 停止並寫檔 (主 thread + 所有 worker 合併成一份)，回傳檔案路徑 """
+        if not self.profiling:
+            return ""
+        self._main_profile.disable()
+        stats = pstats.Stats(self._main_profile)
+        with self._lock:
+            profiles, self._thread_profiles = self._thread_profiles, []
+        for prof in profiles:
+            try:
+                stats.add(prof)
+            except TypeError:
+                pass # 什麼都沒錄到的 (worker 一開始就被取消)
+        stats.dump_stats(self.profile_path)
+        self._main_profile = None
+        return self.profile_path
+
+
+tracer = Tracer() # 整個程式共用一個
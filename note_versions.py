@@ -0,0 +1,181 @@
+"""
+版號登錄表 (載入時順便建，寫檔時增量更新)
+
+每個 note 過濾掉 Header 之後的第一行就是 update_file_logic 寫的 [階段].[流水號].[環境]，
+例如 [1].[042].[T]。這裡把它們整理成:
+  - 每個檔案目前的版號
+  - 每個檔名 token 群組 (fep-batch-*、fep-batch-task-* ... 還有「全部」) 裡，
+    各 (階段, 環境) 出現過哪些流水號 -> 最新的是哪個、下一號是多少
+查詢只看群組裡「不同的流水號」，不用掃幾千個檔案。
+"""
+import re
+import threading
+from collections import namedtuple
+
+from note_core import format_version
+
+_VERSION_RE = re.compile(r"^\[([^\]]*)\]\.\[([^\]]*)\]\.\[([^\]]*)\]$")
+_TRAILING_DIGITS_RE = re.compile(r"(\d+)$")
+
+
+class NoteVersion(namedtuple("NoteVersion", ["stage", "seq", "env"])):
+    __slots__ = ()
+
+    @property
+    def text(self):
+        return format_version(self.stage, self.seq, self.env)
+
+
+def parse_body_version(body):
+    """ 內文 (已過濾 Header、去頭尾空白) 的第一行是版號的話回傳 NoteVersion，不然 None """
+    first_line = body.split("\n", 1)[0].strip()
+    m = _VERSION_RE.match(first_line)
+    if not m or not m.group(2).strip():
+        return None
+    return NoteVersion(m.group(1).strip(), m.group(2).strip(), m.group(3).strip().upper())
+
+
+def seq_key(seq):
+    """ 流水號排序: 數字照大小 ("99" < "100")，不是純數字的排在數字後面照字串 """
+    return (0, int(seq), seq) if seq.isdigit() else (1, 0, seq)
+
+
+def next_seq(seq):
+    """ 下一號，保留補零的寬度: "042" -> "043"、"099" -> "100"、"R09" -> "R10"；沒有數字就 None """
+    m = _TRAILING_DIGITS_RE.search(seq)
+    if not m:
+        return None
+    digits = m.group(1)
+    return seq[:m.start()] + str(int(digits) + 1).zfill(len(digits))
+
+
+def group_keys(tokens):
+    """
+    檔名 token -> 它屬於哪些群組: (), (batch,), (batch, task) ... (parts[0] 的 fep 不算)
+    跟 FolderIndex.match 一樣，只有一段的檔名 (fep.txt) 不在任何群組 (連「全部」都不算)
+    """
+    path = tuple(tokens[1:])
+    return [path[:depth] for depth in range(len(path) + 1)] if path else []
+
+
+class VersionRegistry:
+    """ thread-safe (背景載入一邊讀檔一邊加) """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}  # 檔名 -> (NoteVersion, 群組 key list)
+        self._groups = {} # 群組 key -> {(階段, 環境): {流水號: 幾個檔案}}
+
+    def __len__(self):
+        return len(self._files)
+
+    # ==========================
+    # 更新
+    # ==========================
+    def update_many(self, docs):
+        """ docs: [(檔名, token, 內文), ...]；內文沒有版號的就當作沒有 (舊的會拿掉) """
+        parsed = [(name, tokens, parse_body_version(body)) for name, tokens, body in docs]
+        with self._lock:
+            for name, tokens, version in parsed:
+                self._remove_locked(name)
+                if version is not None:
+                    self._add_locked(name, tokens, version)
+
+    def set_version(self, names_tokens, version_str):
+        """ 剛寫完一批 (版號已知，不用等重讀): names_tokens 是 [(檔名, token), ...] """
+        version = parse_body_version(version_str)
+        if version is None:
+            return
+        with self._lock:
+            for name, tokens in names_tokens:
+                self._remove_locked(name)
+                self._add_locked(name, tokens, version)
+
+    def remove(self, names):
+        with self._lock:
+            for name in names:
+                self._remove_locked(name)
+
+    def _add_locked(self, name, tokens, version):
+        keys = group_keys(tokens)
+        self._files[name] = (version, keys)
+        combo = (version.stage, version.env)
+        for key in keys:
+            seqs = self._groups.setdefault(key, {}).setdefault(combo, {})
+            seqs[version.seq] = seqs.get(version.seq, 0) + 1
+
+    def _remove_locked(self, name):
+        old = self._files.pop(name, None)
+        if old is None:
+            return
+        version, keys = old
+        combo = (version.stage, version.env)
+        for key in keys:
+            combos = self._groups[key]
+            seqs = combos[combo]
+            seqs[version.seq] -= 1
+            if not seqs[version.seq]:
+                del seqs[version.seq]
+                if not seqs:
+                    del combos[combo]
+                    if not combos:
+                        del self._groups[key]
+
+    # ==========================
+    # 查詢
+    # ==========================
+    def version_of(self, name):
+        with self._lock:
+            item = self._files.get(name)
+        return item[0] if item is not None else None
+
+    def _combos_for(self, group=None, names=None):
+        """
+        {(階段, 環境): {流水號: 幾個檔案}}
+        group: token 群組 (例如 ("batch",))，直接拿預先算好的
+        names: 不是完整群組的任意清單 (例如有內容搜尋)，只好一個一個數
+        """
+        with self._lock:
+            if names is None:
+                return {combo: dict(seqs) for combo, seqs in self._groups.get(tuple(group or ()), {}).items()}
+            combos = {}
+            for name in names:
+                item = self._files.get(name)
+                if item is None:
+                    continue
+                version = item[0]
+                seqs = combos.setdefault((version.stage, version.env), {})
+                seqs[version.seq] = seqs.get(version.seq, 0) + 1
+            return combos
+
+    def summary(self, group=None, names=None):
+        """
+        回傳: (最新版號 NoteVersion 或 None, 有版號的檔案數, 不同版號有幾種)
+        「最新」= 流水號最大的那個 (不分階段 / 環境)
+        """
+        combos = self._combos_for(group, names)
+        latest, files, distinct = None, 0, 0
+        for (stage, env), seqs in combos.items():
+            files += sum(seqs.values())
+            distinct += len(seqs)
+            top = max(seqs, key=seq_key)
+            if latest is None or seq_key(top) > seq_key(latest.seq):
+                latest = NoteVersion(stage, top, env)
+        return latest, files, distinct
+
+    def latest_seq(self, stage, env=None, group=None, names=None):
+        """ 某個階段 (+環境) 目前最大的流水號；env=None 代表不分環境 """
+        combos = self._combos_for(group, names)
+        seqs = [seq for (s, e), found in combos.items()
+                if s == stage and (env is None or e == env) for seq in found]
+        return max(seqs, key=seq_key) if seqs else None
+
+    def suggest_next(self, stage, env, group=None, names=None):
+        """
+        建議的下一個流水號: 同階段同環境最大的 +1；這個環境還沒發過就看同階段的其他環境
+        都沒有就回傳 None
+        """
+        latest = self.latest_seq(stage, env, group, names)
+        if latest is None:
+            latest = self.latest_seq(stage, None, group, names)
+        return next_seq(latest) if latest is not None else None
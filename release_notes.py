@@ -0,0 +1,345 @@
+"""
+FEP Release Note 命令列工具 (不用開 GUI、不 import PySide6，給 CI / 腳本用)
+
+範例:
+  python release_notes.py list   --key1 batch
+  python release_notes.py update --key1 batch --key2 task --version 1.042.T --content-file notes.md
+  python release_notes.py list   --key batch --key task --key sub   (檔名分更多段時，一層一個 --key)
+
+  python release_notes.py list   --folder sysA --folder sysB --recursive --exclude archive
+  python release_notes.py undo   --list          (最近的批次更新；undo -n 2 復原最近兩批)
+
+沒給 --folder 的話，就用 config.ini 裡 GUI 最後開的 last_folder (跟掃描範圍的設定)。
+"""
+import os
+import sys
+import time
+import argparse
+import configparser
+import threading
+
+from note_core import (FolderIndex, ScanSpec, app_dir, parse_version_arg, run_batch_update,
+                       plan_notes)
+from note_journal import run_safe_batch_update, recover_journals
+from note_trace import tracer, PROFILE_ENV
+from note_report import export_report, export_report_file, format_from_path, parse_group_by, FORMATS
+from note_git import GitRepo, GitError, default_commit_message
+from note_snapshots import SnapshotStore, SNAPSHOT_DIR
+
+DIFF_PAGE = 20 # update --dry-run --diff 一次算幾個檔案就先印出來
+
+
+def open_snapshots(config):
+    """ 跟 GUI 共用 EXE 旁邊的 snapshots/ (config.ini 的 snapshot_max_mb=0 代表不備份) """
+    max_mb = int(config.get("snapshot_max_mb", 256))
+    return SnapshotStore(os.path.join(app_dir(), SNAPSHOT_DIR), max_mb * 1024 * 1024) if max_mb > 0 else None
+
+def read_config(ini_path):
+    """
+    讀 GUI (QSettings) 寫的 config.ini，回傳 [General] 的 dict
+    QSettings 會把反斜線寫成兩個，這裡還原回來
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.optionxform = str # key 大小寫照舊
+    try:
+        parser.read(ini_path, encoding="utf-8")
+    except configparser.Error:
+        return {}
+    if not parser.has_section("General"):
+        return {}
+    config = {}
+    for key, value in parser.items("General"):
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        config[key] = value.replace("\\\\", "\\")
+    return config
+
+
+def resolve_spec(args, config):
+    """ 命令列有給就用命令列的，沒給就跟 GUI 一樣 (config.ini) """
+    roots = args.folder or config.get("last_folder", "")
+    include = args.include or config.get("scan_include", "") or "*.txt"
+    exclude = args.exclude or config.get("scan_exclude", "")
+    if args.recursive is None:
+        recursive = config.get("scan_recursive", "false").lower() == "true"
+    else:
+        recursive = args.recursive
+    spec = ScanSpec.parse(roots, include, exclude, recursive)
+    if not spec.roots:
+        raise SystemExit("錯誤: 沒有指定資料夾 (--folder)，config.ini 裡也沒有 last_folder")
+    for root in spec.roots:
+        if not os.path.isdir(root):
+            raise SystemExit(f"錯誤: 找不到這個資料夾：{root}")
+    try:
+        spec.base
+    except ValueError:
+        raise SystemExit("錯誤: 這幾個資料夾不在同一個磁碟機，沒辦法一起處理")
+    return spec
+
+
+def select_files(index, args):
+    """ 跟 GUI 一樣的級聯篩選；有給 --file 就只做那一個 """
+    if args.file:
+        if args.file not in index.entries:
+            raise SystemExit(f"錯誤: 資料夾裡沒有這個檔案：{args.file}")
+        return [args.file]
+    if args.keys:
+        if args.key1 or args.key2:
+            raise SystemExit("錯誤: --key 跟 --key1/--key2 不能混用")
+        return index.filter_files(args.keys)
+    return index.filter_files([args.key1, args.key2])
+
+
+def read_content(args):
+    if args.content is not None:
+        content = args.content
+    elif args.content_file == "-":
+        content = sys.stdin.read()
+    else:
+        with open(args.content_file, "r", encoding="utf-8") as f:
+            content = f.read()
+    return content.strip()
+
+
+def load_index(spec):
+    with tracer.span("scan") as extra:
+        index = FolderIndex(spec)
+        index.refresh()
+        extra["files"] = len(index.entries)
+    return index
+
+
+def cmd_list(args, config):
+    index = load_index(resolve_spec(args, config))
+    for name in select_files(index, args):
+        print(name)
+    return 0
+
+
+def cmd_update(args, config):
+    spec = resolve_spec(args, config)
+    folder = spec.base
+    try:
+        version_str = parse_version_arg(args.version)
+    except ValueError as e:
+        raise SystemExit(f"錯誤: {e}")
+    new_content = read_content(args)
+    if not new_content:
+        raise SystemExit("錯誤: 更新內容是空的")
+
+    index = load_index(spec)
+    names = select_files(index, args)
+    if not names:
+        print("(無符合檔案)")
+        return 1
+
+    if args.dry_run:
+        print(f"[dry-run] 版號 {version_str}，將更新 {len(names)} 個檔案:")
+        if not args.diff:
+            for name in names:
+                print(f"  {name}")
+            return 0
+        # 一次算一小段就印出來，幾千個檔案也不用等全部讀完
+        for i in range(0, len(names), DIFF_PAGE):
+            for plan in plan_notes(folder, names[i:i + DIFF_PAGE], version_str, new_content):
+                print(f"===== {plan.name} =====")
+                if plan.error:
+                    print(f"(無法讀取: {plan.error})")
+                else:
+                    sys.stdout.write(plan.diff or "(內容不會有任何變化)\n")
+            sys.stdout.flush()
+        return 0
+
+    repo = None
+    if args.git_commit:
+        # 先確認是 git repo，不要更新完才發現沒辦法 commit
+        repo = GitRepo.find(folder)
+        if repo is None:
+            raise SystemExit(f"錯誤: {folder} 不在 git repo 裡 (或找不到 git 指令)，不能用 --git-commit")
+
+    journal_dir = os.path.join(app_dir(), "journal")
+    for msg in recover_journals(journal_dir):
+        print(msg, file=sys.stderr)
+
+    def on_progress(done, total, result):
+        tracer.record("update_file", result.elapsed, file=result.name, ok=result.ok,
+                      bytes_written=result.bytes_written)
+
+    snapshots = open_snapshots(config)
+    recorder = snapshots.begin(folder, version_str) if snapshots is not None else None
+    cancel = threading.Event()
+    try:
+        if args.unsafe:
+            report = run_batch_update(folder, names, version_str, new_content,
+                                      max_workers=args.workers, cancel=cancel, progress=on_progress,
+                                      snapshot=recorder)
+        else:
+            report = run_safe_batch_update(folder, names, version_str, new_content, journal_dir,
+                                           max_workers=args.workers, cancel=cancel,
+                                           progress=on_progress, snapshot=recorder)
+    except KeyboardInterrupt:
+        cancel.set()
+        raise
+    tracer.record("batch_update", report.elapsed, files=report.total, ok=len(report.succeeded),
+                  failed=len(report.failed), cancelled=report.cancelled, safe=not args.unsafe)
+    if recorder is not None:
+        try:
+            recorder.commit([r.name for r in report.succeeded])
+        except OSError as e:
+            print(f"警告: 備份紀錄寫入失敗，這一批沒辦法用 undo 復原: {e}", file=sys.stderr)
+
+    for r in sorted(report.results):
+        status = "OK" if r.ok else "NG"
+        print(f"{status} {r.name}" + ("" if r.ok else f" ({r.error})"))
+    print(f"版號 {version_str}: 成功 {len(report.succeeded)}，失敗 {len(report.failed)}。"
+          f"{report.throughput_text()}", file=sys.stderr)
+
+    if repo is not None and report.succeeded:
+        names = [r.name for r in report.succeeded]
+        message = args.commit_message or default_commit_message(version_str, len(names))
+        try:
+            with tracer.span("git_commit", files=len(names)):
+                commit_hash = repo.commit([repo.to_repo_path(folder, n) for n in names], message)
+        except GitError as e:
+            print(f"錯誤: 檔案已更新，但 git commit 失敗: {e}", file=sys.stderr)
+            return 1
+        print(f"git commit {commit_hash[:8]}" if commit_hash else "git: 內容沒有變動，沒有 commit",
+              file=sys.stderr)
+    return 0 if not report.failed and not report.cancelled else 1
+
+
+def cmd_undo(args, config):
+    snapshots = open_snapshots(config)
+    if snapshots is None:
+        raise SystemExit("錯誤: config.ini 設了 snapshot_max_mb=0，沒有備份可以復原")
+    batches = snapshots.batches()
+    if args.list or not batches:
+        for snap in batches:
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snap.created))
+            print(f"{snap.batch}  {created}  {snap.version}  {len(snap.files)} 個檔案  {snap.folder}")
+        if not batches:
+            print("沒有可以復原的批次", file=sys.stderr)
+        print(f"備份區: {snapshots.root} ({snapshots.usage() / 1024 / 1024:.1f} MB)", file=sys.stderr)
+        return 0
+
+    cancel = threading.Event()
+    try:
+        with tracer.span("undo", batches=args.count) as extra:
+            report, undone = snapshots.undo(args.count, args.workers, force=args.force, cancel=cancel)
+            extra.update(files=report.total, ok=len(report.succeeded), failed=len(report.failed))
+    except KeyboardInterrupt:
+        cancel.set()
+        raise
+    for r in sorted(report.results):
+        print(f"{'OK' if r.ok else 'NG'} {r.name}" + ("" if r.ok else f" ({r.error})"))
+    print(f"復原 {len(undone)} 批 ({', '.join(s.version for s in undone)}): "
+          f"成功 {len(report.succeeded)}，失敗 {len(report.failed)}。{report.throughput_text()}",
+          file=sys.stderr)
+    if report.failed and not args.force:
+        print("之後又被改過的檔案沒有蓋掉；確定要蓋的話加 --force", file=sys.stderr)
+    return 0 if not report.failed and not report.cancelled else 1
+
+
+def cmd_export(args, config):
+    spec = resolve_spec(args, config)
+    try:
+        group_by = parse_group_by(args.group_by)
+    except ValueError as e:
+        raise SystemExit(f"錯誤: {e}")
+    fmt = args.format or (format_from_path(args.output) if args.output != "-" else "md")
+
+    index = load_index(spec)
+    names = select_files(index, args)
+    newline = "" if fmt == "csv" else None # csv 模組自己處理換行
+    with tracer.span("export", files=len(names), format=fmt):
+        if args.output == "-":
+            sys.stdout.reconfigure(newline=newline)
+            count = export_report(sys.stdout, spec.base, names, fmt, group_by, args.level)
+        else:
+            # 先寫暫存檔，寫完才換成正式檔名 (CSV 會加 BOM，Excel 直接開中文才不會亂碼)
+            count = export_report_file(args.output, spec.base, names, fmt, group_by=group_by, level=args.level)
+    if args.output != "-":
+        print(f"已匯出 {count} 個檔案 -> {args.output}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="release-notes", description="FEP Release Note 命令列工具")
+    parser.add_argument("--config", default=os.path.join(app_dir(), "config.ini"),
+                        help="config.ini 路徑 (預設: 程式旁邊那個)")
+    parser.add_argument("--profile", default=os.environ.get(PROFILE_ENV, ""),
+                        help="用 cProfile 錄整個執行過程，結束時寫到這個檔 (也可以設 FEP_PROFILE)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_selection(p):
+        p.add_argument("--folder", action="append", default=[],
+                       help="release note 資料夾，可重複或用 ; 隔開 (預設: config.ini 的 last_folder)")
+        p.add_argument("--include", action="append", default=[],
+                       help="要收的檔案 glob，可重複 (預設 *.txt)")
+        p.add_argument("--exclude", action="append", default=[],
+                       help="要排除的檔案/資料夾 glob，可重複 (例如 archive、old/*)")
+        p.add_argument("--recursive", action=argparse.BooleanOptionalAction, default=None,
+                       help="往子資料夾掃 (預設照 config.ini 的 scan_recursive)")
+        p.add_argument("--key1", default="", help="搜尋條件 A (檔名第二段)")
+        p.add_argument("--key2", default="", help="搜尋條件 B (檔名第三段)")
+        p.add_argument("--key", dest="keys", action="append", default=[],
+                       help="依序對應檔名第二段、第三段、第四段... (可重複，空字串代表不限)")
+        p.add_argument("--file", help="只處理這一個檔案 (含 .txt；遞迴/多資料夾時是相對路徑)")
+
+    p_list = sub.add_parser("list", help="列出符合條件的檔案")
+    add_selection(p_list)
+    p_list.set_defaults(func=cmd_list)
+
+    p_update = sub.add_parser("update", help="更新版號與內容 (保留 # 開頭的 Header)")
+    add_selection(p_update)
+    p_update.add_argument("--version", required=True, help="新版號，例如 1.042.T")
+    content = p_update.add_mutually_exclusive_group(required=True)
+    content.add_argument("--content", help="更新內容")
+    content.add_argument("--content-file", help="從檔案讀更新內容 (- 代表 stdin)")
+    p_update.add_argument("--workers", type=int, default=4, help="同時寫幾個檔 (預設 4)")
+    p_update.add_argument("--unsafe", action="store_true",
+                          help="不用交易式寫入，直接覆寫 (比較快但中途掛掉可能只寫一半)")
+    p_update.add_argument("--dry-run", action="store_true", help="只列出會被更新的檔案")
+    p_update.add_argument("--diff", action="store_true",
+                          help="搭配 --dry-run: 印出每個檔案改完的 unified diff")
+    p_update.add_argument("--git-commit", action="store_true",
+                          help="更新完把成功的檔案整批 git add + commit (資料夾要在 git repo 裡)")
+    p_update.add_argument("--commit-message", help="搭配 --git-commit 的 commit 訊息 (預設自動產生)")
+    p_update.set_defaults(func=cmd_update)
+
+    p_undo = sub.add_parser("undo", help="把最近幾批更新寫回更新前的內容 (GUI 跟命令列的批次都算)")
+    p_undo.add_argument("-n", "--count", type=int, default=1, help="復原最近幾批 (預設 1)")
+    p_undo.add_argument("--list", action="store_true", help="只列出可以復原的批次 (新的在前面)")
+    p_undo.add_argument("--force", action="store_true", help="批次之後又被改過的檔案也蓋回去")
+    p_undo.add_argument("--workers", type=int, default=8, help="同時寫幾個檔 (預設 8)")
+    p_undo.set_defaults(func=cmd_undo)
+
+    p_export = sub.add_parser("export", help="把符合條件的 note 匯出成一份報表 (Markdown / JSON / CSV)")
+    add_selection(p_export)
+    p_export.add_argument("-o", "--output", default="-", help="輸出檔 (預設 stdout)")
+    p_export.add_argument("--format", choices=FORMATS, help="不給就看輸出檔的副檔名 (預設 md)")
+    p_export.add_argument("--group-by", default="token",
+                          help="分組: token / version / token,version / none (預設 token)")
+    p_export.add_argument("--level", type=int, default=1,
+                          help="token 分組看到檔名第幾段 (預設 1 = 第二段，例如 batch)")
+    p_export.set_defaults(func=cmd_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    config = read_config(args.config)
+    if config.get("trace_log", "true").lower() != "false":
+        tracer.configure_log(os.path.join(app_dir(), "logs"),
+                             int(config.get("trace_log_kb", 1024)) * 1024)
+    if not args.profile:
+        return args.func(args, config)
+    tracer.start_profile(args.profile)
+    try:
+        return args.func(args, config)
+    finally:
+        print(f"profile 已寫到 {tracer.stop_profile()}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
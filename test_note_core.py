@@ -0,0 +1,84 @@
+"""
+note_core 的索引比對 / 分頁讀檔測試 (python -m pytest test_note_core.py)
+"""
+import pytest
+
+from note_core import FolderIndex, PagedTextReader, ScanSpec, stat_entry
+
+NAMES = ["fep-batch-task.txt", "fep-batch-job.txt", "fep-batman-x.txt", "fep-bat-y.txt",
+         "fep-b.txt", "fep-other-task.txt", "readme.txt"]
+
+
+@pytest.fixture
+def index(tmp_path):
+    for name in NAMES:
+        (tmp_path / name).write_text("# Header\n", encoding="utf-8")
+    index = FolderIndex(str(tmp_path))
+    assert index.refresh()
+    return index
+
+
+def test_prefix_match_narrows_while_typing(index):
+    assert index.filter_files(["ba"], prefix=True) == [
+        "fep-bat-y.txt", "fep-batch-job.txt", "fep-batch-task.txt", "fep-batman-x.txt"]
+    # 剛好是某個 token 就用完全符合，不是前綴
+    assert index.filter_files(["bat"], prefix=True) == ["fep-bat-y.txt"]
+    # 上一個字是完全符合的話不能從它的結果往下縮
+    assert index.filter_files(["batm"], prefix=True) == ["fep-batman-x.txt"]
+    assert index.filter_files(["batc", "t"], prefix=True) == ["fep-batch-task.txt"]
+    assert index.filter_files(["batch", "job"]) == ["fep-batch-job.txt"]
+    assert index.filter_files(["ba"]) == [] # 不是 prefix 模式就只看完整 token
+
+
+def test_missing_level_and_uncascadable_files(index):
+    assert index.filter_files(["b", ""], prefix=True) == ["fep-b.txt"]
+    assert index.filter_files(["b", "x"], prefix=True) == [] # 沒有第二段的不算符合
+    assert "readme.txt" not in index.match([""])
+    assert index.tokens_at(2, ["ba"], prefix=True) == ["job", "task", "x", "y"]
+    assert index.tokens_at(2, ["batch"]) == ["job", "task"]
+    assert index.exact_group(["batch", ""]) == ("batch",)
+    assert index.exact_group(["bat", "t"]) is None
+
+
+def test_apply_changes_prunes_trie(index, tmp_path):
+    assert index.filter_files(["batm"], prefix=True) == ["fep-batman-x.txt"]
+    (tmp_path / "fep-batmobile-z.txt").write_text("# Header\n", encoding="utf-8")
+    added = stat_entry(ScanSpec.parse(str(tmp_path)), "fep-batmobile-z.txt")
+    index.apply_changes([added], ["fep-batman-x.txt"])
+    assert index.filter_files(["batm"], prefix=True) == ["fep-batmobile-z.txt"]
+    assert not index.tries[1].names_with_prefix("batma") # 沒人用的分支剪掉了
+    assert index.tokens_at(2, ["batm"], prefix=True) == ["z"]
+
+
+def read_all(reader):
+    pages = []
+    while True:
+        page = reader.read_page()
+        if not page:
+            return pages
+        pages.append(page)
+
+
+def test_paged_reader_keeps_split_characters(tmp_path):
+    text = "".join(f"第 {i} 行 修正匯率\r\n" for i in range(200))
+    path = tmp_path / "fep-a-big.txt"
+    path.write_bytes(text.encode("utf-8"))
+    reader = PagedTextReader(str(path), page_bytes=7) # 每頁都會切在中文字 / \r\n 中間
+    pages = read_all(reader)
+    assert len(pages) > 100 and reader.at_end and not reader.hit_limit
+    assert "".join(pages) == text.replace("\r\n", "\n")
+
+
+def test_paged_reader_state_restore_and_limit(tmp_path):
+    text = "修正匯率" * 100
+    path = tmp_path / "fep-a-big.txt"
+    path.write_bytes(text.encode("utf-8"))
+    reader = PagedTextReader(str(path), page_bytes=10, max_bytes=100)
+    first = reader.read_page()
+    state = reader.state()
+    second = reader.read_page()
+    reader.restore(state)
+    assert reader.read_page() == second
+    read = first + second + "".join(read_all(reader))
+    assert reader.hit_limit and reader.offset == 100 and reader.read_page() == ""
+    assert read == text[:len(read)] # 讀到上限就停，停在字中間也不會多出亂碼
@@ -0,0 +1,55 @@
+"""
+note_git 的提交測試 (python -m pytest test_note_git.py，沒裝 git 就跳過)
+"""
+import shutil
+import subprocess
+
+import pytest
+
+from note_git import GitRepo
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="沒有 git")
+
+
+def git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, stdout=subprocess.PIPE).stdout.decode()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git(tmp_path, "init", "-q")
+    git(tmp_path, "config", "user.name", "test")
+    git(tmp_path, "config", "user.email", "test@example.com")
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    # fep-[x].txt 當成萬用字元的話會對到 fep-x.txt
+    for name in ["fep-[x].txt", "fep-x.txt", "fep-a.txt"]:
+        (notes / name).write_text("# Header\nold\n", encoding="utf-8")
+    git(tmp_path, "add", "-A")
+    git(tmp_path, "commit", "-q", "-m", "init")
+    return GitRepo.find(str(notes)), notes
+
+
+def committed(cwd):
+    return sorted(git(cwd, "show", "--name-only", "--format=", "HEAD").split())
+
+
+def test_commit_only_given_literal_paths(repo):
+    repo, notes = repo
+    for name in ["fep-[x].txt", "fep-x.txt", "fep-a.txt"]:
+        (notes / name).write_text("# Header\nnew\n", encoding="utf-8")
+    git(repo.toplevel, "add", "notes/fep-a.txt") # 別人 stage 的不能被一起帶進去
+
+    head = repo.commit(["notes/fep-[x].txt"], "Release note [1].[002].[T]")
+    assert head and head == repo.head()
+    assert committed(repo.toplevel) == ["notes/fep-[x].txt"]
+    status = repo.status(["notes"])
+    assert status == {"notes/fep-a.txt": "M ", "notes/fep-x.txt": " M"}
+
+
+def test_commit_without_changes_returns_empty(repo):
+    repo, notes = repo
+    head = repo.head()
+    assert repo.commit(["notes/fep-[x].txt"], "nothing") == ""
+    assert repo.commit([], "nothing") == ""
+    assert repo.head() == head
@@ -0,0 +1,110 @@
+"""
+note_journal 的交易式寫入 / 當機復原測試 (python -m pytest test_note_journal.py)
+"""
+import os
+
+import pytest
+
+import note_journal
+from note_journal import Journal, run_safe_batch_update, recover_journals, TMP_SUFFIX
+
+NAMES = ["fep-a-1.txt", "fep-a-2.txt", "fep-a-3.txt"]
+
+
+@pytest.fixture
+def notes(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    for name in NAMES:
+        (folder / name).write_text(f"# Header {name}\n\n[1].[001].[T]\nold\n", encoding="utf-8")
+    return folder
+
+
+def contents(folder):
+    return {name: (folder / name).read_text(encoding="utf-8") for name in NAMES}
+
+
+def leftovers(folder, journal_dir):
+    tmps = sorted(p.name for p in folder.iterdir() if p.name.endswith(TMP_SUFFIX))
+    journals = sorted(os.listdir(journal_dir)) if journal_dir.exists() else []
+    return tmps, journals
+
+
+def test_batch_commits_all_files(notes, tmp_path):
+    journal_dir = tmp_path / "journal"
+    report = run_safe_batch_update(str(notes), NAMES, "[1].[002].[T]", "new", str(journal_dir))
+    assert len(report.succeeded) == len(NAMES) and not report.failed
+    assert contents(notes) == {name: f"# Header {name}\n\n[1].[002].[T]\nnew\n" for name in NAMES}
+    assert leftovers(notes, journal_dir) == ([], [])
+
+
+def test_failed_prepare_rolls_back_whole_batch(notes, tmp_path):
+    journal_dir = tmp_path / "journal"
+    before = contents(notes)
+    (notes / ("fep-a-2.txt" + TMP_SUFFIX)).mkdir() # 暫存檔寫不進去
+    report = run_safe_batch_update(str(notes), NAMES, "[1].[002].[T]", "new", str(journal_dir))
+    assert not report.succeeded and len(report.failed) == len(NAMES)
+    assert contents(notes) == before
+    assert os.listdir(journal_dir) == []
+
+
+def test_crash_during_apply_is_rolled_forward(notes, tmp_path, monkeypatch):
+    """ commit 之後換檔換到一半就掛了: 下次啟動要把剩下的補完，不能只套用一半 """
+    journal_dir = tmp_path / "journal"
+    real_replace = os.replace
+    calls = []
+
+    def crashing_replace(src, dst):
+        calls.append(dst)
+        if len(calls) > 1:
+            raise OSError("網路磁碟斷線")
+        real_replace(src, dst)
+
+    monkeypatch.setattr(note_journal.os, "replace", crashing_replace)
+    report = run_safe_batch_update(str(notes), NAMES, "[1].[002].[T]", "new", str(journal_dir),
+                                   max_workers=1)
+    monkeypatch.undo()
+    assert len(report.succeeded) == 1 and len(report.failed) == len(NAMES) - 1
+    tmps, journals = leftovers(notes, journal_dir)
+    assert len(tmps) == len(NAMES) - 1 and len(journals) == 1
+    assert Journal(str(journal_dir / journals[0])).read()[1] == "commit"
+
+    messages = recover_journals(str(journal_dir))
+    assert len(messages) == 1 and f"已補完 {len(NAMES) - 1} 個檔案" in messages[0]
+    assert contents(notes) == {name: f"# Header {name}\n\n[1].[002].[T]\nnew\n" for name in NAMES}
+    assert leftovers(notes, journal_dir) == ([], [])
+
+
+def test_crash_before_commit_is_rolled_back(notes, tmp_path):
+    """ 暫存檔寫好了但 commit 那行沒寫到 (最後一行只寫了一半): 整批取消，原檔不動 """
+    journal_dir = tmp_path / "journal"
+    before = contents(notes)
+    journal = Journal.create(str(journal_dir), str(notes), NAMES, "[1].[002].[T]")
+    for name in NAMES:
+        note_journal.prepare_note(str(notes / name), "[1].[002].[T]", "new")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"state": "comm')
+
+    messages = recover_journals(str(journal_dir))
+    assert len(messages) == 1 and "已整批取消" in messages[0]
+    assert contents(notes) == before
+    assert leftovers(notes, journal_dir) == ([], [])
+
+
+def test_recover_keeps_journal_when_folder_missing(tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal = Journal.create(str(journal_dir), str(tmp_path / "offline"), NAMES, "[1].[002].[T]")
+    journal.append({"state": "commit"})
+    messages = recover_journals(str(journal_dir))
+    assert len(messages) == 1 and "下次再處理" in messages[0]
+    assert os.path.exists(journal.path) # 磁碟掛回來之後還能補
+
+
+def test_recover_drops_finished_and_empty_journals(notes, tmp_path):
+    journal_dir = tmp_path / "journal"
+    done = Journal.create(str(journal_dir), str(notes), NAMES, "[1].[002].[T]")
+    done.append({"state": "commit"})
+    done.append({"state": "done"})
+    (journal_dir / "broken.journal").write_text("", encoding="utf-8")
+    assert recover_journals(str(journal_dir)) == []
+    assert os.listdir(journal_dir) == []
@@ -0,0 +1,50 @@
+"""
+note_report 的測試 (python -m pytest test_note_report.py)
+"""
+import json
+import threading
+
+import pytest
+
+from note_core import BODY_LIMIT, read_note
+from note_report import export_report_file, read_full_body, ExportCancelled
+
+
+def make_notes(folder):
+    (folder / "fep-a-small.txt").write_text("# Header\n\n[1].[002].[T]\nsmall body\n", encoding="utf-8")
+    lines = "".join(f"第 {i} 行 log xxxxxxxxxxxxxxxx\r\n" for i in range(BODY_LIMIT // 10))
+    (folder / "fep-b-big.txt").write_text(f"# Header\n[1].[003].[P]\n{lines}# 中間的 Header\nlast line\n",
+                                          encoding="utf-8")
+    return lines.replace("\r\n", "\n")
+
+
+def test_read_full_body_matches_read_note_without_limit(tmp_path):
+    path = tmp_path / "fep-a-1.txt"
+    path.write_text("# h1\n  # indented header\nbody 一\r\n\n# h2\nbody 二\n\n", encoding="utf-8")
+    assert read_full_body(str(path)) == read_note(str(path))[1] == "body 一\n\nbody 二"
+
+
+def test_export_keeps_whole_body_of_large_notes(tmp_path):
+    lines = make_notes(tmp_path)
+    out = tmp_path / "report.json"
+    count = export_report_file(str(out), str(tmp_path), ["fep-a-small.txt", "fep-b-big.txt"], group_by=())
+    assert count == 2
+    files = {f["file"]: f for f in json.loads(out.read_text(encoding="utf-8"))["files"]}
+    assert files["fep-a-small.txt"]["content"] == "small body"
+    big = files["fep-b-big.txt"]
+    assert big["version"] == "[1].[003].[P]"
+    assert big["content"] == lines + "last line"
+    assert len(big["content"]) > BODY_LIMIT
+
+
+@pytest.mark.parametrize("fmt", ["md", "json", "csv"])
+def test_cancelled_export_leaves_no_file(tmp_path, fmt):
+    make_notes(tmp_path)
+    out = tmp_path / f"report.{fmt}"
+    out.write_text("old report", encoding="utf-8")
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(ExportCancelled):
+        export_report_file(str(out), str(tmp_path), ["fep-a-small.txt", "fep-b-big.txt"], cancel=cancel)
+    assert out.read_text(encoding="utf-8") == "old report" # 原本的檔案不動
+    assert not list(tmp_path.glob("*.tmp"))
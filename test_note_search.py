@@ -0,0 +1,45 @@
+"""
+note_search 的切詞 / 排序測試 (python -m pytest test_note_search.py)
+"""
+from note_search import ContentIndex, tokenize
+
+
+def test_tokenize_cjk_and_words():
+    assert tokenize("Fix TICKET-1234 修正匯率") == [
+        "fix", "ticket", "1234", "修", "正", "匯", "率", "修正", "正匯", "匯率"]
+    assert tokenize("修正匯率", for_query=True) == ["修正", "正匯", "匯率"]
+    assert tokenize("匯", for_query=True) == ["匯"]
+
+
+def test_ranking_prefers_repeated_and_rare_terms():
+    index = ContentIndex()
+    index.add_many([
+        ("fep-a-1.txt", "修正匯率 ticket-1"),
+        ("fep-a-2.txt", "修正匯率 修正匯率 修正匯率 ticket-2"),
+        ("fep-a-3.txt", "匯率 ticket-3"),
+        ("fep-b-1.txt", "ticket-1 ticket-1 其他"),
+    ])
+    assert index.search("修正匯率") == ["fep-a-2.txt", "fep-a-1.txt"] # 出現越多次越前面
+    # 每個詞都要有 (AND)，同分照檔名
+    assert index.search("ticket 匯率") == ["fep-a-2.txt", "fep-a-1.txt", "fep-a-3.txt"]
+    assert index.search("ticket 1") == ["fep-b-1.txt", "fep-a-1.txt"]
+    assert index.search("ticket", limit=2) == ["fep-b-1.txt", "fep-a-1.txt"]
+    assert index.search("ticket", candidates={"fep-a-3.txt", "nope.txt"}) == ["fep-a-3.txt"]
+    assert index.search("沒有這個") == [] and index.search("  ") == []
+
+
+def test_update_remove_and_keep_newer():
+    index = ContentIndex()
+    index.add("fep-a-1.txt", "舊的內容 alpha")
+    index.add("fep-a-1.txt", "新的內容 beta")
+    assert index.search("alpha") == [] and index.search("beta") == ["fep-a-1.txt"]
+
+    # 背景補建索引時拿到的是舊內容: 不能蓋掉增量掃描先放進來的
+    index.add_many([("fep-a-1.txt", "舊的內容 alpha"), ("fep-a-2.txt", "alpha")], replace=False)
+    assert index.search("alpha") == ["fep-a-2.txt"]
+    assert index.search("beta") == ["fep-a-1.txt"]
+
+    index.remove("fep-a-1.txt")
+    index.remove("nope.txt")
+    assert len(index) == 1 and index.search("beta") == []
+    assert "beta" not in index._postings # 沒文件用的詞也一起清掉
@@ -0,0 +1,100 @@
+"""
+note_snapshots 的復原測試 (python -m pytest test_note_snapshots.py)
+"""
+import os
+import time
+
+from note_snapshots import SnapshotStore, ORPHAN_GRACE
+
+
+def write_batch(store, folder, version, contents):
+    """ 模擬一次批次更新: capture -> 寫檔 -> commit """
+    recorder = store.begin(folder, version)
+    for name, data in contents.items():
+        path = os.path.join(folder, name)
+        recorder.capture(name, path)
+        with open(path, "wb") as f:
+            f.write(data)
+    return recorder.commit(list(contents))
+
+
+def read(folder, name):
+    with open(os.path.join(folder, name), "rb") as f:
+        return f.read()
+
+
+def test_consecutive_undos(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    names = ["fep-a-1.txt", "fep-a-2.txt", "fep-b-1.txt"]
+    for name in names:
+        (folder / name).write_bytes(b"# Header " + name.encode() + b"\r\n[1].[001].[T]\r\noriginal\r\n")
+    originals = {name: read(folder, name) for name in names}
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+
+    write_batch(store, str(folder), "[1].[002].[T]", {name: b"# Header\n[1].[002].[T]\nfirst\n" for name in names})
+    first = {name: read(folder, name) for name in names}
+    write_batch(store, str(folder), "[1].[003].[T]", {name: b"# Header\n[1].[003].[T]\nsecond\n" for name in names})
+
+    report, selected = store.undo(1)
+    assert len(selected) == 1 and len(report.succeeded) == len(names) and not report.failed
+    assert {name: read(folder, name) for name in names} == first
+
+    # 第一次復原改了 mtime，第二次復原不能把這些檔案當成被別人改過
+    report, selected = store.undo(1)
+    assert len(selected) == 1 and len(report.succeeded) == len(names) and not report.failed
+    assert {name: read(folder, name) for name in names} == originals
+    assert store.count() == 0
+
+
+def test_undo_skips_files_changed_after_batch(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    (folder / "fep-a-1.txt").write_bytes(b"# Header\noriginal\n")
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    write_batch(store, str(folder), "[1].[002].[T]", {"fep-a-1.txt": b"# Header\nbatch\n"})
+    (folder / "fep-a-1.txt").write_bytes(b"# Header\nedited by someone else\n")
+
+    report, _ = store.undo(1)
+    assert len(report.failed) == 1
+    assert read(folder, "fep-a-1.txt") == b"# Header\nedited by someone else\n"
+    assert store.count() == 1 # 紀錄留著，可以之後 force
+
+    report, _ = store.undo(1, force=True)
+    assert not report.failed and read(folder, "fep-a-1.txt") == b"# Header\noriginal\n"
+
+
+def test_evict_ignores_orphans_in_grace_period(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    store = SnapshotStore(str(tmp_path / "snapshots"), max_bytes=64 * 1024)
+    for i in range(3):
+        (folder / f"fep-a-{i}.txt").write_bytes(b"# Header\n" + os.urandom(4 * 1024).hex().encode())
+        write_batch(store, str(folder), f"[1].[00{i}].[T]", {f"fep-a-{i}.txt": b"# Header\nbatch\n"})
+    # 另一個程序剛存進來、還沒寫紀錄的 object (很大，但在 ORPHAN_GRACE 之內)
+    store.put(os.urandom(256 * 1024))
+    store.evict()
+    assert store.count() == 3 # 刪不掉的孤兒不算容量，不會拿有用的批次去抵
+
+    # 超過 grace 的孤兒直接刪掉
+    old = time.time() - ORPHAN_GRACE - 10
+    for root, _, files in os.walk(store.objects_dir):
+        for name in files:
+            os.utime(os.path.join(root, name), (old, old))
+    store.evict()
+    assert store.count() == 3
+    assert store.usage() < 64 * 1024
+
+
+def test_evict_drops_oldest_batches_first(tmp_path):
+    folder = tmp_path / "notes"
+    folder.mkdir()
+    store = SnapshotStore(str(tmp_path / "snapshots"), max_bytes=11 * 1024) # 一批大約 5KB，留得下兩批
+    for i in range(4):
+        (folder / f"fep-a-{i}.txt").write_bytes(b"# Header\n" + os.urandom(4 * 1024).hex().encode())
+        snap = write_batch(store, str(folder), f"[1].[00{i}].[T]", {f"fep-a-{i}.txt": b"# Header\nbatch\n"})
+        path = store._batch_path(snap.batch)
+        os.utime(path, (1000 + i, 1000 + i))
+    store.evict()
+    left = [snap.version for snap in store.batches()]
+    assert left == ["[1].[003].[T]", "[1].[002].[T]"]
@@ -0,0 +1,50 @@
+"""
+note_trace 的測試 (python -m pytest test_note_trace.py)
+"""
+import cProfile
+import threading
+
+import pytest
+
+import note_trace
+from note_trace import Tracer
+
+
+class BusyProfile:
+    """ Python 3.12+ 已經有別的 cProfile 在錄時，enable() 會丟 ValueError """
+    def enable(self):
+        raise ValueError("Another profiling tool is already active")
+
+    def disable(self):
+        raise AssertionError("沒 enable 成功就不該 disable")
+
+
+def test_profile_thread_runs_worker_when_profiler_busy(tmp_path, monkeypatch):
+    tracer = Tracer()
+    tracer.start_profile(str(tmp_path / "out.prof"))
+    try:
+        monkeypatch.setattr(note_trace.cProfile, "Profile", BusyProfile)
+        ran = []
+        worker = threading.Thread(target=lambda: ran.append(run_profiled(tracer)))
+        worker.start()
+        worker.join()
+        assert ran == ["done"]
+        with pytest.raises(RuntimeError): # worker 自己的錯照樣丟出來
+            with tracer.profile_thread():
+                raise RuntimeError("boom")
+    finally:
+        monkeypatch.setattr(note_trace.cProfile, "Profile", cProfile.Profile)
+        assert tracer.stop_profile() == str(tmp_path / "out.prof")
+
+
+def run_profiled(tracer):
+    with tracer.profile_thread():
+        return "done"
+
+
+def test_span_records_stats():
+    tracer = Tracer()
+    with tracer.span("scan", files=3) as extra:
+        extra["hits"] = 1
+    (stage, count, *_), = tracer.snapshot()
+    assert (stage, count) == ("scan", 1)
@@ -0,0 +1,131 @@
+"""
+GUI 的測試 (Qt offscreen，python -m pytest test_release_note_app.py)
+設定 / 快取 / 備份都放在 tmp_path (FEP_APP_DIR)，不會動到真正的 config.ini
+"""
+import os
+import sys
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PySide6")
+
+from PySide6.QtCore import QEventLoop
+from PySide6.QtWidgets import QApplication, QMessageBox
+
+from note_core import APP_DIR_ENV
+from note_snapshots import SnapshotStore, SNAPSHOT_DIR
+
+
+@pytest.fixture
+def window(tmp_path, monkeypatch):
+    app = QApplication.instance() or QApplication([])
+    app_home = tmp_path / "app"
+    app_home.mkdir()
+    (app_home / "config.ini").write_text("[General]\ntrace_log=false\n", encoding="utf-8")
+    monkeypatch.setenv(APP_DIR_ENV, str(app_home))
+    import ReleaseNoteApp
+    w = ReleaseNoteApp.FepReleaseManager()
+    w.show()
+    yield app, w
+    w.close()
+
+
+def wait_until(app, predicate, timeout=10.0):
+    started = time.monotonic()
+    while not predicate():
+        assert time.monotonic() - started < timeout, "等太久了"
+        app.processEvents(QEventLoop.AllEvents, 20)
+
+
+def test_undo_without_folder_loaded(window, tmp_path, monkeypatch):
+    app, w = window
+    assert not w.current_folder and w.previews is None
+
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    note = notes / "fep-a-1.txt"
+    note.write_bytes(b"# Header\noriginal\n")
+    store = SnapshotStore(os.path.join(os.environ[APP_DIR_ENV], SNAPSHOT_DIR))
+    recorder = store.begin(str(notes), "[1].[002].[T]")
+    recorder.capture(note.name, str(note))
+    note.write_bytes(b"# Header\n\n[1].[002].[T]\nbatch\n")
+    recorder.commit([note.name])
+
+    errors, refreshed = [], []
+    monkeypatch.setattr(sys, "excepthook", lambda *exc: errors.append(exc))
+    monkeypatch.setattr(QMessageBox, "question", staticmethod(lambda *a, **k: QMessageBox.Yes))
+    monkeypatch.setattr(QMessageBox, "information", staticmethod(lambda *a, **k: None))
+    monkeypatch.setattr(QMessageBox, "warning", staticmethod(lambda *a, **k: None))
+    monkeypatch.setattr(w, "refresh_changes", lambda touched=(): refreshed.append(list(touched)))
+
+    w.ensure_update_tab()
+    w.refresh_undo_state()
+    assert w.undo_btn.isEnabled()
+    w.undo_logic()
+    wait_until(app, lambda: w._undo is None)
+
+    assert not errors
+    assert note.read_bytes() == b"# Header\noriginal\n"
+    assert refreshed == [[]] # 不是目前資料夾的批次: 交給監看 / 輪詢
+    assert store.count() == 0
+
+
+def test_table_model_insert_remove_keeps_rows(window):
+    import ReleaseNoteApp
+    model = ReleaseNoteApp.NoteTableModel()
+    model.set_names([f"fep-a-{i:03d}.txt" for i in range(0, 100, 2)])
+    model.insert_names(["fep-a-001.txt", "fep-a-051.txt", "fep-a-099.txt", "fep-a-001.txt"])
+    model.remove_names(["fep-a-000.txt", "fep-a-002.txt", "fep-a-004.txt", "fep-a-050.txt", "nope.txt"])
+    names = model._names
+    assert names == sorted(names) and len(names) == 50 + 3 - 4
+    assert model._row_of == {name: row for row, name in enumerate(names)}
+    assert len(model._line_counts) == len(names)
+
+
+def test_table_keeps_bounded_bodies_and_refetches(window, tmp_path, monkeypatch):
+    app, w = window
+    import ReleaseNoteApp
+    from note_core import ScanSpec
+    monkeypatch.setattr(ReleaseNoteApp.NoteTableModel, "BODY_CACHE", 16)
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    for i in range(200):
+        (notes / f"fep-a-{i:03d}.txt").write_text(f"# Header\nbody {i}\n" + "x" * 5000, encoding="utf-8")
+    w.scan_spec = ScanSpec.parse(str(notes))
+    w.current_folder = w.scan_spec.base
+    w.load_files_to_table(reset_filters=True)
+    wait_until(app, lambda: w._loader is None)
+
+    model = w.table_model
+    assert model.rowCount() == 200
+    assert len(model._bodies) <= 16 # 只留最近的，不是全部
+    assert all(len(body) <= model.DISPLAY_CHARS for body in model._bodies.values())
+    assert model.line_count(0) == 2
+
+    index = model.index(150, 1) # 畫面外、早就被擠出 LRU 的列
+    assert model.data(index) == model.LOADING_TEXT
+    wait_until(app, lambda: model.data(index) != model.LOADING_TEXT)
+    assert model.data(index).startswith("body 150\n")
+
+
+def test_content_index_built_on_first_search(window, tmp_path):
+    app, w = window
+    from note_core import ScanSpec
+    notes = tmp_path / "notes"
+    notes.mkdir()
+    for i in range(30):
+        (notes / f"fep-a-{i:03d}.txt").write_text(f"# Header\nticket-{i} 修正匯率\n", encoding="utf-8")
+    (notes / "fep-b-000.txt").write_text("# Header\nticket-7 修正匯率 ticket-7\n", encoding="utf-8")
+    w.scan_spec = ScanSpec.parse(str(notes))
+    w.current_folder = w.scan_spec.base
+    w.load_files_to_table(reset_filters=True)
+    wait_until(app, lambda: w._loader is None)
+    assert w.content_index is None # 載入不建內容索引
+
+    w.content_search.setText("ticket-7 匯率")
+    w.apply_final_filter()
+    wait_until(app, lambda: w._content_indexer is None)
+    assert len(w.content_index) == 31
+    assert w._filtered_files == ["fep-b-000.txt", "fep-a-007.txt"]